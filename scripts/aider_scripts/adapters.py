@@ -0,0 +1,430 @@
+"""
+Usage: python adapters.py [--repo <name>] test [--test-patch <test.patch>] <repo_dir> <test_file> ...
+       python adapters.py [--repo <name>] files <problem_dir>
+       python adapters.py [--repo <name>] clean <repo_dir>
+
+Everything the harness needs to know about one repository, so the same runner and verification
+flows work for each benchmark:
+
+  duckdb      benchmarks/duckdb_benchmark. Builds everything (with the extensions the tests
+              `require`, see build_profiles.py) and runs build/release/test/unittest per test file.
+  clickhouse  benchmarks/clickhouse_unverified. Builds only the `clickhouse` binary and runs the
+              stateless tests (tests/queries/0_stateless/*.sql with a .reference next to them)
+              through `clickhouse local`, in parallel across cores, comparing each test's output
+              with its .reference in-process. Shell, Python and integration tests need a server
+              and are reported as not runnable.
+  dragonfly   benchmarks/dragonflydb_unverified. Maps each *_test.cc to its gtest target (the
+              cxx_test() in the CMakeLists.txt next to it) and builds only those targets. The TEST,
+              TEST_F and TEST_P cases a test.patch adds or changes become a --gtest_filter (the
+              whole binary runs if none are found), and each binary's cases are sharded across
+              cores with GTEST_TOTAL_SHARDS/GTEST_SHARD_INDEX. tests/dragonfly/*.py need a running
+              server and are reported as not runnable.
+
+The adapter is picked by name from --repo (aider_benchmark.py, builder.py) or the HONOURS_REPO
+environment variable, which the runner exports for build.sh, run_tests.sh and the other scripts.
+Checkouts live in repos/<name>. The problem's test.patch is passed with --test-patch, or in
+HONOURS_TEST_PATCH by run_tests.sh.
+
+Each adapter also lists the files its build never reads (DATA_FILES): sqllogictest files, query
+tests and their references, Python tests, docs. compiled_inputs() keeps the files of a patch that
+aren't among them, so verification only rebuilds after a patch that changes one (see verify_PRs.py).
+
+`clean` (clean_repo.sh) resets a checkout between problems: discards local changes and untracked
+files, removes the build tree (what DuckDB's `make clean` did) and moves back to the adapter's
+default branch, detached. It fails (exit code 1) if any of that doesn't work.
+
+RepoAdapter is abstract: an adapter that doesn't implement run_tests() is refused by @register.
+
+Problem JSONs of the unverified benchmarks store file lists as Python list literals and sometimes
+with the diff's "b/" prefix; modified_files()/modified_test_files() return them cleaned up.
+"""
+
+import abc
+import argparse
+import ast
+import difflib
+import fnmatch
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import build_profiles
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+REPO_ENV_VAR = "HONOURS_REPO"
+TEST_PATCH_ENV_VAR = "HONOURS_TEST_PATCH"
+DEFAULT_REPO = "duckdb"
+
+ADAPTERS = {}
+
+
+def register(cls):
+    if cls.__abstractmethods__:
+        raise TypeError(f"Adapter {cls.__name__} doesn't implement {', '.join(sorted(cls.__abstractmethods__))}")
+    ADAPTERS[cls.name] = cls
+    return cls
+
+
+def get(name=None):
+    """Adapter for a repo name ("clickhouse", "ClickHouse/ClickHouse"), by default from HONOURS_REPO."""
+    name = (name or os.environ.get(REPO_ENV_VAR) or DEFAULT_REPO).split("/")[-1].lower()
+    if name not in ADAPTERS:
+        raise SystemExit(f"No adapter for repository {name!r} (known: {', '.join(ADAPTERS)})")
+    return ADAPTERS[name]()
+
+
+def use(name):
+    """Select the adapter for this process and the scripts it starts."""
+    adapter = get(name)
+    os.environ[REPO_ENV_VAR] = adapter.name
+    return adapter
+
+
+def file_list(value):
+    """A file list from a problem JSON, as a list without "b/" prefixes."""
+    if isinstance(value, str):
+        value = ast.literal_eval(value) if value.strip() else []
+    return [path[2:] if path.startswith("b/") else path for path in value]
+
+
+class RepoAdapter(abc.ABC):
+    name = None
+    url = None
+    benchmark_dir = None
+    default_branch = "main"
+    build_dir = "build/release"
+    # fnmatch patterns (`*` spans directories) of files read at runtime or not at all, never compiled
+    DATA_FILES = ("*.md", "*.rst", "docs/*", ".github/*")
+
+    @property
+    def source_repo(self):
+        return HONOURS_DIR / "repos" / self.name
+
+    def modified_files(self, problem_data):
+        return file_list(problem_data.get("modified_files", []))
+
+    def modified_test_files(self, problem_data):
+        return file_list(problem_data.get("modified_test_files", []))
+
+    def clean(self, repo_dir):
+        """Reset a checkout to a clean default branch, without its build tree."""
+        repo_dir = Path(repo_dir)
+        for cmd in (["git", "reset", "--hard"], ["git", "clean", "-fd"]):
+            if subprocess.run(cmd, cwd=repo_dir).returncode != 0:
+                print(f"❌ {' '.join(cmd)} failed in {repo_dir}")
+                return False
+        build_root = repo_dir / Path(self.build_dir).parts[0]
+        if build_root.exists():
+            shutil.rmtree(build_root)
+        # Blobless clones (prepare_repo.py) may only have the remote-tracking branch
+        for branch in (self.default_branch, f"origin/{self.default_branch}"):
+            if subprocess.run(["git", "checkout", "--quiet", "--detach", branch], cwd=repo_dir).returncode == 0:
+                return True
+        print(f"❌ Could not check out {self.default_branch} or origin/{self.default_branch} in {repo_dir}")
+        return False
+
+    def compiled_inputs(self, files):
+        """The files among `files` that a build may read; the rest can change without a rebuild."""
+        return [path for path in files if not any(fnmatch.fnmatch(path, pattern) for pattern in self.DATA_FILES)]
+
+    def cmake_args(self, profile, repo_dir, test_files=()):
+        return build_profiles.cmake_args(profile, repo_dir, test_files, select_extensions=False)
+
+    def build_targets(self, repo_dir, test_files=()):
+        """cmake --build targets for running `test_files`; empty means the default target."""
+        return []
+
+    @abc.abstractmethod
+    def run_tests(self, repo_dir, test_files, test_patch=None):
+        """Run the tests and print their outcome. True if all of them passed."""
+
+
+@register
+class DuckDBAdapter(RepoAdapter):
+    name = "duckdb"
+    url = "https://github.com/duckdb/duckdb.git"
+    benchmark_dir = HONOURS_DIR / "benchmarks" / "duckdb_benchmark"
+    # unittest reads sqllogictests and their data at runtime. A new `require` still changes the
+    # build through cmake_args(), which verification compares as well
+    DATA_FILES = RepoAdapter.DATA_FILES + ("*.test", "*.test_slow", "*.test_coverage", "data/*", "test/*.csv",
+                                           "test/*.parquet", "test/*.json", "benchmark/*.benchmark")
+    # Configure would otherwise bake `git describe` of HEAD into the build, and cached configures
+    # (cmake_cache.py) couldn't be reused across commits. Older DuckDB ignores it (cmake warns)
+    PINNED_GIT_DESCRIBE = "v0.0.1-0-g0000000000"
+
+    def cmake_args(self, profile, repo_dir, test_files=()):
+        return build_profiles.cmake_args(profile, repo_dir, test_files) + [
+            f"-DOVERRIDE_GIT_DESCRIBE={self.PINNED_GIT_DESCRIBE}"]
+
+    def run_tests(self, repo_dir, test_files, test_patch=None):
+        unittest = Path(repo_dir) / self.build_dir / "test" / "unittest"
+        all_passed = True
+        for test_file in test_files:
+            print(f"Running test: {test_file}", flush=True)
+            if subprocess.run([str(unittest), test_file], cwd=repo_dir).returncode != 0:
+                print(f"Test failed: {test_file}")
+                all_passed = False
+            else:
+                print(f"Test passed: {test_file}")
+        return all_passed
+
+
+@register
+class ClickHouseAdapter(RepoAdapter):
+    name = "clickhouse"
+    url = "https://github.com/ClickHouse/ClickHouse.git"
+    benchmark_dir = HONOURS_DIR / "benchmarks" / "clickhouse_unverified"
+    default_branch = "master"
+    # Older problems predate the move of tests/ out of dbms/
+    STATELESS_DIRS = ("tests/queries/0_stateless/", "dbms/tests/queries/0_stateless/")
+    DATA_FILES = RepoAdapter.DATA_FILES + ("tests/queries/*", "dbms/tests/queries/*", "tests/integration/*",
+                                           "dbms/tests/integration/*")
+    TEST_TIMEOUT = 600
+
+    def cmake_args(self, profile, repo_dir, test_files=()):
+        return super().cmake_args(profile, repo_dir, test_files) + ["-DENABLE_TESTS=0", "-DENABLE_UTILS=0"]
+
+    def build_targets(self, repo_dir, test_files=()):
+        return ["clickhouse"]
+
+    def stateless_tests(self, test_files):
+        """Stateless .sql tests among the modified test files (given as the .sql or the .reference)."""
+        tests, other = [], []
+        for path in test_files:
+            stem, suffix = os.path.splitext(path)
+            if path.startswith(self.STATELESS_DIRS) and suffix in (".sql", ".reference"):
+                if stem + ".sql" not in tests:
+                    tests.append(stem + ".sql")
+            else:
+                other.append(path)
+        return tests, other
+
+    def run_one(self, binary, repo_dir, test):
+        sql = Path(repo_dir) / test
+        reference = sql.with_suffix(".reference")
+        if not sql.exists() or not reference.exists():
+            return test, False, "missing .sql or .reference file"
+        try:
+            with open(sql) as queries:
+                result = subprocess.run([str(binary), "local", "--multiquery"], stdin=queries, cwd=sql.parent,
+                                        capture_output=True, text=True, timeout=self.TEST_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return test, False, f"timed out after {self.TEST_TIMEOUT}s"
+        expected = reference.read_text(errors="replace")
+        if result.returncode == 0 and result.stdout == expected:
+            return test, True, ""
+        diff = difflib.unified_diff(expected.splitlines(), result.stdout.splitlines(),
+                                    "reference", "stdout", lineterm="", n=1)
+        detail = "\n".join(list(diff)[:40])
+        if result.returncode != 0:
+            detail = f"exit code {result.returncode}\n{result.stderr.strip()[-2000:]}\n{detail}"
+        return test, False, detail
+
+    def run_tests(self, repo_dir, test_files, test_patch=None):
+        binary = Path(repo_dir) / self.build_dir / "programs" / "clickhouse"
+        tests, other = self.stateless_tests(test_files)
+        for path in other:
+            if path.endswith((".sh", ".py", ".expect", ".python")):
+                print(f"⚠️ Not runnable with clickhouse local: {path}")
+        if not tests:
+            print("No stateless .sql tests to run")
+            return False
+
+        all_passed = True
+        with ThreadPoolExecutor(max_workers=min(len(tests), os.cpu_count())) as pool:
+            for test, passed, detail in pool.map(lambda t: self.run_one(binary, repo_dir, t), tests):
+                print(f"Running test: {test}")
+                if passed:
+                    print(f"Test passed: {test}")
+                else:
+                    print(f"Test failed: {test}\n{detail}")
+                    all_passed = False
+        return all_passed
+
+
+CXX_TEST = re.compile(r"cxx_test\(\s*([\w-]+)([^)]*)\)")
+GTEST_CASE = re.compile(r"^\s*(TEST|TEST_F|TEST_P)\(\s*(\w+)\s*,\s*(\w+)\s*\)")
+HUNK = re.compile(r"^@@ [^@]* @@ ?(.*)")
+
+
+def gtest_name(match):
+    kind, suite, name = match.groups()
+    # Parameterized cases are named <instantiation>/<suite>.<name>/<param>
+    return f"*/{suite}.{name}/*" if kind == "TEST_P" else f"{suite}.{name}"
+
+
+def changed_gtests(test_patch):
+    """{file: [gtest filter patterns]} for the cases a patch adds or changes, from the TEST lines
+    in its hunks or the hunk's @@ context. Changes outside any case (fixtures, helpers) give "*"."""
+    changed = {}
+    path = current = None
+    for line in Path(test_patch).read_text(errors="replace").splitlines():
+        if line.startswith("+++ "):
+            path = line[4:].strip()
+            path = path[2:] if path.startswith("b/") else path
+            continue
+        if line.startswith(("--- ", "diff ", "index ")) or path is None:
+            continue
+        hunk = HUNK.match(line)
+        if hunk:
+            match = GTEST_CASE.match(hunk.group(1))
+            current = gtest_name(match) if match else None
+            continue
+        if not line or line[0] not in " +-":
+            continue
+        match = GTEST_CASE.match(line[1:])
+        if match and line[0] != "-":
+            current = gtest_name(match)
+        if line[0] in "+-" and (current or "*") not in changed.setdefault(path, []):
+            changed[path].append(current or "*")
+    return changed
+
+
+@register
+class DragonflyAdapter(RepoAdapter):
+    name = "dragonfly"
+    url = "https://github.com/dragonflydb/dragonfly.git"
+    benchmark_dir = HONOURS_DIR / "benchmarks" / "dragonflydb_unverified"
+    DEFAULT_TARGET = "dragonfly"
+    # The gtests live next to the sources in src/; tests/ holds the pytest suite and its tools
+    DATA_FILES = RepoAdapter.DATA_FILES + ("tests/*",)
+    TEST_TIMEOUT = 1800
+
+    def gtest_target(self, repo_dir, test_file):
+        """The cxx_test() target building `test_file`, by default named after the file."""
+        test_file = Path(test_file)
+        cmake_lists = Path(repo_dir) / test_file.parent / "CMakeLists.txt"
+        if cmake_lists.exists():
+            tests = CXX_TEST.findall(cmake_lists.read_text(errors="replace"))
+            for name, args in tests:
+                if name == test_file.stem:
+                    return name
+            for name, args in tests:
+                if test_file.name in args.split():
+                    return name
+        return test_file.stem
+
+    def gtest_files(self, test_files):
+        return [path for path in test_files if path.endswith("_test.cc")]
+
+    def build_targets(self, repo_dir, test_files=()):
+        targets = []
+        for path in self.gtest_files(test_files):
+            target = self.gtest_target(repo_dir, path)
+            if target not in targets:
+                targets.append(target)
+        return targets or [self.DEFAULT_TARGET]
+
+    def binary(self, repo_dir, target):
+        build_dir = Path(repo_dir) / self.build_dir
+        # helio puts every executable at the top of the build tree
+        if (build_dir / target).exists():
+            return build_dir / target
+        return next(build_dir.rglob(target), build_dir / target)
+
+    def count_tests(self, binary, gtest_filter):
+        args = [str(binary), "--gtest_list_tests"] + ([f"--gtest_filter={gtest_filter}"] if gtest_filter else [])
+        result = subprocess.run(args, capture_output=True, text=True)
+        # Case lines are indented under their suite
+        return sum(1 for line in result.stdout.splitlines() if line.startswith("  "))
+
+    def run_shard(self, binary, gtest_filter, index, total):
+        args = [str(binary)] + ([f"--gtest_filter={gtest_filter}"] if gtest_filter else [])
+        env = dict(os.environ, GTEST_TOTAL_SHARDS=str(total), GTEST_SHARD_INDEX=str(index))
+        try:
+            result = subprocess.run(args, env=env, cwd=binary.parent, capture_output=True, text=True,
+                                    timeout=self.TEST_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return False, f"timed out after {self.TEST_TIMEOUT}s"
+        output = result.stdout + result.stderr
+        failed = [line for line in output.splitlines() if line.startswith("[  FAILED  ]")]
+        return result.returncode == 0, "\n".join(failed) or output[-4000:]
+
+    def run_tests(self, repo_dir, test_files, test_patch=None):
+        for path in test_files:
+            if path.endswith(".py"):
+                print(f"⚠️ Not runnable without a dragonfly server: {path}")
+        changed = changed_gtests(test_patch) if test_patch and Path(test_patch).exists() else {}
+
+        runs = {}
+        for path in self.gtest_files(test_files):
+            target = self.gtest_target(repo_dir, path)
+            # Without a test.patch, or one that only changes fixtures, the whole binary runs
+            runs.setdefault(target, set()).update(changed.get(path) or ["*"])
+        if not runs:
+            print("No gtest files to run")
+            return False
+
+        shards = []
+        for target, patterns in runs.items():
+            binary = self.binary(repo_dir, target)
+            if not binary.exists():
+                print(f"Test failed: {target} (binary not found)")
+                return False
+            gtest_filter = None if "*" in patterns else ":".join(sorted(patterns))
+            count = self.count_tests(binary, gtest_filter)
+            if count == 0:
+                # A filter naming no existing case would run nothing and pass
+                print(f"Test failed: {target} (no cases match{f' --gtest_filter={gtest_filter}' if gtest_filter else ''})")
+                return False
+            total = min(os.cpu_count(), count)
+            print(f"Running test: {target} ({count} cases{f', --gtest_filter={gtest_filter}' if gtest_filter else ''}, "
+                  f"{total} shard(s))")
+            shards += [(target, binary, gtest_filter, index, total) for index in range(total)]
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(len(shards), os.cpu_count())) as pool:
+            outcomes = pool.map(lambda shard: self.run_shard(*shard[1:]), shards)
+            for (target, *_), (passed, detail) in zip(shards, outcomes):
+                ok, details = results.get(target, (True, []))
+                results[target] = (ok and passed, details + ([] if passed else [detail]))
+
+        all_passed = True
+        for target, (passed, details) in results.items():
+            if passed:
+                print(f"Test passed: {target}")
+            else:
+                print(f"Test failed: {target}\n" + "\n".join(details))
+                all_passed = False
+        return all_passed
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Per-repository build and test knowledge")
+    parser.add_argument("--repo", type=str, help=f"Repository adapter (default: ${REPO_ENV_VAR} or {DEFAULT_REPO})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    test = sub.add_parser("test", help="Run tests in a built checkout")
+    test.add_argument("repo_dir", type=str)
+    test.add_argument("test_files", nargs="*")
+    test.add_argument("--test-patch", type=str, default=os.environ.get(TEST_PATCH_ENV_VAR) or None,
+                      help=f"The problem's test.patch, to pick the changed test cases (default: ${TEST_PATCH_ENV_VAR})")
+    files = sub.add_parser("files", help="Print a problem's modified files and test files")
+    files.add_argument("problem_dir", type=str)
+    clean = sub.add_parser("clean", help="Reset a checkout: no local changes, no build tree, default branch")
+    clean.add_argument("repo_dir", type=str)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    adapter = get(args.repo)
+    if args.command == "test":
+        sys.stdout.reconfigure(line_buffering=True)
+        sys.exit(0 if adapter.run_tests(Path(args.repo_dir).resolve(), args.test_files, args.test_patch) else 1)
+    if args.command == "clean":
+        sys.exit(0 if adapter.clean(args.repo_dir) else 1)
+
+    problem_dir = Path(args.problem_dir)
+    with open(problem_dir / f"{problem_dir.name}.json") as f:
+        data = json.load(f)
+    print("modified_files:", " ".join(adapter.modified_files(data)))
+    print("modified_test_files:", " ".join(adapter.modified_test_files(data)))
+
+
+if __name__ == "__main__":
+    main()
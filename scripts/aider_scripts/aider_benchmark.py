@@ -4,11 +4,13 @@ Usage: python aider_benchmark.py --m <model_name> --k <num_completions> [--think
 Optional parameters:
   --thinking-tokens: Thinking tokens value (e.g., 0, 8k, 16k, 24k)
   --reasoning-effort: Reasoning effort level (low, medium, high)
+  --repo: Repository the benchmark is for (duckdb, clickhouse; see adapters.py)
 
 Examples:
   python aider_benchmark.py --m openrouter/openai/gpt-5 --k 5 --reasoning-effort low
   python aider_benchmark.py --m openrouter/google/gemini-2.5-pro --k 5 --thinking-tokens 8k
   python aider_benchmark.py --m openrouter/anthropic/claude-sonnet-4 --k 5 --thinking-tokens 0
+  python aider_benchmark.py --m openrouter/openai/gpt-5 --k 5 --repo clickhouse --dir benchmarks/clickhouse_unverified
 """
 
 import argparse, shutil
@@ -22,6 +24,35 @@ from email.message import EmailMessage
 import os
 from dotenv import load_dotenv
 import time
+import signal
+import re
+import threading
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+
+from segment_log import SegmentLog
+from failure_classifier import FailureClassifier, FAILURE_COLUMNS
+import adapters
+import build_profiles
+from jobserver import JobServer
+import cgroups
+import workspace
+import remote_compile
+import scheduler
+import planner
+from metrics import Exporter, RunMetrics
+import telemetry
+import flaky
+from flaky import FLAKY_COLUMNS
+import baseline
+from baseline import BASELINE_COLUMNS
+import symbol_index
+import bm25_index
+from bm25_index import RETRIEVAL_COLUMNS
+from builder import BUILD_STATS_COLUMNS, STATS_ENV_VAR, read_stats
+from run_history import TokenUsage, USAGE_COLUMNS
+from cache_manager import CacheManager
 
 debug = False
 
@@ -30,6 +61,7 @@ HONOURS_DIR = Path(__file__).resolve().parents[2]
 SCRIPT_DIR = Path(__file__).resolve().parent
 DEFAULT_BENCHMARK_DIR = (SCRIPT_DIR.parent.parent / "benchmarks/duckdb_benchmark").resolve()
 DEFAULT_OUTPUT_DIR = (SCRIPT_DIR.parent.parent / "archive").resolve()
+REPO_NAME = adapters.DEFAULT_REPO  # default --repo; the aider scripts work on repos/<repo>
 
 load_dotenv(dotenv_path=HONOURS_DIR / ".env")
 
@@ -49,18 +81,173 @@ def send_email_notification(subject, body, sender_email, app_password, recipient
         smtp.send_message(msg)
 
 
-def parse_arguments():
-    parser = argparse.ArgumentParser(description="Run benchmark pipeline")
+def add_run_arguments(parser):
+    """Options that define what a run computes (shared with the work queue coordinator)."""
     parser.add_argument("--m", required=True, help="Model to use")
     parser.add_argument("--k", type=int, required=True, help="Number of completions per problem")
     parser.add_argument("--dir", type=str, default=DEFAULT_BENCHMARK_DIR, help="Path to benchmark directory")
-    parser.add_argument("--out", type=str, default=DEFAULT_OUTPUT_DIR, help="Where to move organized results")
+    parser.add_argument("--repo", type=str, choices=list(adapters.ADAPTERS), default=REPO_NAME,
+                        help="Repository the benchmark's problems are for (see adapters.py)")
     parser.add_argument("--thinking-tokens", type=str, help="Thinking tokens value (e.g., 0, 8k, 16k, 24k)")
     parser.add_argument("--reasoning-effort", type=str, choices=['low', 'medium', 'high'], help="Reasoning effort level")
+    parser.add_argument("--build-profile", type=str, choices=list(build_profiles.PROFILES),
+                        help=f"Build profile (default for {REPO_NAME}: {build_profiles.default_profile(REPO_NAME)})")
+    parser.add_argument("--schedule", type=str, choices=["longest-first", "in-order"], default="longest-first",
+                        help="Attempt order: predicted longest first (see scheduler.py) or by problem id")
+    parser.add_argument("--context-map-tokens", type=int, default=0,
+                        help="Give aider a read-only map of related definitions of this many tokens (see symbol_index.py)")
+    parser.add_argument("--retrieve-files", type=int, default=0,
+                        help="Give aider the top N files retrieved from the issue (see bm25_index.py) instead of modified_files")
+    parser.add_argument("--flaky-policy", type=str, choices=flaky.POLICIES, default="retry",
+                        help="What to do with problems flaky.py found flaky: retry failed test stages or leave them out")
+    parser.add_argument("--flaky-retries", type=int, default=2,
+                        help="Extra test runs (on the same build) for a failed test stage of a flaky problem")
+    parser.add_argument("--baseline", action="store_true",
+                        help="Build and test the base state of problems without a cached failing baseline (see baseline.py) "
+                             "before their first attempt")
+    parser.add_argument("--metrics-port", type=int, help="Serve live Prometheus metrics on 127.0.0.1:<port>/metrics")
+    parser.add_argument("--metrics-interval", type=int, default=30,
+                        help="Seconds between writes of outputs/<run>/metrics.prom (see metrics.py)")
+
+
+def order_tasks(tasks, schedule, workers=None, prediction=None, repo=REPO_NAME):
+    """Order (problem_dir, ...) tasks for dispatch. `prediction` is scheduler.predict()'s result if already made."""
+    if schedule != "longest-first":
+        return tasks
+    predicted, from_history = prediction or scheduler.predict({task[0] for task in tasks}, repo=repo)
+    tasks = scheduler.longest_first(tasks, predicted)
+    known = sum(from_history.values())
+    print(f"Scheduling {len(tasks)} attempts longest first ({known}/{len(predicted)} problems predicted from earlier runs)")
+    if known and workers:
+        estimate = scheduler.makespan([predicted[task[0].name] for task in tasks], workers)
+        print(f"Predicted build+test makespan on {workers} worker(s): {estimate / 3600:.1f}h")
+    return tasks
+
+
+def add_host_arguments(parser):
+    """Options for how attempts run on this machine (shared with work queue workers)."""
+    parser.add_argument("--build-jobs", type=int, default=os.cpu_count(),
+                        help="Compile jobs allowed machine-wide across all concurrent builds (shared jobserver)")
+    parser.add_argument("--distributed", type=str, choices=remote_compile.MODES,
+                        help="Send compile jobs to distcc/icecream helpers when reachable (see remote_compile.py)")
+    parser.add_argument("--memory-max", type=str, help="memory.max for each build/test stage's cgroup (e.g. 32G)")
+    parser.add_argument("--cpu-max", type=float, help="CPU limit in cores for each build/test stage's cgroup")
+    parser.add_argument("--workspaces", action="store_true",
+                        help="Run each attempt in a copy-on-write overlay over a shared, pre-built base checkout")
+    parser.add_argument("--workspace-tmpfs", type=str, help="Put each workspace's upper layer on a tmpfs of this size (e.g. 16G)")
+    parser.add_argument("--workers", type=int, default=1, help="Attempts to run concurrently (requires --workspaces if > 1)")
+    parser.add_argument("--cache-budget", type=str,
+                        help="Disk budget for cached artifacts (CMake archives, workspaces, logs), e.g. 500G; LRU eviction")
+    parser.add_argument("--build-timeout", type=int, help="Seconds before a build is killed and recorded as a timeout")
+    parser.add_argument("--test-timeout", type=int, help="Seconds before a test run is killed and recorded as a timeout")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Run benchmark pipeline")
+    add_run_arguments(parser)
+    parser.add_argument("--out", type=str, default=DEFAULT_OUTPUT_DIR, help="Where to move organized results")
+    add_host_arguments(parser)
+    parser.add_argument("--telemetry-interval", type=float, default=5,
+                        help="Seconds between host CPU/memory/disk samples in outputs/<run>/telemetry.csv (0 to disable)")
+    parser.add_argument("--plan", action="store_true",
+                        help="Print the estimated wall-clock, spend and disk of this run (see planner.py) and exit")
     return parser.parse_args()
 
 
-def run(cmd, cwd=None, env=None, check=True, log_file=None, timeout=None):
+def setup_host(args):
+    """Validate this host's options and export the ones builds read from the environment."""
+    if args.workers > 1 and not args.workspaces:
+        raise SystemExit(f"--workers > 1 needs --workspaces: without them every attempt shares repos/{args.repo}")
+    if args.workspaces and not workspace.supported():
+        raise SystemExit("--workspaces needs root, util-linux unshare/nsenter and overlayfs")
+    if args.distributed:
+        # builder.py picks this up in every build, including the workspaces' warm builds
+        os.environ[remote_compile.MODE_ENV_VAR] = args.distributed
+
+
+def make_run_name(args, timestamp):
+    safe_model_name = args.m.replace("/", "_").replace(":", "_")
+
+    # Build run name with optional thinking tokens and reasoning effort
+    name_parts = [timestamp, safe_model_name]
+
+    if args.thinking_tokens:
+        name_parts.append(f"thinking{args.thinking_tokens}")
+
+    if args.reasoning_effort:
+        name_parts.append(f"reasoning{args.reasoning_effort}")
+
+    name_parts.append(f"k{args.k}")
+    return "_".join(name_parts)
+
+
+def write_meta(meta_path, args, run_name, timestamp, build_profile, **extra):
+    """Write a small run meta file for provenance."""
+    meta = {
+        "run_id": run_name,
+        "model": args.m,
+        "Kmax": args.k,
+        "benchmark_dir": str(Path(args.dir).resolve()),
+        "repo_root": str(HONOURS_DIR),
+        "timestamp": timestamp,
+        "build_profile": build_profile,
+        "schedule": args.schedule,
+        "repo": args.repo,
+    }
+    meta.update(extra)
+
+    # Add optional parameters to metadata
+    if args.thinking_tokens:
+        meta["thinking_tokens"] = args.thinking_tokens
+    if args.reasoning_effort:
+        meta["reasoning_effort"] = args.reasoning_effort
+    if args.context_map_tokens:
+        meta["context_map_tokens"] = args.context_map_tokens
+    if args.retrieve_files:
+        meta["retrieve_files"] = args.retrieve_files
+    if args.flaky_policy != "off":
+        meta["flaky_policy"] = args.flaky_policy
+    if args.baseline:
+        meta["baseline"] = True
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_problems(benchmark_dir):
+    """Yield (problem_dir, problem_data) in numeric order; problem_data is None without a JSON file."""
+    problems = sorted(
+        [p for p in Path(benchmark_dir).iterdir() if p.is_dir()],
+        key=lambda p: int(p.name)
+    )
+    for problem in problems:
+        # Parse json file to get problem details
+        problem_json = problem / f"{problem.name}.json"
+        if not problem_json.exists():
+            print(f"Problem JSON file not found for {problem.name}, skipping.")
+            yield problem, None
+            continue
+
+        with open(problem_json, 'r') as f:
+            yield problem, json.load(f)
+
+
+def add_failure(attempt_row, failure):
+    """Record a stage's failure columns, keeping an earlier stage's (e.g. aider's edit errors) if this one passed."""
+    if failure["failure_category"]:
+        attempt_row.update(failure)
+
+
+def run(cmd, cwd=None, env=None, check=True, log=None, timeout=None, classifier=None, cgroup=None):
+    """
+    Run a command, streaming its output into `log` (a segment_log.StageLog or any writable)
+    and every line into `classifier` (a failure_classifier.FailureClassifier, or a list of
+    objects with the same feed() method) if given.
+    With `cgroup` (a cgroups.StageCgroup) the command runs inside that cgroup.
+    """
+    if classifier is None:
+        classifier = []
+    elif not isinstance(classifier, (list, tuple)):
+        classifier = [classifier]
     if isinstance(cmd, str):
         shell = True
         printable_cmd = cmd
@@ -71,9 +258,11 @@ def run(cmd, cwd=None, env=None, check=True, log_file=None, timeout=None):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     header = f"[{timestamp}] Running command: {printable_cmd}\n"
 
-    if log_file:
-        with open(log_file, 'a') as f:
-            f.write(header)
+    if log:
+        log.write(header)
+
+    if cgroup:
+        cmd = cgroup.wrap(cmd)
 
     process = subprocess.Popen(
         cmd,
@@ -84,27 +273,41 @@ def run(cmd, cwd=None, env=None, check=True, log_file=None, timeout=None):
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         bufsize=1,
-        universal_newlines=True
+        universal_newlines=True,
+        # own process group so a timeout can kill make/ninja and all compiler children
+        start_new_session=timeout is not None
     )
 
     stdout_lines = []
     stderr_lines = []
 
-    with open(log_file, 'a') if log_file else open(os.devnull, 'w') as log:
-        from threading import Thread
-        def read_stream(stream, buffer, prefix):
-            for line in stream:
-                log.write(f"{prefix}: {line}")
-                log.flush()
-                buffer.append(line)
-
-        threads = []
-        threads.append(Thread(target=read_stream, args=(process.stdout, stdout_lines, "STDOUT")))
-        threads.append(Thread(target=read_stream, args=(process.stderr, stderr_lines, "STDERR")))
-        for t in threads:
-            t.start()
-        for t in threads:
-            t.join()
+    from threading import Thread
+    def read_stream(stream, buffer, prefix):
+        for line in stream:
+            if log:
+                # stdout is written as-is; only stderr lines are marked
+                log.write(f"{prefix}{line}")
+            for c in classifier:
+                c.feed(line, "stderr" if prefix else "stdout")
+            buffer.append(line)
+
+    threads = []
+    threads.append(Thread(target=read_stream, args=(process.stdout, stdout_lines, "")))
+    threads.append(Thread(target=read_stream, args=(process.stderr, stderr_lines, "STDERR: ")))
+    for t in threads:
+        t.start()
+
+    timed_out = False
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        os.killpg(process.pid, signal.SIGKILL)
+        if log:
+            log.write(f"Command timed out after {timeout}s: {printable_cmd}\n")
+
+    for t in threads:
+        t.join()
 
     return_code = process.wait()
 
@@ -112,197 +315,334 @@ def run(cmd, cwd=None, env=None, check=True, log_file=None, timeout=None):
         raise subprocess.CalledProcessError(return_code, cmd, output=''.join(stdout_lines), stderr=''.join(stderr_lines))
 
     class Result:
-        def __init__(self, returncode, stdout, stderr):
+        def __init__(self, returncode, stdout, stderr, timed_out):
             self.returncode = returncode
             self.stdout = stdout
             self.stderr = stderr
+            self.timed_out = timed_out
+
+    return Result(return_code, ''.join(stdout_lines), ''.join(stderr_lines), timed_out)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def shared_index(index_class, adapter):
+    """One SymbolIndex / Bm25Index per repository and process, opened on first use."""
+    with _indexes_lock:
+        key = (index_class, adapter.name)
+        if key not in _indexes:
+            _indexes[key] = index_class(adapter.source_repo)
+        return _indexes[key]
+
+
+def ensure_baseline(args, logs, problem, problem_data, attempt_idx, build_cmd, test_cmd, env=None, wrap=lambda cmd: cmd):
+    """Build and test the unfixed base state where `wrap` runs and cache its baseline, unless it is cached already."""
+    base_commit = problem_data["base_commit"]
+    test_patch = problem / "test.patch"
+    with baseline.lock(base_commit, test_patch):
+        if baseline.load(base_commit, test_patch):
+            return
+        print(f"🧪 Computing the failing baseline of {problem.name}")
+        with logs.stage(problem.name, attempt_idx, "baseline") as log:
+            bld = run(wrap(build_cmd), env=env, log=log, check=False, timeout=args.build_timeout)
+            if bld.returncode != 0 or bld.timed_out:
+                print(f"⚠️ Baseline build failed for {problem.name}, attempts won't be compared with it")
+                return
+            tst = run(wrap(test_cmd), env=env, log=log, check=False, timeout=args.test_timeout)
+        baseline.record(base_commit, test_patch, tst.stdout, tst.returncode == 0 and not tst.timed_out, "runner")
+
+
+def run_attempt(args, run_name, logs, cache, build_profile, problem, problem_data, attempt_idx):
+    """Run one attempt (setup, generate, build, test) and return its row for the attempts CSV."""
+    adapter = adapters.use(args.repo)
+    base_commit = problem_data.get("base_commit")
+    modified_files = adapter.modified_files(problem_data)
+    modified_test_files = adapter.modified_test_files(problem_data)
+    build_cmd = ["bash", "scripts/aider_scripts/build.sh", str(HONOURS_DIR), build_profile] + modified_test_files
+    test_cmd = ["bash", "scripts/aider_scripts/run_tests.sh", str(HONOURS_DIR)] + modified_test_files
+    test_patch_env = {adapters.TEST_PATCH_ENV_VAR: str(problem.resolve() / "test.patch")}
+    print(f"Generating completion {attempt_idx} for {problem.name} using model {args.m}")
+
+    # Default per-attempt outcomes
+    attempt_row = {
+        "problem": problem.name,
+        "attempt_index": attempt_idx,
+        "generation_success": 0,
+        "build_success": 0,
+        "test_success": 0,
+    }
+    attempt_row.update({column: "" for column in FAILURE_COLUMNS})
+    attempt_row.update(cgroups.combine([]))
+    attempt_row.update({column: "" for column in USAGE_COLUMNS + BUILD_STATS_COLUMNS + RETRIEVAL_COLUMNS + FLAKY_COLUMNS + BASELINE_COLUMNS})
+    stage_usage = []
+
+    # Without workspaces every attempt resets and reuses repos/<repo>
+    ws = None
+    env = None
+    wrap = lambda cmd: cmd
+    pins = ExitStack()
+
+    with logs.stage(problem.name, attempt_idx, "setup") as log:
+        if args.workspaces:
+            lower = workspace.LowerLayer(problem, base_commit, build_profile, source_repo=adapter.source_repo)
+            # Pinned before it exists, so another worker's eviction can't race the preparation
+            pins.enter_context(cache.pin(lower.dir))
+            if not lower.ready():
+                print(f"Preparing shared base checkout and warm build for {problem.name}")
+            lower.prepare(build_cmd, run, log=log, cache=cache)
+            ws_name = re.sub(r"[^\w.-]", "_", f"{run_name}.{problem.name}.{attempt_idx}")
+        else:
+            # reset repo
+            run(["bash", "scripts/aider_scripts/clean_repo.sh", str(HONOURS_DIR)], log=log)
+            # checkout base commit
+            run(["bash", "scripts/aider_scripts/checkout.sh", str(HONOURS_DIR), base_commit], log=log)
+            # apply test patch
+            test_patch_path = problem / "test.patch"
+            run(["bash", "scripts/aider_scripts/apply_test_patch.sh", str(HONOURS_DIR), str(test_patch_path)], log=log)
+
+    # Its own stage, after setup's has closed (one open stage per attempt segment)
+    if args.baseline and args.workspaces:
+        if not baseline.load(base_commit, problem / "test.patch"):
+            # In a throwaway workspace, so the tests' own files stay out of the attempt's
+            with workspace.Workspace(lower, f"{ws_name}.baseline", tmpfs_size=args.workspace_tmpfs) as base_ws:
+                ensure_baseline(args, logs, problem, problem_data, attempt_idx, build_cmd, test_cmd,
+                                env=dict(base_ws.env(), **test_patch_env), wrap=base_ws.wrap)
+    elif args.baseline:
+        # The attempt's build is then incremental on top of this one
+        ensure_baseline(args, logs, problem, problem_data, attempt_idx, build_cmd, test_cmd,
+                        env=dict(os.environ, **test_patch_env))
+    if args.workspaces:
+        ws = workspace.Workspace(lower, ws_name, tmpfs_size=args.workspace_tmpfs).start()
+        env, wrap = ws.env(), ws.wrap
+
+    try:
+        # generate fix (one-shot)
+        generate_cmd = ["bash", "scripts/aider_scripts/generate_fix.sh", str(HONOURS_DIR), str(problem), str(problem.name), str(args.m)]
+
+        # Add optional parameters
+        if args.thinking_tokens:
+            generate_cmd.extend(["--thinking-tokens", args.thinking_tokens])
+        if args.reasoning_effort:
+            generate_cmd.extend(["--reasoning-effort", args.reasoning_effort])
+        # Normalized by the adapter (the unverified benchmarks store them as Python list literals)
+        files = modified_files
+        if args.retrieve_files:
+            files = bm25_index.problem_files(shared_index(bm25_index.Bm25Index, adapter), problem_data, args.retrieve_files)
+            attempt_row["retrieved_files"] = " ".join(files)
+            attempt_row["retrieval_recall"] = bm25_index.recall(files, modified_files)
+        generate_cmd.extend(["--files", " ".join(files)])
+        if args.context_map_tokens:
+            context_map = symbol_index.problem_context_map(shared_index(symbol_index.SymbolIndex, adapter), problem, problem_data,
+                                                           args.context_map_tokens, seed_files=files)
+            generate_cmd.extend(["--context-map", str(context_map)])
+
+        classifier = FailureClassifier("generate")
+        usage = TokenUsage()
+        with logs.stage(problem.name, attempt_idx, "generate") as log:
+            gen = run(
+                wrap(generate_cmd),
+                env=env,
+                log=log,
+                check=False,
+                classifier=[classifier, usage]
+            )
+        attempt_row.update(usage.columns())
+        attempt_row["generation_success"] = int(gen.returncode == 0)
+        attempt_row.update(classifier.finish(gen.returncode, gen.timed_out))
+
+        if not attempt_row["generation_success"]:
+            print(f"❌ Completion generation failed for {problem.name} attempt {attempt_idx}, skipping build/tests.")
+            return attempt_row
+
+        print(f"✅ Completion generated for {problem.name} attempt {attempt_idx}")
+
+        # build
+        classifier = FailureClassifier("build")
+        with logs.stage(problem.name, attempt_idx, "build") as log, \
+                cgroups.StageCgroup(f"{run_name}.{problem.name}.{attempt_idx}.build", args.memory_max, args.cpu_max) as cg, \
+                tempfile.NamedTemporaryFile(prefix="build_stats.", suffix=".json") as stats:
+            build_env = dict(env or os.environ, **{STATS_ENV_VAR: stats.name})
+            bld = run(wrap(build_cmd), env=build_env, log=log, check=False,
+                      timeout=args.build_timeout, classifier=classifier, cgroup=cg)
+            stage_usage.append(cg.stats())
+            attempt_row.update(read_stats(stats.name))
+        attempt_row.update(cgroups.combine(stage_usage))
+        add_failure(attempt_row, classifier.finish(bld.returncode, bld.timed_out, attempt_row["oom_killed"] == 1))
+        if bld.returncode != 0 or bld.timed_out:
+            print(f"❌ Build failed for {problem.name} attempt {attempt_idx} ({attempt_row['failure_category']}), skipping tests.")
+            return attempt_row
+
+        print(f"✅ Build successful for {problem.name} attempt {attempt_idx}")
+        attempt_row["build_success"] = 1
+
+        # test; a flaky problem's failed test stage is run again on the same build
+        retries = args.flaky_retries if args.flaky_policy == "retry" and flaky.is_flaky(problem, problem_data) else 0
+        test_env = dict(env or os.environ, **test_patch_env)
+        for retry in range(retries + 1):
+            stage = "test" if retry == 0 else f"test_retry{retry}"
+            classifier = FailureClassifier("test")
+            with logs.stage(problem.name, attempt_idx, stage) as log, \
+                    cgroups.StageCgroup(f"{run_name}.{problem.name}.{attempt_idx}.{stage}", args.memory_max, args.cpu_max) as cg:
+                tst = run(wrap(test_cmd), env=test_env, log=log, check=False,
+                          timeout=args.test_timeout, classifier=classifier, cgroup=cg)
+                stage_usage.append(cg.stats())
+            attempt_row["test_retries"] = retry
+            if tst.returncode == 0 and not tst.timed_out:
+                break
+            if retry < retries:
+                print(f"⚠️ Tests failed for flaky problem {problem.name} attempt {attempt_idx}, retrying ({retry + 1}/{retries})")
+        attempt_row.update(cgroups.combine(stage_usage))
+        # The test stage decides: a passing attempt has no failure columns, whatever aider complained about
+        attempt_row.update(classifier.finish(tst.returncode, tst.timed_out, stage_usage[-1]["oom_killed"] == 1))
+        # What the attempt did to the failing tests: nothing, part of the fix, or something else
+        attempt_row["vs_baseline"] = baseline.compare(baseline.load(base_commit, problem / "test.patch"), tst.stdout,
+                                                      tst.returncode == 0 and not tst.timed_out)
+        if tst.returncode == 0 and not tst.timed_out:
+            print(f"✅ Tests passed for {problem.name} attempt {attempt_idx}")
+            attempt_row["test_success"] = 1
+        else:
+            print(f"❌ Tests failed for {problem.name} attempt {attempt_idx} ({attempt_row['failure_category']})")
+        return attempt_row
+    finally:
+        if ws:
+            ws.discard()
+        pins.close()
+
+
+ATTEMPTS_HEADERS = ["problem", "attempt_index", "generation_success", "build_success", "test_success"] + FAILURE_COLUMNS + cgroups.RESOURCE_COLUMNS \
+    + USAGE_COLUMNS + BUILD_STATS_COLUMNS + RETRIEVAL_COLUMNS + FLAKY_COLUMNS + BASELINE_COLUMNS
+SUMMARY_HEADERS = ["problem", "total_generations", "successful_builds", "failed_builds", "passed_tests", "failed_tests"]
+
+
+def new_summary(problem_name):
+    return {
+        "problem": problem_name,
+        "total_generations": 0,
+        "successful_builds": 0,
+        "failed_builds": 0,
+        "passed_tests": 0,
+        "failed_tests": 0,
+    }
 
-    return Result(return_code, ''.join(stdout_lines), ''.join(stderr_lines))
+
+def write_summary(path, results):
+    with open(path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=SUMMARY_HEADERS)
+        writer.writeheader()
+        for row in results.values():
+            writer.writerow(row)
+
+
+def record_attempt(summary, attempt_row):
+    """Add one attempt's outcome to its problem's summary row."""
+    summary["total_generations"] += 1
+    if not attempt_row["generation_success"]:
+        return
+    if not attempt_row["build_success"]:
+        summary["failed_builds"] += 1
+        return
+    summary["successful_builds"] += 1
+    if attempt_row["test_success"]:
+        summary["passed_tests"] += 1
+    else:
+        summary["failed_tests"] += 1
 
 
 def main():
     args = parse_arguments()
+    if args.plan:
+        planner.plan([args.m], args.k, args.dir, args.workers, args.workspaces, repo=args.repo)
+        return
+    setup_host(args)
+    adapters.use(args.repo)
     start_time = time.time()
+    build_profile = args.build_profile or build_profiles.default_profile(args.repo)
     print(f"Model: {args.m}, Completions: {args.k}, Benchmark Directory: {args.dir}, Output Directory: {args.out}")
 
     # Logging setup
     timestamp = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
-    safe_model_name = args.m.replace("/", "_").replace(":", "_")
-    
-    # Build run name with optional thinking tokens and reasoning effort
-    name_parts = [timestamp, safe_model_name]
-    
-    if args.thinking_tokens:
-        name_parts.append(f"thinking{args.thinking_tokens}")
-    
-    if args.reasoning_effort:
-        name_parts.append(f"reasoning{args.reasoning_effort}")
-    
-    name_parts.append(f"k{args.k}")
-    run_name = "_".join(name_parts)
+    run_name = make_run_name(args, timestamp)
 
     output_dir = Path("outputs") / run_name
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    log_path = output_dir / f"{run_name}.log"
+    logs = SegmentLog(output_dir)
+    sampler = None
+    if args.telemetry_interval:
+        sampler = telemetry.Sampler(output_dir / telemetry.FILE_NAME, args.telemetry_interval).start()
+        logs.listeners.append(sampler)
     summary_csv_path = output_dir / f"{run_name}_summary.csv"
     attempts_csv_path = output_dir / f"{run_name}_attempts.csv"
 
-    # Write a small run meta file for provenance
-    meta_path = output_dir / f"{run_name}_meta.json"
-    meta = {
-        "run_id": run_name,
-        "model": args.m,
-        "Kmax": args.k,
-        "benchmark_dir": str(Path(args.dir).resolve()),
-        "repo_root": str(HONOURS_DIR),
-        "timestamp": timestamp,
-    }
-    
-    # Add optional parameters to metadata
-    if args.thinking_tokens:
-        meta["thinking_tokens"] = args.thinking_tokens
-    if args.reasoning_effort:
-        meta["reasoning_effort"] = args.reasoning_effort
-    with open(meta_path, "w") as f:
-        json.dump(meta, f, indent=2)
+    quarantined = flaky.quarantined(load_problems(args.dir), args.flaky_policy)
+    if quarantined:
+        print(f"⚠️ Quarantined {len(quarantined)} flaky problem(s): {' '.join(quarantined)}")
 
-    # Prepare CSV writers
-    attempts_headers = ["problem", "attempt_index", "generation_success", "build_success", "test_success"]
-    summary_headers = ["problem", "total_generations", "successful_builds", "failed_builds", "passed_tests", "failed_tests"]
+    meta_path = output_dir / f"{run_name}_meta.json"
+    write_meta(meta_path, args, run_name, timestamp, build_profile,
+               workspaces=args.workspaces, workers=args.workers, quarantined=quarantined)
 
     # Keep per-problem summary in memory
     results = {}
+    csv_lock = threading.Lock()
+
+    # Everything cached outside this run (and its own logs, once finished) shares one disk budget
+    cache = CacheManager(args.cache_budget)
+    cache.sweep_trash()
+    cache.enforce()
+
+    # One jobserver bounds compile jobs across every build this (or any other) run starts
+    job_server = JobServer(args.build_jobs).start()
+    os.environ.update(job_server.env())
+    exporter = None
 
     try:
         # Open attempts CSV once and append rows as we go
         with open(attempts_csv_path, 'w', newline='') as attempts_csv:
-            attempts_writer = csv.DictWriter(attempts_csv, fieldnames=attempts_headers)
+            attempts_writer = csv.DictWriter(attempts_csv, fieldnames=ATTEMPTS_HEADERS)
             attempts_writer.writeheader()
 
-            problems = sorted(
-                [p for p in Path(args.dir).iterdir() if p.is_dir()],
-                key=lambda p: int(p.name)
-            )
-            for problem in problems:
-                print(f"Processing problem: {problem.name}")
-
-                results[problem.name] = {
-                    "problem": problem.name,
-                    "total_generations": 0,
-                    "successful_builds": 0,
-                    "failed_builds": 0,
-                    "passed_tests": 0,
-                    "failed_tests": 0,
-                }
-
-                # Parse json file to get problem details
-                problem_json = problem / f"{problem.name}.json"
-                if not problem_json.exists():
-                    print(f"Problem JSON file not found for {problem.name}, skipping.")
+            tasks = []
+            for problem, problem_data in load_problems(args.dir):
+                if problem.name in quarantined:
+                    continue
+                results[problem.name] = new_summary(problem.name)
+                if problem_data is None:
                     continue
-
-                with open(problem_json, 'r') as f:
-                    problem_data = json.load(f)
-
-                base_commit = problem_data.get("base_commit")
-                modified_test_files = problem_data.get("modified_test_files", [])
-
                 for i in range(args.k):
-                    attempt_idx = i + 1
-                    print(f"Generating completion {attempt_idx} for {problem.name} using model {args.m}")
-
-                    # reset repo
-                    run(["bash", "scripts/aider_scripts/clean_repo.sh", str(HONOURS_DIR)], log_file=log_path)
-                    # checkout base commit
-                    run(["bash", "scripts/aider_scripts/checkout.sh", str(HONOURS_DIR), base_commit], log_file=log_path)
-                    # apply test patch
-                    test_patch_path = problem / "test.patch"
-                    run(["bash", "scripts/aider_scripts/apply_test_patch.sh", str(HONOURS_DIR), str(test_patch_path)], log_file=log_path)
-
-                    # generate fix (one-shot)
-                    generate_cmd = ["bash", "scripts/aider_scripts/generate_fix.sh", str(HONOURS_DIR), str(problem), str(problem.name), str(args.m)]
-                    
-                    # Add optional parameters
-                    if args.thinking_tokens:
-                        generate_cmd.extend(["--thinking-tokens", args.thinking_tokens])
-                    if args.reasoning_effort:
-                        generate_cmd.extend(["--reasoning-effort", args.reasoning_effort])
-                    
-                    gen = run(
-                        generate_cmd,
-                        log_file=log_path,
-                        check=False
-                    )
-                    generation_success = int(gen.returncode == 0)
-                    results[problem.name]["total_generations"] += 1
-
-                    # Default per-attempt outcomes
-                    build_success = 0
-                    test_success = 0
-
-                    if not generation_success:
-                        print(f"❌ Completion generation failed for {problem.name} attempt {attempt_idx}, skipping build/tests.")
-                        # record attempt row
-                        attempts_writer.writerow({
-                            "problem": problem.name,
-                            "attempt_index": attempt_idx,
-                            "generation_success": generation_success,
-                            "build_success": build_success,
-                            "test_success": test_success,
-                        })
-                        attempts_csv.flush()
-                        continue
-
-                    print(f"✅ Completion generated for {problem.name} attempt {attempt_idx}")
-
-                    # build
-                    bld = run(["bash", "scripts/aider_scripts/build.sh", str(HONOURS_DIR)], log_file=log_path, check=False)
-                    if bld.returncode != 0:
-                        print(f"❌ Build failed for {problem.name} attempt {attempt_idx}, skipping tests.")
-                        results[problem.name]["failed_builds"] += 1
-                        # record attempt row
-                        attempts_writer.writerow({
-                            "problem": problem.name,
-                            "attempt_index": attempt_idx,
-                            "generation_success": generation_success,
-                            "build_success": build_success,
-                            "test_success": test_success,
-                        })
-                        attempts_csv.flush()
-                        continue
-
-                    print(f"✅ Build successful for {problem.name} attempt {attempt_idx}")
-                    results[problem.name]["successful_builds"] += 1
-                    build_success = 1
-
-                    # test
-                    tst = run(["bash", "scripts/aider_scripts/run_tests.sh", str(HONOURS_DIR)] + modified_test_files, log_file=log_path, check=False)
-                    if tst.returncode == 0:
-                        print(f"✅ Tests passed for {problem.name} attempt {attempt_idx}")
-                        results[problem.name]["passed_tests"] += 1
-                        test_success = 1
-                    else:
-                        print(f"❌ Tests failed for {problem.name} attempt {attempt_idx}")
-                        results[problem.name]["failed_tests"] += 1
-                        test_success = 0
-
-                    # record attempt row
-                    attempts_writer.writerow({
-                        "problem": problem.name,
-                        "attempt_index": attempt_idx,
-                        "generation_success": generation_success,
-                        "build_success": build_success,
-                        "test_success": test_success,
-                    })
+                    tasks.append((problem, problem_data, i + 1))
+            prediction = scheduler.predict({task[0] for task in tasks}, repo=args.repo)
+            tasks = order_tasks(tasks, args.schedule, args.workers, prediction)
+            eta = planner.Eta({(problem.name, idx): prediction[0][problem.name] for problem, _, idx in tasks})
+            metrics = RunMetrics(run_name, len(tasks), args.workers, eta)
+            logs.listeners.append(metrics)
+            exporter = Exporter(metrics, output_dir, args.metrics_interval, args.metrics_port).start()
+
+            def attempt_task(problem, problem_data, attempt_idx):
+                metrics.attempt_started()
+                row = run_attempt(args, run_name, logs, cache, build_profile, problem, problem_data, attempt_idx)
+                with csv_lock:
+                    metrics.attempt_finished(row)
+                    record_attempt(results[problem.name], row)
+                    attempts_writer.writerow(row)
                     attempts_csv.flush()
+                    print(eta.done((problem.name, attempt_idx)))
+                cache.enforce()
+
+            with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                futures = [pool.submit(attempt_task, *task) for task in tasks]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except KeyboardInterrupt:
+                    # Attempts already running finish; queued ones are dropped
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
 
         # write summary CSV
-        with open(summary_csv_path, 'w', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=summary_headers)
-            writer.writeheader()
-            for row in results.values():
-                writer.writerow(row)
+        write_summary(summary_csv_path, results)
 
         print(f"Results and logs saved to {output_dir}")
 
@@ -333,19 +673,26 @@ def main():
         print("Emergency stop requested. Writing results to CSV and exiting")
         # Partial summary dump
         partial_summary = summary_csv_path.with_name(f"{summary_csv_path.stem}_partial.csv")
-        with open(partial_summary, 'w', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=summary_headers)
-            writer.writeheader()
-            for row in results.values():
-                writer.writerow(row)
+        write_summary(partial_summary, results)
         print(f"Partial summary saved to {partial_summary}")
 
         # attempt CSV already has rows flushed incrementally
-        # Cleanup
-        try:
-            run(["bash", "scripts/aider_scripts/clean_repo.sh", str(HONOURS_DIR)], log_file=log_path)
-        except Exception:
-            pass
+        # Cleanup (workspaces never touch repos/<repo>)
+        if not args.workspaces:
+            try:
+                with logs.stage("_run", 0, "cleanup") as log:
+                    run(["bash", "scripts/aider_scripts/clean_repo.sh", str(HONOURS_DIR)], log=log)
+            except Exception:
+                pass
+    finally:
+        if exporter:
+            exporter.stop()
+        if sampler:
+            sampler.stop()
+        job_server.stop()
+        # Older runs' logs become evictable; this run's are the most recently used
+        cache.register(output_dir / "logs", "logs")
+        cache.enforce()
 
 
 if __name__ == "__main__":
@@ -3,7 +3,7 @@
 HONOURS_DIR="$1"
 TEST_PATCH_PATH="$2"
 
-DUCKDB_DIR="$HONOURS_DIR/repos/duckdb"
+DUCKDB_DIR="${REPO_DIR:-$HONOURS_DIR/repos/${HONOURS_REPO:-duckdb}}"
 
 cd "$DUCKDB_DIR" || exit 1
 
@@ -0,0 +1,208 @@
+"""
+Usage: python baseline.py compute [--dir <benchmark_dir>] [--repo duckdb] [--problems <id> ...]
+       python baseline.py show <problem_dir>
+
+Cached "red" baselines: how a problem's tests fail at base_commit with test.patch applied and no
+fix, computed once per (base_commit, test.patch hash) and kept in cache/baselines/<commit>-<hash>.json:
+
+  tests        {test: passed} from the "Test passed: X" / "Test failed: X" lines of run_tests.sh
+  signature    the failure lines of the output (mismatches, crashes, failed gtest cases, see
+               failure_classifier.py), normalized, sorted and deduplicated
+  passed       whether the whole test run passed (it shouldn't for a valid problem)
+  source       what computed it: verify (verify_PRs.py), workspace (the lower layer's warm build),
+               runner (aider_benchmark.py --baseline) or compute
+
+With a baseline, the runner can tell what a failing attempt did. The attempts CSV's vs_baseline is
+  fixed        the tests pass
+  partial      fewer tests fail than at baseline, or the same tests with a subset of its failures
+  unchanged    the same tests fail the same way as at baseline: the attempt changed nothing that matters
+  changed      the same tests fail, but differently
+  regressed    tests that passed at baseline fail now
+and is empty without a baseline.
+
+verify_PRs.py records the baseline when it checks that test.patch fails and skips that build and
+test run for problems whose baseline is already cached. Workspaces record it from the warm build
+of the lower layer; without workspaces, `aider_benchmark.py --baseline` builds and tests the base
+state before the first attempt of a problem that has none. `compute` does the same up front.
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import adapters
+import build_profiles
+from failure_classifier import PATTERNS
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+SCRIPT_DIR = Path(__file__).resolve().parent
+CACHE_DIR = HONOURS_DIR / "cache" / "baselines"
+BASELINE_COLUMNS = ["vs_baseline"]
+MAX_SIGNATURE_LINES = 50
+
+RESULT_LINE = re.compile(r"^Test (passed|failed): (\S+)")
+SIGNATURE_PATTERNS = [pattern for category, pattern in PATTERNS if category in ("crash", "test_mismatch")] + [
+    re.compile(r"^\[  FAILED  \] \S+"),  # gtest case
+    re.compile(r"^Test failed: "),
+]
+# Parts of failure lines that differ between runs of the same failure
+VOLATILE = [
+    (re.compile(r"0x[0-9a-fA-F]+"), "0x?"),
+    (re.compile(r"\s*\(\d+ ms(?: total)?\)"), ""),
+    (re.compile(r"/tmp/\S+"), "/tmp/?"),
+]
+
+
+def patch_hash(path):
+    path = Path(path)
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:12] if path.exists() else "none"
+
+
+def cache_path(base_commit, test_patch):
+    return CACHE_DIR / f"{base_commit[:12]}-{patch_hash(test_patch)}.json"
+
+
+def test_results(output):
+    """{test: passed} from run_tests.sh output."""
+    results = {}
+    for line in output.splitlines():
+        match = RESULT_LINE.match(line)
+        if match:
+            results[match.group(2)] = match.group(1) == "passed"
+    return results
+
+
+def signature(output):
+    lines = set()
+    for line in output.splitlines():
+        line = line.strip()
+        if any(pattern.search(line) for pattern in SIGNATURE_PATTERNS):
+            for pattern, replacement in VOLATILE:
+                line = pattern.sub(replacement, line)
+            lines.add(line[:300])
+    return sorted(lines)[:MAX_SIGNATURE_LINES]
+
+
+def record(base_commit, test_patch, output, passed, source):
+    """Store the baseline of (base_commit, test_patch) from one test run's output."""
+    baseline = {
+        "base_commit": base_commit,
+        "test_patch": patch_hash(test_patch),
+        "passed": bool(passed),
+        "tests": test_results(output),
+        "signature": signature(output),
+        "source": source,
+        "created": round(time.time(), 3),
+    }
+    path = cache_path(base_commit, test_patch)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(baseline, indent=2) + "\n")
+    tmp.replace(path)
+    return baseline
+
+
+def load(base_commit, test_patch):
+    path = cache_path(base_commit, test_patch)
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+@contextmanager
+def lock(base_commit, test_patch):
+    """Held while computing a baseline, so concurrent attempts of a problem compute it once."""
+    path = cache_path(base_commit, test_patch).with_suffix(".lock")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def compare(baseline, output, passed):
+    """vs_baseline of one attempt's test run."""
+    if passed:
+        return "fixed"
+    if not baseline:
+        return ""
+    before = {test for test, ok in baseline["tests"].items() if not ok}
+    now = {test for test, ok in test_results(output).items() if not ok}
+    if now - before:
+        return "regressed"
+    if now < before:
+        return "partial"
+    old, new = set(baseline["signature"]), set(signature(output))
+    if new == old:
+        return "unchanged"
+    return "partial" if new < old else "changed"
+
+
+def script(name, *args, capture=False):
+    return subprocess.run(["bash", str(SCRIPT_DIR / name), str(HONOURS_DIR), *args],
+                          capture_output=capture, text=True)
+
+
+def compute(adapter, problem, problem_data, build_profile, source="compute"):
+    """Build base_commit + test.patch in repos/<repo>, run the tests and record the baseline."""
+    test_files = adapter.modified_test_files(problem_data)
+    test_patch = problem / "test.patch"
+    script("clean_repo.sh")
+    script("checkout.sh", problem_data["base_commit"])
+    script("apply_test_patch.sh", str(test_patch))
+    if script("build.sh", build_profile, *test_files).returncode != 0:
+        print(f"❌ Baseline build failed for {problem.name}")
+        return None
+    tests = script("run_tests.sh", *test_files, capture=True)
+    baseline = record(problem_data["base_commit"], test_patch, tests.stdout, tests.returncode == 0, source)
+    failing = sum(1 for ok in baseline["tests"].values() if not ok)
+    print(f"{'⚠️' if baseline['passed'] else '✅'} Baseline of {problem.name}: {failing} of {len(baseline['tests'])} "
+          f"test(s) fail, {len(baseline['signature'])} failure line(s)")
+    return baseline
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Cached failing baselines (base_commit + test.patch) of benchmark problems")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compute_parser = sub.add_parser("compute", help="Build and test the base state of problems without a cached baseline")
+    compute_parser.add_argument("--dir", type=str, help="Benchmark directory (default: the repo's benchmark)")
+    compute_parser.add_argument("--repo", type=str, choices=list(adapters.ADAPTERS), default=adapters.DEFAULT_REPO)
+    compute_parser.add_argument("--problems", nargs="*", help="Only these problem ids")
+    compute_parser.add_argument("--build-profile", type=str, choices=list(build_profiles.PROFILES))
+    show_parser = sub.add_parser("show", help="Print a problem's cached baseline")
+    show_parser.add_argument("problem_dir", type=str)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.command == "show":
+        problem = Path(args.problem_dir)
+        with open(problem / f"{problem.name}.json") as f:
+            data = json.load(f)
+        baseline = load(data["base_commit"], problem / "test.patch")
+        print(json.dumps(baseline, indent=2) if baseline else f"No baseline cached for {problem.name}")
+        return
+
+    sys.stdout.reconfigure(line_buffering=True)
+    adapter = adapters.use(args.repo)
+    benchmark_dir = Path(args.dir or adapter.benchmark_dir).resolve()
+    build_profile = args.build_profile or build_profiles.default_profile(adapter.name)
+    for problem in sorted(benchmark_dir.iterdir()):
+        if args.problems and problem.name not in args.problems:
+            continue
+        if not (problem / f"{problem.name}.json").exists():
+            continue
+        with open(problem / f"{problem.name}.json") as f:
+            data = json.load(f)
+        if load(data["base_commit"], problem / "test.patch"):
+            continue
+        compute(adapter, problem, data, build_profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Usage: python bm25_index.py build [--dir <benchmark_dir>]
+       python bm25_index.py query <problem_dir> [--n 10]
+       python bm25_index.py evaluate [--dir <benchmark_dir>] [--n 10]
+
+Lexical (BM25) retrieval of the files a problem is likely about, from its problem_statement alone.
+
+Our prompts name the files to edit from the gold patch's modified_files, which gives away where the
+fix goes and doesn't exist for new problems. This index ranks every source file of the repo at the
+problem's base_commit instead. Files are tokenized into their path components, identifiers (split
+on camelCase and snake_case, and kept whole) and comment words; path tokens count PATH_WEIGHT times.
+
+Like symbol_index.py (whose git helpers it uses), term counts are stored per blob in
+cache/bm25_index/<repo>.sqlite, so a file is tokenized once however many commits contain it, and a
+commit's tree is derived from the indexed commit closest in commit time with `git diff-tree`.
+
+`evaluate` reports how many of each problem's modified_files are in its top N.
+aider_benchmark.py --retrieve-files N gives aider the top N files instead of modified_files.
+"""
+
+import argparse
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+
+import adapters
+import symbol_index
+from symbol_index import closest, db_for, diff_tree, list_tree, read_blobs, resolve
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+DB_DIR = HONOURS_DIR / "cache" / "bm25_index"
+DEFAULT_REPO = symbol_index.DEFAULT_REPO
+DEFAULT_BENCHMARK_DIR = symbol_index.DEFAULT_BENCHMARK_DIR
+
+TOKENIZER_VERSION = 1
+K1 = 1.2
+B = 0.75
+PATH_WEIGHT = 5
+MAX_QUERY_TERMS = 64
+
+RETRIEVAL_COLUMNS = ["retrieved_files", "retrieval_recall"]
+
+WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+STOPWORDS = set("""
+    the and for are but not you all any can had her was one our out has have this that with from they
+    will would there their what when which who how into been were then than them these those its also
+    should could does did just only some such very like use used using get set new case return const
+    auto void bool int include namespace duckdb std unique_ptr make_uniq idx_t string vector null true false
+    cpp hpp src
+""".split())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (blob TEXT PRIMARY KEY, length INTEGER NOT NULL, version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, blob TEXT NOT NULL, tf INTEGER NOT NULL,
+                                     PRIMARY KEY (term, blob)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS commits (commit_id TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS trees (commit_id TEXT NOT NULL, path TEXT NOT NULL, blob TEXT NOT NULL,
+                                  path_terms TEXT NOT NULL, PRIMARY KEY (commit_id, path)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trees_blob ON trees (commit_id, blob);
+"""
+
+
+def tokenize(text):
+    """Lowercased terms of identifiers and words: whole identifiers and their camelCase/snake_case parts."""
+    terms = []
+    for word in WORD.findall(text):
+        parts = [p.lower() for piece in word.split("_") for p in CAMEL.findall(piece)]
+        whole = word.lower()
+        if len(parts) > 1 and len(whole) > 2 and whole not in STOPWORDS:
+            terms.append(whole)
+        terms += [p for p in parts if len(p) > 2 and p not in STOPWORDS and not p.isdigit()]
+    return terms
+
+
+def path_terms(path):
+    return tokenize(path.replace("/", " ").replace(".", " "))
+
+
+class Bm25Index:
+    def __init__(self, repo=DEFAULT_REPO, db_path=None):
+        self.repo = Path(repo)
+        db_path = db_path or db_for(DB_DIR, repo)
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+
+    def index_commit(self, commit):
+        """Index `commit` if it isn't yet. Returns its full commit id."""
+        commit = resolve(self.repo, commit)
+        with self._lock:
+            if self.db.execute("SELECT 1 FROM commits WHERE commit_id = ?", (commit,)).fetchone():
+                return commit
+            indexed = [row[0] for row in self.db.execute("SELECT commit_id FROM commits")]
+            base = closest(self.repo, commit, indexed)
+            if base:
+                tree = dict(self.db.execute("SELECT path, blob FROM trees WHERE commit_id = ?", (base,)))
+                for path, blob in diff_tree(self.repo, base, commit).items():
+                    if blob is None:
+                        tree.pop(path, None)
+                    else:
+                        tree[path] = blob
+            else:
+                tree = list_tree(self.repo, commit)
+
+            done = {row[0] for row in self.db.execute("SELECT blob FROM docs WHERE version = ?", (TOKENIZER_VERSION,))}
+            missing = set(tree.values()) - done
+            print(f"BM25 indexing {commit[:10]}: {len(tree)} files, {len(missing)} to tokenize"
+                  f"{f' (from {base[:10]})' if base else ''}")
+            with self.db:
+                for blob, text in read_blobs(self.repo, missing):
+                    counts = Counter(tokenize(text))
+                    self.db.execute("DELETE FROM postings WHERE blob = ?", (blob,))
+                    self.db.executemany("INSERT INTO postings VALUES (?, ?, ?)", [(t, blob, n) for t, n in counts.items()])
+                    self.db.execute("INSERT OR REPLACE INTO docs VALUES (?, ?, ?)",
+                                    (blob, sum(counts.values()), TOKENIZER_VERSION))
+                self.db.executemany("INSERT INTO trees VALUES (?, ?, ?, ?)",
+                                    [(commit, p, b, " ".join(path_terms(p))) for p, b in tree.items()])
+                self.db.execute("INSERT INTO commits VALUES (?)", (commit,))
+        return commit
+
+    def query(self, commit, text, n=10):
+        """Top `n` (path, score) of `commit` for a free-text query."""
+        with self._lock:
+            commit = self.index_commit(commit)
+            paths = self.db.execute(
+                "SELECT t.path, t.blob, t.path_terms, d.length FROM trees t JOIN docs d ON d.blob = t.blob "
+                "WHERE t.commit_id = ?", (commit,)).fetchall()
+            if not paths:
+                return []
+            # Path terms count as PATH_WEIGHT occurrences on top of the content
+            path_tf = {path: Counter(terms.split()) for path, _, terms, _ in paths}
+            lengths = {path: length + PATH_WEIGHT * sum(path_tf[path].values()) for path, _, _, length in paths}
+            average = sum(lengths.values()) / len(lengths)
+            by_blob = {}
+            for path, blob, _, _ in paths:
+                by_blob.setdefault(blob, []).append(path)
+
+            # Long issues (pasted logs, plans) are cut to their most repeated terms
+            query_terms = Counter(tokenize(text))
+            scores = Counter()
+            for term, weight in query_terms.most_common(MAX_QUERY_TERMS):
+                tf = Counter({path: PATH_WEIGHT * counts[term] for path, counts in path_tf.items() if term in counts})
+                for blob, count in self.db.execute("SELECT blob, tf FROM postings WHERE term = ?", (term,)):
+                    for path in by_blob.get(blob, ()):
+                        tf[path] += count
+                if not tf:
+                    continue
+                idf = math.log(1 + (len(paths) - len(tf) + 0.5) / (len(tf) + 0.5))
+                for path, count in tf.items():
+                    norm = K1 * (1 - B + B * lengths[path] / average)
+                    scores[path] += weight * idf * count * (K1 + 1) / (count + norm)
+        return [(path, round(score, 3)) for path, score in scores.most_common(n)]
+
+
+def problem_files(index, problem_data, n):
+    """Top `n` retrieved files for a problem, from its problem_statement."""
+    return [path for path, _ in index.query(problem_data["base_commit"], problem_data.get("problem_statement", ""), n)]
+
+
+def recall(retrieved, gold):
+    if not gold:
+        return ""
+    return round(len(set(retrieved) & set(gold)) / len(gold), 3)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="BM25 file retrieval for benchmark problems")
+    parser.add_argument("--repo", type=str, default=DEFAULT_REPO, help="Git repository to index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index the base commit of every problem")
+    build.add_argument("--dir", type=str, default=DEFAULT_BENCHMARK_DIR, help="Path to benchmark directory")
+    query = sub.add_parser("query", help="Print the top files for a problem")
+    query.add_argument("problem_dir", type=str)
+    query.add_argument("--n", type=int, default=10, help="Number of files")
+    evaluate = sub.add_parser("evaluate", help="Recall of modified_files in the top N over a benchmark")
+    evaluate.add_argument("--dir", type=str, default=DEFAULT_BENCHMARK_DIR, help="Path to benchmark directory")
+    evaluate.add_argument("--n", type=int, default=10, help="Number of files")
+    return parser.parse_args()
+
+
+def _problems(benchmark_dir):
+    for problem in sorted(Path(benchmark_dir).iterdir()):
+        if (problem / f"{problem.name}.json").exists():
+            yield problem, symbol_index.load_problem(problem)
+
+
+def main():
+    args = parse_arguments()
+    index = Bm25Index(args.repo)
+    if args.command == "build":
+        commits = sorted({data["base_commit"] for _, data in _problems(args.dir)},
+                         key=lambda c: int(symbol_index.git(args.repo, "show", "-s", "--format=%ct", c)))
+        for commit in commits:
+            index.index_commit(commit)
+    elif args.command == "query":
+        data = symbol_index.load_problem(args.problem_dir)
+        gold = set(adapters.file_list(data.get("modified_files", [])))
+        for path, score in index.query(data["base_commit"], data.get("problem_statement", ""), args.n):
+            print(f"{score:>8.2f}  {path}{'  (modified)' if path in gold else ''}")
+    else:
+        recalls = []
+        for problem, data in _problems(args.dir):
+            value = recall(problem_files(index, data, args.n), adapters.file_list(data.get("modified_files", [])))
+            if value != "":
+                recalls.append(value)
+                print(f"{problem.name:>8} recall@{args.n} {value:.2f}")
+        if recalls:
+            print(f"Mean recall@{args.n}: {sum(recalls) / len(recalls):.2f} over {len(recalls)} problems")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,22 @@
 
 #!/bin/bash
 
+# Usage: ./build.sh <honours_dir> [build_profile] [test_file_1] [test_file_2] ...
+
 HONOURS_DIR="$1"
-DUCKDB_DIR="$HONOURS_DIR/repos/duckdb"
+BUILD_PROFILE="${2:-release}"
+shift $(( $# < 2 ? $# : 2 ))
+TEST_FILES=("$@")
+
+DUCKDB_DIR="${REPO_DIR:-$HONOURS_DIR/repos/${HONOURS_REPO:-duckdb}}"
 
 cd "$DUCKDB_DIR" || exit 1
 
 echo "Starting build..."
-make -j$(nproc) # can change to any number, to use all -j$(nproc)
+# Equivalent to `make -j$(nproc)` with the release profile, but reuses a cached CMake
+# configure step when the CMakeLists/cmake files and flags match a previous build (see builder.py)
+python3 "$HONOURS_DIR/scripts/aider_scripts/builder.py" "$DUCKDB_DIR" --jobs "$(nproc)" \
+  --profile "$BUILD_PROFILE" --test-files "${TEST_FILES[@]}"
 
 if [ $? -eq 0 ]; then
   echo "Build succeeded"
@@ -15,4 +24,4 @@ if [ $? -eq 0 ]; then
 else
   echo "Build failed"
   exit 1
-fi
\ No newline at end of file
+fi
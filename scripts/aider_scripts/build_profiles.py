@@ -0,0 +1,109 @@
+"""
+Named build profiles, turning a profile name into cmake arguments for builder.py.
+
+  release  what DuckDB's default `make` does (Unix Makefiles, Release, bundled extensions)
+  eval     for throwaway verification builds: Ninja, bundled extensions only if a modified
+           test `require`s them, mold/lld if installed, no debug info, no LTO
+
+REPO_PROFILES picks the default profile per repository; both aider_benchmark.py and
+verify_PRs.py accept a profile name to override it. Extension selection only applies to DuckDB;
+other repositories add their own arguments and targets in adapters.py.
+"""
+
+import re
+import shutil
+from pathlib import Path
+
+PROFILES = {
+    "release": {
+        "generator": "Unix Makefiles",
+        "build_type": "Release",
+        "extensions": "default",
+        "fast_linker": False,
+        "extra_flags": [],
+    },
+    "eval": {
+        "generator": "Ninja",
+        "build_type": "Release",
+        "extensions": "required",
+        "fast_linker": True,
+        "extra_flags": [
+            "-DCMAKE_C_FLAGS=-g0",
+            "-DCMAKE_CXX_FLAGS=-g0",
+            "-DCMAKE_INTERPROCEDURAL_OPTIMIZATION=OFF",
+        ],
+    },
+}
+
+# Default profile per repository (keyed by the repo name in the problem JSON, e.g. duckdb/duckdb)
+REPO_PROFILES = {
+    "duckdb": "eval",
+    "clickhouse": "eval",
+    "dragonfly": "eval",
+}
+DEFAULT_PROFILE = "release"
+
+# Extensions bundled into a default DuckDB build that can be skipped. core_functions is not in
+# here on purpose: from v0.10 the basic scalar functions live there and nothing works without it.
+BUNDLED_EXTENSIONS = [
+    "parquet", "jemalloc", "json", "icu", "tpch", "tpcds", "fts", "httpfs",
+    "autocomplete", "inet", "excel", "visualizer",
+]
+
+REQUIRE_LINE = re.compile(r"^\s*require\s+(\w+)", re.MULTILINE)
+
+
+def default_profile(repo):
+    """Default profile for a repo name such as "duckdb/duckdb" or "duckdb"."""
+    return REPO_PROFILES.get(repo.split("/")[-1].lower(), DEFAULT_PROFILE)
+
+
+def required_extensions(repo_dir, test_files):
+    """Bundled extensions named in `require` lines of the given sqllogictest files."""
+    required = set()
+    for test_file in test_files:
+        path = Path(repo_dir) / test_file
+        if not path.is_file():
+            continue
+        for ext in REQUIRE_LINE.findall(path.read_text(errors="replace")):
+            if ext in BUNDLED_EXTENSIONS:
+                required.add(ext)
+    return sorted(required)
+
+
+def fast_linker():
+    for linker in ("mold", "lld"):
+        if shutil.which(linker) or shutil.which(f"ld.{linker}"):
+            return linker
+    return None
+
+
+def cmake_args(name, repo_dir, test_files=(), select_extensions=True):
+    """cmake configure arguments for profile `name`. `select_extensions` is for DuckDB checkouts only."""
+    if name not in PROFILES:
+        raise ValueError(f"Unknown build profile {name!r} (known: {', '.join(PROFILES)})")
+    profile = PROFILES[name]
+
+    generator = profile["generator"]
+    if generator == "Ninja" and not shutil.which("ninja"):
+        generator = "Unix Makefiles"
+    args = ["-G", generator, f"-DCMAKE_BUILD_TYPE={profile['build_type']}"]
+
+    if select_extensions and profile["extensions"] == "required":
+        required = required_extensions(repo_dir, test_files)
+        skipped = [ext for ext in BUNDLED_EXTENSIONS if ext not in required]
+        args.append(f"-DSKIP_EXTENSIONS={';'.join(skipped)}")
+        if required:
+            args.append(f"-DBUILD_EXTENSIONS={';'.join(required)}")
+            # Older DuckDB versions use one option per extension
+            args += [f"-DBUILD_{ext.upper()}_EXTENSION=1" for ext in required]
+        else:
+            args.append("-DDISABLE_BUILTIN_EXTENSIONS=1")
+
+    if profile["fast_linker"]:
+        linker = fast_linker()
+        if linker:
+            for kind in ("EXE", "SHARED", "MODULE"):
+                args.append(f"-DCMAKE_{kind}_LINKER_FLAGS=-fuse-ld={linker}")
+
+    return args + profile["extra_flags"]
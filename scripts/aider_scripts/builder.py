@@ -0,0 +1,188 @@
+"""
+Usage: python builder.py <repo_dir> [--profile <name>] [--test-files <file> ...] [--build-dir build/release]
+                          [--jobs N] [--no-config-cache] [--distributed off|auto|distcc|icecream]
+                          [--repo duckdb|clickhouse]
+
+Configures and builds a repository with a named build profile (see build_profiles.py; `release` matches
+DuckDB's default `make` target), skipping the CMake configure step when an identical configuration has
+been seen before (see cmake_cache.py). The repository's adapter (--repo or HONOURS_REPO, see adapters.py)
+adds its own cmake arguments and limits the build to the targets its tests need.
+
+If HONOURS_JOBSERVER points at the harness jobserver (see jobserver.py), compile jobs are taken from
+its shared slots and --jobs is ignored.
+
+With --distributed (or HONOURS_DISTRIBUTED), compile jobs are sent to distcc/icecream helpers when
+any are reachable (see remote_compile.py), and the remote/local job counts are reported.
+
+If HONOURS_BUILD_STATS names a file, the build writes BUILD_STATS_COLUMNS there as JSON (how the
+configure step was satisfied, remote/local compile jobs) for aider_benchmark.py's attempts CSV.
+
+Exit code is 0 if the build succeeded and 1 otherwise.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import adapters
+import build_profiles
+import cmake_cache
+import jobserver
+import remote_compile
+
+STATS_ENV_VAR = "HONOURS_BUILD_STATS"
+BUILD_STATS_COLUMNS = ["config_cache"] + remote_compile.STATS_COLUMNS
+
+
+def write_stats(stats, path=None):
+    path = path or os.environ.get(STATS_ENV_VAR)
+    if path:
+        Path(path).write_text(json.dumps(stats))
+
+
+def read_stats(path):
+    """BUILD_STATS_COLUMNS for the attempts CSV; empty values if the build wrote nothing."""
+    path = Path(path)
+    stats = json.loads(path.read_text()) if path.exists() and path.stat().st_size else {}
+    return {column: stats.get(column, "") for column in BUILD_STATS_COLUMNS}
+
+
+def cached_generator(build_dir):
+    cache = Path(build_dir) / "CMakeCache.txt"
+    if not cache.exists():
+        return None
+    for line in cache.read_text(errors="replace").splitlines():
+        if line.startswith("CMAKE_GENERATOR:INTERNAL="):
+            return line.split("=", 1)[1]
+    return None
+
+
+def configure(repo_dir, build_dir, cmake_args, use_cache=True):
+    """Make build_dir a configured build tree. Returns "cached", "existing", "fresh" or None on failure."""
+    fp = cmake_cache.fingerprint(repo_dir, build_dir, cmake_args)
+    abs_build_dir = Path(repo_dir) / build_dir
+
+    if cmake_cache.read_stamp(abs_build_dir) == fp:
+        print(f"Build directory already configured ({fp})")
+        return "existing"
+
+    # cmake refuses to switch generators in place (e.g. after changing profile)
+    generator = cmake_args[cmake_args.index("-G") + 1]
+    previous = cached_generator(abs_build_dir)
+    if previous and previous != generator:
+        print(f"Build directory was generated for {previous}, starting over for {generator}")
+        shutil.rmtree(abs_build_dir)
+
+    fresh_dir = not abs_build_dir.exists() or not any(abs_build_dir.iterdir())
+    if use_cache and fresh_dir and cmake_cache.restore(abs_build_dir, fp):
+        print(f"Restored cached CMake configuration {fp}, skipping configure")
+        return "cached"
+
+    print(f"Configuring ({fp})...")
+    abs_build_dir.mkdir(parents=True, exist_ok=True)
+    result = subprocess.run(["cmake", *cmake_args, "-S", str(repo_dir), "-B", str(abs_build_dir)])
+    if result.returncode != 0:
+        return None
+    cmake_cache.write_stamp(abs_build_dir, fp)
+
+    # Only an empty build dir holds nothing but generated files; don't archive object files
+    if use_cache and fresh_dir:
+        cmake_cache.save(abs_build_dir, fp)
+    return "fresh"
+
+
+def run_local(build_cmd, generator, jobs, env=None):
+    """Run the build on this machine, under the shared jobserver if there is one."""
+    env = env or dict(os.environ)
+    jobserver_path = env.get(jobserver.ENV_VAR)
+    if not jobserver.available(jobserver_path):
+        return subprocess.run(build_cmd + ["--parallel", str(jobs)], env=env).returncode == 0
+
+    if generator == "Ninja" and not jobserver.ninja_is_client():
+        # Older Ninja ignores MAKEFLAGS and would run nproc + 2 jobs; cap it at the tokens it holds
+        print(f"Waiting for jobserver slots ({jobserver_path})...")
+        with jobserver.tokens(jobserver_path, jobs) as held:
+            print(f"Building with {held} job(s) (ninja < 1.13 can't share the jobserver)")
+            return subprocess.run(build_cmd + ["--parallel", str(held)], env=env).returncode == 0
+
+    # No --parallel here: an explicit -j would make make/ninja ignore the shared jobserver
+    print(f"Waiting for a jobserver slot ({jobserver_path})...")
+    with jobserver.slot(jobserver_path) as client:
+        env = dict(env, MAKEFLAGS=jobserver.makeflags(client, generator))
+        result = subprocess.run(build_cmd, env=env, pass_fds=client["fds"][:1])
+    return result.returncode == 0
+
+
+def build(repo_dir, profile=build_profiles.DEFAULT_PROFILE, test_files=(), build_dir="build/release", jobs=None, use_cache=True,
+          distributed=None, repo=None):
+    repo_dir = Path(repo_dir).resolve()
+    jobs = jobs or os.cpu_count()
+    adapter = adapters.get(repo)
+    cmake_args = adapter.cmake_args(profile, repo_dir, test_files)
+    targets = adapter.build_targets(repo_dir, test_files)
+    print(f"Build profile: {profile}")
+    if targets:
+        print(f"Build targets: {' '.join(targets)}")
+
+    backend = remote_compile.resolve_mode(distributed)
+    pool = remote_compile.Pool(backend, jobs) if backend else None
+    if pool:
+        print(f"Distributed compilation: {pool.describe()}")
+        cmake_args += pool.cmake_args()
+
+    configured = configure(repo_dir, build_dir, cmake_args, use_cache=use_cache)
+    if configured is None:
+        print("Configure failed")
+        return False
+
+    build_cmd = ["cmake", "--build", str(repo_dir / build_dir), "--config", "Release"]
+    if targets:
+        build_cmd += ["--target", *targets]
+    generator = cmake_args[cmake_args.index("-G") + 1]
+    stats = {"config_cache": configured}
+    if not pool:
+        ok = run_local(build_cmd, generator, jobs)
+    else:
+        with pool.build_env(os.environ) as (env, compile_stats):
+            if pool.available():
+                # distcc/iceccd coordinate their slots machine-wide, so no jobserver slot here
+                ok = subprocess.run(build_cmd + ["--parallel", str(pool.parallelism())], env=env).returncode == 0
+            else:
+                ok = run_local(build_cmd, generator, jobs, env)
+        stats.update(compile_stats)
+        print(f"Compile jobs: {stats['compile_jobs_remote']} remote, {stats['compile_jobs_local']} local")
+    write_stats(stats)
+    return ok
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Build a repository with a cached CMake configure step")
+    parser.add_argument("repo_dir", help="Path to the repository to build")
+    parser.add_argument("--profile", default=build_profiles.DEFAULT_PROFILE, choices=list(build_profiles.PROFILES),
+                        help="Build profile to use")
+    parser.add_argument("--test-files", nargs="*", default=[], help="Tests that will be run (used to pick extensions/targets)")
+    parser.add_argument("--build-dir", default="build/release", help="Build directory, relative to the repository")
+    parser.add_argument("--jobs", type=int, help="Parallel compile jobs without a jobserver (default: number of cores)")
+    parser.add_argument("--no-config-cache", action="store_true", help="Always run the configure step")
+    parser.add_argument("--distributed", choices=remote_compile.MODES,
+                        help=f"Send compile jobs to distcc/icecream helpers (default: ${remote_compile.MODE_ENV_VAR} or off)")
+    parser.add_argument("--repo", choices=list(adapters.ADAPTERS),
+                        help=f"Repository adapter (default: ${adapters.REPO_ENV_VAR} or {adapters.DEFAULT_REPO})")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    # Keep our own messages in order with cmake's output in the stage log
+    sys.stdout.reconfigure(line_buffering=True)
+    ok = build(args.repo_dir, args.profile, args.test_files, args.build_dir, jobs=args.jobs,
+               use_cache=not args.no_config_cache, distributed=args.distributed, repo=args.repo)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
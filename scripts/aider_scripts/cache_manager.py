@@ -0,0 +1,248 @@
+"""
+Usage: python cache_manager.py status
+       python cache_manager.py enforce --budget <size>
+
+Disk-budgeted LRU cache of everything the harness keeps around between attempts.
+
+Artifacts (configured CMake archives, workspace lower layers with their warm builds, run log
+segments, ...) are registered in cache/cache_index.sqlite with their kind, size and last use.
+`enforce()` evicts the least recently used artifacts until the total fits the budget, skipping
+anything pinned by a live process (e.g. the lower layer of a problem whose attempts are running).
+
+Eviction never blocks the caller: the artifact is renamed into cache/.trash (constant time, same
+filesystem) and unlinked by a background thread. An artifact on another filesystem is renamed to
+.trash-<name>-<ns> next to it instead, and its path is listed in cache/.trash/elsewhere. Leftovers
+from interrupted runs, in the trash or listed there, are swept the next time a run starts.
+
+Sizes accept K/M/G/T suffixes, e.g. `--cache-budget 500G`.
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+CACHE_DIR = HONOURS_DIR / "cache"
+DB_PATH = CACHE_DIR / "cache_index.sqlite"
+TRASH_DIR = CACHE_DIR / ".trash"
+ELSEWHERE = "elsewhere"
+
+SIZE_SUFFIXES = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_size(value):
+    if value is None:
+        return None
+    value = str(value).strip().upper().rstrip("B")
+    if value and value[-1] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def format_size(n):
+    for suffix in ("T", "G", "M", "K"):
+        if n >= SIZE_SUFFIXES[suffix]:
+            return f"{n / SIZE_SUFFIXES[suffix]:.1f}{suffix}"
+    return f"{n}B"
+
+
+def disk_usage(path):
+    """Bytes used by a file or directory tree (allocated blocks, hard links counted once)."""
+    path = Path(path)
+    if not path.exists():
+        return 0
+    if not path.is_dir():
+        return path.lstat().st_blocks * 512
+    total = 0
+    seen = set()
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            if st.st_nlink > 1:
+                if (st.st_dev, st.st_ino) in seen:
+                    continue
+                seen.add((st.st_dev, st.st_ino))
+            total += st.st_blocks * 512
+    return total
+
+
+def discard(path, trash_dir=TRASH_DIR):
+    """Rename `path` into the trash now and delete it in the background."""
+    path = Path(path)
+    if not path.exists():
+        return
+    trash_dir.mkdir(parents=True, exist_ok=True)
+    target = trash_dir / f"{path.name}-{time.time_ns()}"
+    try:
+        os.rename(path, target)
+    except OSError:
+        # Different filesystem than the cache (e.g. outputs/ on another disk): trash next to it
+        target = path.with_name(f".trash-{path.name}-{time.time_ns()}")
+        os.rename(path, target)
+        with open(trash_dir / ELSEWHERE, "a") as f:
+            f.write(f"{target.resolve()}\n")
+    threading.Thread(target=_delete, args=(target,), daemon=True).start()
+
+
+def _delete(path):
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class CacheManager:
+    def __init__(self, budget=None, db_path=DB_PATH):
+        self.budget = parse_size(budget)
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._db() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS artifacts (
+                path TEXT PRIMARY KEY, kind TEXT, size INTEGER, created REAL, last_used REAL)""")
+            db.execute("CREATE TABLE IF NOT EXISTS pins (path TEXT, pid INTEGER, token TEXT)")
+
+    @contextmanager
+    def _db(self):
+        # One short-lived connection per call keeps this safe across threads and processes
+        db = sqlite3.connect(self.db_path, timeout=60)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def register(self, path, kind, size=None):
+        """Record (or refresh) an artifact. Measures its size unless given."""
+        path = str(Path(path).resolve())
+        size = disk_usage(path) if size is None else size
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT INTO artifacts VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET kind=excluded.kind, size=excluded.size, last_used=excluded.last_used",
+                (path, kind, size, now, now),
+            )
+
+    def touch(self, path):
+        with self._db() as db:
+            db.execute("UPDATE artifacts SET last_used = ? WHERE path = ?", (time.time(), str(Path(path).resolve())))
+
+    @contextmanager
+    def pin(self, path):
+        """Protect an artifact from eviction while the block runs."""
+        path = str(Path(path).resolve())
+        token = f"{threading.get_ident()}-{time.time_ns()}"
+        with self._db() as db:
+            db.execute("INSERT INTO pins VALUES (?, ?, ?)", (path, os.getpid(), token))
+            db.execute("UPDATE artifacts SET last_used = ? WHERE path = ?", (time.time(), path))
+        try:
+            yield
+        finally:
+            with self._db() as db:
+                db.execute("DELETE FROM pins WHERE token = ?", (token,))
+
+    def pinned(self):
+        with self._db() as db:
+            rows = db.execute("SELECT DISTINCT path, pid FROM pins").fetchall()
+            dead = {pid for _, pid in rows if not _alive(pid)}
+            for pid in dead:
+                db.execute("DELETE FROM pins WHERE pid = ?", (pid,))
+        return {path for path, pid in rows if pid not in dead}
+
+    def artifacts(self):
+        with self._db() as db:
+            return db.execute("SELECT path, kind, size, last_used FROM artifacts ORDER BY last_used").fetchall()
+
+    def enforce(self, budget=None):
+        """Evict least recently used, unpinned artifacts until the total fits the budget."""
+        budget = parse_size(budget) if budget is not None else self.budget
+        if budget is None:
+            return []
+        with self._lock:
+            rows = self.artifacts()
+            vanished = [path for path, *_ in rows if not os.path.exists(path)]
+            rows = [row for row in rows if row[0] not in vanished]
+            total = sum(size for _, _, size, _ in rows)
+            pinned = self.pinned()
+            evicted = []
+            for path, kind, size, _ in rows:
+                if total <= budget:
+                    break
+                if path in pinned:
+                    continue
+                discard(path)
+                evicted.append((path, kind, size))
+                total -= size
+            with self._db() as db:
+                for path in vanished + [path for path, _, _ in evicted]:
+                    db.execute("DELETE FROM artifacts WHERE path = ?", (path,))
+        for path, kind, size in evicted:
+            print(f"🧹 Evicted {kind} {path} ({format_size(size)})")
+        return evicted
+
+    def sweep_trash(self):
+        """Delete whatever an interrupted run left in the trash, in the background."""
+        if not TRASH_DIR.exists():
+            return
+        # Take the list first, so discards from here on go to a new one
+        listed = TRASH_DIR / f"{ELSEWHERE}-{time.time_ns()}"
+        try:
+            os.rename(TRASH_DIR / ELSEWHERE, listed)
+            elsewhere = [Path(line) for line in listed.read_text().splitlines() if line]
+        except FileNotFoundError:
+            elsewhere = []
+        for entry in elsewhere + list(TRASH_DIR.iterdir()):
+            if entry.name.startswith(ELSEWHERE) and entry != listed:
+                continue
+            threading.Thread(target=_delete, args=(entry,), daemon=True).start()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Inspect or trim the harness cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="List cached artifacts, least recently used first")
+    enforce = sub.add_parser("enforce", help="Evict artifacts until the cache fits the budget")
+    enforce.add_argument("--budget", required=True, help="Disk budget, e.g. 500G")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    manager = CacheManager()
+    if args.command == "status":
+        pinned = manager.pinned()
+        total = 0
+        for path, kind, size, last_used in manager.artifacts():
+            total += size
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(last_used))
+            print(f"{kind:<10} {format_size(size):>8}  {when}  {'📌 ' if path in pinned else ''}{path}")
+        print(f"Total: {format_size(total)}")
+    else:
+        manager.enforce(args.budget)
+        # Let background deletions finish before exiting
+        for t in threading.enumerate():
+            if t is not threading.current_thread():
+                t.join()
+
+
+if __name__ == "__main__":
+    main()
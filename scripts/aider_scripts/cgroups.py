@@ -0,0 +1,200 @@
+"""
+Per-stage cgroup v2 slices for build and test commands.
+
+Every build and test stage of an attempt runs in its own cgroup under HONOURS_CGROUP_ROOT
+(default /sys/fs/cgroup/honours), with optional memory.max and cpu.max limits. When a patch makes
+a test allocate without bound, or a link spikes, the kernel OOM killer then only sees that
+stage's processes instead of other attempts or the runner itself.
+
+After the stage, `stats()` reads the slice's OOM kill count, peak memory and pressure stall
+information (PSI), which aider_benchmark.py records with the attempt.
+
+The harness needs write access to the parent of the cgroup root. That means running as root, or
+under a systemd delegated scope such as `systemd-run --user --scope -p Delegate=yes` with
+HONOURS_CGROUP_ROOT set to a child of that scope, e.g.
+/sys/fs/cgroup$(cut -d: -f3 /proc/self/cgroup)/honours. A delegated scope holds the harness's own
+processes, and cgroup v2 doesn't let a cgroup with processes pass controllers on to its children
+("no internal processes"), so they are first moved into a leaf next to the root (SUPERVISOR_NAME).
+Without cgroup v2 or permissions the slices are disabled and commands run unconfined.
+"""
+
+import os
+import re
+import time
+from pathlib import Path
+
+CGROUP_ROOT = Path(os.environ.get("HONOURS_CGROUP_ROOT", "/sys/fs/cgroup/honours"))
+CONTROLLERS = ["cpu", "memory", "io"]
+CPU_PERIOD_US = 100000
+# Leaf next to the root that takes the processes of the root's parent (see the module docstring)
+SUPERVISOR_NAME = "honours-supervisor"
+
+RESOURCE_COLUMNS = [
+    "oom_killed",
+    "memory_peak_bytes",
+    "psi_cpu_some_us",
+    "psi_memory_some_us",
+    "psi_memory_full_us",
+    "psi_io_some_us",
+]
+
+_warned = False
+
+
+def _warn_once(message):
+    global _warned
+    if not _warned:
+        print(f"⚠️ {message}; running stages without cgroup limits")
+        _warned = True
+
+
+def supported(root=CGROUP_ROOT):
+    base = root if root.exists() else root.parent
+    return (base / "cgroup.controllers").exists() and os.access(base, os.W_OK)
+
+
+def cpu_max_value(cores):
+    """cpu.max line for a limit given in cores, e.g. 4 -> "400000 100000"."""
+    if cores in (None, "", "max"):
+        return "max"
+    return f"{int(float(cores) * CPU_PERIOD_US)} {CPU_PERIOD_US}"
+
+
+def _enable_controllers(group):
+    available = (group / "cgroup.controllers").read_text().split()
+    wanted = " ".join(f"+{c}" for c in CONTROLLERS if c in available)
+    if wanted:
+        (group / "cgroup.subtree_control").write_text(wanted)
+
+
+def _vacate(group):
+    """Move the processes of `group` into a leaf child, so it can enable controllers for its children."""
+    procs = (group / "cgroup.procs").read_text().split()
+    if not procs:
+        return
+    leaf = group / SUPERVISOR_NAME
+    leaf.mkdir(exist_ok=True)
+    for pid in procs:
+        try:
+            (leaf / "cgroup.procs").write_text(pid)
+        except ProcessLookupError:
+            pass  # exited meanwhile
+
+
+def _read_psi(path):
+    """Total stall times (us) from a PSI file, e.g. {"some": 1234, "full": 56}."""
+    totals = {}
+    if not path.exists():
+        return totals
+    for line in path.read_text().splitlines():
+        m = re.match(r"(some|full) .*total=(\d+)", line)
+        if m:
+            totals[m.group(1)] = int(m.group(2))
+    return totals
+
+
+def _read_keyed(path):
+    if not path.exists():
+        return {}
+    return {k: int(v) for k, v in (line.split() for line in path.read_text().splitlines())}
+
+
+class StageCgroup:
+    """A cgroup for one stage; usable as a context manager around `run(..., cgroup=...)`."""
+
+    def __init__(self, name, memory_max=None, cpu_max=None, root=CGROUP_ROOT):
+        self.name = re.sub(r"[^\w.-]", "_", name)
+        self.memory_max = memory_max
+        self.cpu_max = cpu_max
+        self.root = Path(root)
+        self.path = self.root / self.name
+        self.enabled = False
+
+    def create(self):
+        if not supported(self.root):
+            _warn_once("cgroup v2 is not available or not writable")
+            return self
+        try:
+            if not self.root.exists():
+                self.root.mkdir()
+                if (self.root.parent / "cgroup.type").exists():
+                    # Only the top-level cgroup (which has no cgroup.type) may keep processes
+                    _vacate(self.root.parent)
+                _enable_controllers(self.root.parent)
+            _enable_controllers(self.root)
+            self.path.mkdir(exist_ok=True)
+            if self.memory_max:
+                (self.path / "memory.max").write_text(str(self.memory_max))
+                # Don't let the slice hide in swap instead of hitting its limit
+                if (self.path / "memory.swap.max").exists():
+                    (self.path / "memory.swap.max").write_text("0")
+            if self.cpu_max:
+                (self.path / "cpu.max").write_text(cpu_max_value(self.cpu_max))
+            self.enabled = True
+        except OSError as e:
+            _warn_once(f"Could not set up cgroup {self.path} ({e})")
+        return self
+
+    def wrap(self, cmd):
+        """Wrap a command so it moves itself into this cgroup before exec'ing."""
+        if not self.enabled:
+            return cmd
+        enter = f'echo $$ > "{self.path / "cgroup.procs"}" && exec '
+        if isinstance(cmd, str):
+            return enter + cmd
+        return ["sh", "-c", enter + '"$@"', "sh", *cmd]
+
+    def stats(self):
+        if not self.enabled:
+            return {column: "" for column in RESOURCE_COLUMNS}
+        events = _read_keyed(self.path / "memory.events")
+        peak = self.path / "memory.peak"
+        cpu = _read_psi(self.path / "cpu.pressure")
+        memory = _read_psi(self.path / "memory.pressure")
+        io = _read_psi(self.path / "io.pressure")
+        return {
+            "oom_killed": int(events.get("oom_kill", 0) > 0),
+            "memory_peak_bytes": int(peak.read_text()) if peak.exists() else "",
+            "psi_cpu_some_us": cpu.get("some", ""),
+            "psi_memory_some_us": memory.get("some", ""),
+            "psi_memory_full_us": memory.get("full", ""),
+            "psi_io_some_us": io.get("some", ""),
+        }
+
+    def destroy(self):
+        if not self.enabled:
+            return
+        # Kill anything the stage left behind (e.g. a daemonised test server)
+        kill = self.path / "cgroup.kill"
+        if kill.exists():
+            kill.write_text("1")
+        for _ in range(50):
+            try:
+                self.path.rmdir()
+                break
+            except OSError:
+                time.sleep(0.1)
+        self.enabled = False
+
+    def __enter__(self):
+        return self.create()
+
+    def __exit__(self, *exc):
+        # stats() must be read before leaving the with block
+        self.destroy()
+
+
+def combine(stage_stats):
+    """Combine per-stage stats into attempt columns: peak is the max, stall times add up."""
+    combined = {column: "" for column in RESOURCE_COLUMNS}
+    for stats in stage_stats:
+        for column, value in stats.items():
+            if value == "":
+                continue
+            if combined[column] == "":
+                combined[column] = value
+            elif column in ("oom_killed", "memory_peak_bytes"):
+                combined[column] = max(combined[column], value)
+            else:
+                combined[column] += value
+    return combined
@@ -3,9 +3,14 @@
 HONOURS_DIR="$1"
 COMMIT="$2"
 
-DUCKDB_DIR="$HONOURS_DIR/repos/duckdb"
+DUCKDB_DIR="${REPO_DIR:-$HONOURS_DIR/repos/${HONOURS_REPO:-duckdb}}"
 
 cd "$DUCKDB_DIR" || exit 1
 
 git stash
 git checkout "$COMMIT"
+
+# Submodules come from the shared object store; only those whose gitlink changed are checked out
+if [ -f .gitmodules ]; then
+  python3 "$HONOURS_DIR/scripts/aider_scripts/submodules.py" update "$DUCKDB_DIR"
+fi
@@ -2,12 +2,9 @@
 
 HONOURS_DIR="$1"
 
-DUCKDB_DIR="$HONOURS_DIR/repos/duckdb"
+DUCKDB_DIR="${REPO_DIR:-$HONOURS_DIR/repos/${HONOURS_REPO:-duckdb}}"
 
 cd "$DUCKDB_DIR" || exit 1
 
-git reset --hard
-git clean -fd
-make clean
-git checkout main
-
+# Reset, build tree removal and default branch are per repository (see adapters.py)
+python3 "$HONOURS_DIR/scripts/aider_scripts/adapters.py" clean "$DUCKDB_DIR"
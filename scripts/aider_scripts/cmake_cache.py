@@ -0,0 +1,121 @@
+"""
+Cache of configured CMake build directories, keyed by a fingerprint of the configuration inputs.
+
+`make clean` + checkout leaves an empty build directory before every attempt, so DuckDB's CMake
+configure step runs again even though the CMakeLists files, cmake modules and flags are nearly
+always identical between base commits. The fingerprint covers exactly those inputs:
+
+  - the blob ids of every CMakeLists.txt / *.cmake / *.cmake.in file at HEAD (no file reads needed)
+  - uncommitted changes to those files (e.g. from test.patch or a model's edit)
+  - the cmake arguments, generator, build directory and compiler-related environment
+  - the cmake version
+
+The commit itself is not part of it. DuckDB's configure would bake `git describe` of HEAD into its
+output, so its adapter pins that with -DOVERRIDE_GIT_DESCRIBE and a configuration is reused across
+every base commit with the same CMake inputs.
+
+A configured build directory (before compilation, so only generated files) is archived under
+cache/cmake/<fingerprint>.tar and restored into an empty build directory on a hit. Archives are
+registered with the cache manager, so they count towards (and can be evicted by) the disk budget.
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import tarfile
+import time
+from pathlib import Path
+
+import cache_manager
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_CACHE_DIR = HONOURS_DIR / "cache" / "cmake"
+
+CONFIG_PATHSPECS = [
+    ":(glob)**/CMakeLists.txt",
+    ":(glob)**/*.cmake",
+    ":(glob)**/*.cmake.in",
+]
+
+# Environment variables that change what CMake detects during configure
+CONFIG_ENV_VARS = ["CC", "CXX", "CFLAGS", "CXXFLAGS", "LDFLAGS", "CMAKE_GENERATOR", "PATH"]
+
+STAMP_NAME = ".config_fingerprint"
+
+
+def _git(repo_dir, *args):
+    return subprocess.run(["git", *args], cwd=repo_dir, capture_output=True, check=True).stdout
+
+
+def fingerprint(repo_dir, build_dir, cmake_args):
+    """Hash everything that determines the output of the configure step."""
+    repo_dir = Path(repo_dir).resolve()
+    # The build directory holds generated *.cmake files of its own
+    pathspecs = CONFIG_PATHSPECS + [f":(exclude){build_dir}"]
+    h = hashlib.sha256()
+    h.update(_git(repo_dir, "ls-files", "-s", "--", *pathspecs))
+    h.update(_git(repo_dir, "diff", "HEAD", "--", *pathspecs))
+    # Untracked config files (e.g. added by test.patch) are not in the index or the diff
+    for rel in _git(repo_dir, "ls-files", "--others", "--exclude-standard", "--", *pathspecs).decode().split("\n"):
+        if rel:
+            h.update(rel.encode())
+            h.update((repo_dir / rel).read_bytes())
+    h.update(str(repo_dir).encode())
+    h.update(str(build_dir).encode())
+    h.update("\0".join(cmake_args).encode())
+    for var in CONFIG_ENV_VARS:
+        h.update(f"{var}={os.environ.get(var, '')}".encode())
+    h.update(subprocess.run(["cmake", "--version"], capture_output=True).stdout)
+    return h.hexdigest()[:32]
+
+
+def archive_path(fp, cache_dir=DEFAULT_CACHE_DIR):
+    return Path(cache_dir) / f"{fp}.tar"
+
+
+def read_stamp(build_dir):
+    stamp = Path(build_dir) / STAMP_NAME
+    return stamp.read_text().strip() if stamp.exists() else None
+
+
+def write_stamp(build_dir, fp):
+    (Path(build_dir) / STAMP_NAME).write_text(fp + "\n")
+
+
+def save(build_dir, fp, cache_dir=DEFAULT_CACHE_DIR):
+    """Archive a freshly configured build directory. Must run before compilation starts."""
+    target = archive_path(fp, cache_dir)
+    if target.exists():
+        return target
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(f".tar.tmp{os.getpid()}")
+    with tarfile.open(tmp, "w") as tar:
+        tar.add(build_dir, arcname=".")
+    # rename is atomic, so concurrent builds never see a partial archive
+    os.replace(tmp, target)
+    cache_manager.CacheManager().register(target, "cmake")
+    return target
+
+
+def restore(build_dir, fp, cache_dir=DEFAULT_CACHE_DIR):
+    """Restore a cached configure into build_dir. Returns False on a cache miss."""
+    source = archive_path(fp, cache_dir)
+    if not source.exists():
+        return False
+
+    build_dir = Path(build_dir)
+    if build_dir.exists():
+        shutil.rmtree(build_dir)
+    build_dir.mkdir(parents=True)
+    with tarfile.open(source) as tar:
+        tar.extractall(build_dir, filter="data")
+
+    # Generated files must look newer than the freshly checked out CMakeLists, otherwise
+    # the build tool decides the build system is stale and re-runs cmake anyway
+    now = time.time()
+    for root, dirs, files in os.walk(build_dir):
+        for name in dirs + files:
+            os.utime(os.path.join(root, name), (now, now), follow_symlinks=False)
+    cache_manager.CacheManager().touch(source)
+    return True
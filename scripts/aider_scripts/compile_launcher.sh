@@ -0,0 +1,10 @@
+#!/bin/sh
+
+# Usage: compile_launcher.sh <distcc|icecc> <compiler> <args...>
+# CMake compiler launcher used for distributed builds (see remote_compile.py). Counts the compile
+# in $HONOURS_COMPILE_COUNT (one byte per job; appends that small are atomic) and runs it.
+
+if [ -n "$HONOURS_COMPILE_COUNT" ]; then
+  printf . >> "$HONOURS_COMPILE_COUNT"
+fi
+exec "$@"
@@ -0,0 +1,139 @@
+"""
+Streaming failure classification for benchmark attempts.
+
+A FailureClassifier is fed every output line of one stage while the stage runs (see
+`run(..., classifier=...)` in aider_benchmark.py), keeping only the first match of each
+failure kind. Once the stage exits, `finish()` returns the columns written to the
+attempts CSV, so nobody has to re-read the logs to find out why an attempt failed.
+Aider exits 0 even when it couldn't apply the model's edits, so a generate stage's edit
+failures are reported whatever its exit code; later stages' failures take precedence, and an
+attempt whose tests pass has no failure columns.
+
+    failure_stage     generate / build / test
+    failure_category  edit_format, patch_not_applied, compile_error, link_error,
+                      test_mismatch, crash, timeout, oom_killed or other
+    failure_file      file of the first diagnostic (compile errors, test mismatches)
+    failure_line      line of the first diagnostic
+    failure_message   first matching output line, truncated
+"""
+
+import re
+import threading
+
+FAILURE_COLUMNS = ["failure_stage", "failure_category", "failure_file", "failure_line", "failure_message"]
+
+MAX_MESSAGE_LENGTH = 300
+
+# (category, pattern). Patterns with `file`/`line` groups also record the location.
+PATTERNS = [
+    ("edit_format", re.compile(
+        r"did not conform to the edit format|Malformed response|malformed edit|"
+        r"UnifiedDiffNoMatch|requested changes (?:to|in) .* not found|Invalid edit format"
+    )),
+    ("patch_not_applied", re.compile(
+        r"SearchReplaceNoExactMatch|failed to exactly match lines|Failed to apply edit|"
+        r"error: patch failed|patch does not apply|does not exist in index|corrupt patch"
+    )),
+    ("compile_error", re.compile(
+        r"^(?:STDERR: )?(?P<file>[^\s:][^:]*):(?P<line>\d+):(?:\d+:)? (?:fatal )?error: (?P<message>.*)"
+    )),
+    ("link_error", re.compile(
+        r"undefined reference to|multiple definition of|collect2: error|"
+        r"ld(?:\.\w+)?: error|ld returned \d+ exit status|Undefined symbols for architecture"
+    )),
+    ("crash", re.compile(
+        r"Segmentation fault|SIGSEGV|SIGABRT|SIGBUS|Aborted \(core dumped\)|terminate called|"
+        r"AddressSanitizer|UndefinedBehaviorSanitizer|Assertion .* failed|INTERNAL Error"
+    )),
+    ("test_mismatch", re.compile(
+        r"Wrong result|Query unexpectedly (?:failed|succeeded)|Wrong row count|Mismatch on row|"
+        r"Wrong column count|Failed: \d+|test cases?: .*\d+ failed"
+    )),
+]
+
+# Location printed by the DuckDB sqllogictest runner, e.g. "(test/sql/window/test_window_cse.test:23)"
+TEST_LOCATION = re.compile(r"(?P<file>[\w./-]+\.test(?:_slow)?):(?P<line>\d+)")
+
+# Categories each stage can produce, in priority order when several matched
+STAGE_PRIORITIES = {
+    "generate": ["edit_format", "patch_not_applied"],
+    "build": ["compile_error", "link_error", "crash"],
+    "test": ["crash", "test_mismatch"],
+}
+
+# Categories reported even when the stage exits 0
+REGARDLESS_OF_EXIT = {"generate": ["edit_format", "patch_not_applied"]}
+
+# Exit codes from shells for signal deaths (128 + SIGABRT/SIGBUS/SIGSEGV)
+CRASH_EXIT_CODES = {134, 135, 139}
+
+
+class FailureClassifier:
+    """Classifies one stage of one attempt from its output stream."""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.matches = {}
+        self._test_location = None
+        # run() feeds stdout and stderr from two threads
+        self._lock = threading.Lock()
+
+    def feed(self, line, stream="stdout"):
+        with self._lock:
+            self._feed(line)
+
+    def _feed(self, line):
+        if len(self.matches) == len(PATTERNS):
+            return
+        for category, pattern in PATTERNS:
+            if category in self.matches:
+                continue
+            m = pattern.search(line)
+            if not m:
+                continue
+            groups = m.groupdict()
+            match = {
+                "file": groups.get("file") or "",
+                "line": groups.get("line") or "",
+                "message": line.strip()[:MAX_MESSAGE_LENGTH],
+            }
+            if category == "test_mismatch" and self._test_location:
+                match["file"], match["line"] = self._test_location
+            self.matches[category] = match
+
+        if self._test_location is None:
+            loc = TEST_LOCATION.search(line)
+            if loc:
+                self._test_location = (loc.group("file"), loc.group("line"))
+
+    def finish(self, returncode, timed_out=False, oom_killed=False):
+        """Return the failure columns for this stage; empty values if it succeeded."""
+        if oom_killed and returncode != 0:
+            return self._row("oom_killed", {"message": "killed by the OOM killer in the stage's cgroup"})
+        if timed_out:
+            return self._row("timeout", {"message": "stage timed out"})
+        if returncode == 0:
+            for category in REGARDLESS_OF_EXIT.get(self.stage, []):
+                if category in self.matches:
+                    return self._row(category, self.matches[category])
+            return {column: "" for column in FAILURE_COLUMNS}
+
+        for category in STAGE_PRIORITIES.get(self.stage, []):
+            if category in self.matches:
+                match = self.matches[category]
+                if category == "test_mismatch" and not match["file"] and self._test_location:
+                    match["file"], match["line"] = self._test_location
+                return self._row(category, match)
+
+        if returncode < 0 or returncode in CRASH_EXIT_CODES:
+            return self._row("crash", {"message": f"exit code {returncode}"})
+        return self._row("other", {"message": f"exit code {returncode}"})
+
+    def _row(self, category, match):
+        return {
+            "failure_stage": self.stage,
+            "failure_category": category,
+            "failure_file": match.get("file", ""),
+            "failure_line": match.get("line", ""),
+            "failure_message": match.get("message", ""),
+        }
@@ -0,0 +1,205 @@
+"""
+Usage: python flaky.py detect [--dir <benchmark_dir>] [--repo duckdb] [--problems <id> ...] [--runs 10] [--jobs N]
+       python flaky.py report [--dir <benchmark_dir>] [--repo duckdb]
+
+Finds problems whose tests pass or fail at random (the kind that ended up in buggy_tests/ by hand),
+since they make pass@k meaningless.
+
+`detect` builds each problem twice in repos/<repo>: at base_commit with test.patch ("base", where
+its tests should fail) and with fix.patch on top ("gold", where they should pass). In each state it
+runs every test file of the problem --runs times, --jobs runs at once, on the same build. The result
+goes to <problem_dir>/flakiness.json:
+
+  base_commit, test_patch   what the record was computed for (a changed test.patch invalidates it)
+  runs                      runs per test file and state
+  tests                     {test file: {"base": passes, "gold": passes}}
+  flake_rate                highest flake rate of any test in either state
+  flaky_tests               test files with a flake rate above 0
+
+The flake rate of a test in one state is the share of its runs that disagree with the majority
+outcome: 0 for a stable test, 0.5 for a coin flip.
+
+aider_benchmark.py and the work queue read these records with --flaky-policy:
+  quarantine   flaky problems get no attempts (they're listed in the run's _meta.json)
+  retry        a failed test stage of a flaky problem is run again, up to --flaky-retries times,
+               on the same build (the default; problems without a record are never retried)
+  off          records are ignored
+
+Runs in parallel share the checkout. DuckDB's unittest keeps its temporary files per process, but
+tests that write to fixed paths can interfere with each other; use --jobs 1 to rule that out.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import adapters
+import build_profiles
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+SCRIPT_DIR = Path(__file__).resolve().parent
+RECORD_NAME = "flakiness.json"
+POLICIES = ["retry", "quarantine", "off"]
+FLAKY_COLUMNS = ["test_retries"]
+RUN_TIMEOUT = 1800
+
+
+def patch_hash(path):
+    path = Path(path)
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:12] if path.exists() else ""
+
+
+def flake_rate(passes, runs):
+    return round(min(passes, runs - passes) / runs, 3) if runs else 0.0
+
+
+def load_record(problem_dir, problem_data):
+    """The problem's flakiness record, or None if there is none for its current base_commit and test.patch."""
+    path = Path(problem_dir) / RECORD_NAME
+    if not path.exists():
+        return None
+    record = json.loads(path.read_text())
+    if record.get("base_commit") != problem_data.get("base_commit") or \
+            record.get("test_patch") != patch_hash(Path(problem_dir) / "test.patch"):
+        return None
+    return record
+
+
+def is_flaky(problem_dir, problem_data):
+    record = load_record(problem_dir, problem_data)
+    return bool(record and record["flaky_tests"])
+
+
+def quarantined(problems, policy):
+    """Names of the flaky problems among (problem_dir, problem_data) that `policy` keeps out of a run."""
+    if policy != "quarantine":
+        return []
+    return [problem.name for problem, data in problems if data is not None and is_flaky(problem, data)]
+
+
+def script(name, *args, check=True):
+    """Run one of the aider_scripts shell scripts on repos/<repo>, with its output going to ours."""
+    return subprocess.run(["bash", str(SCRIPT_DIR / name), str(HONOURS_DIR), *args], check=check).returncode == 0
+
+
+def run_repeated(adapter, test_files, test_patch, runs, jobs):
+    """{test file: passes} over `runs` runs of each test file, `jobs` at a time."""
+    repo_dir = os.environ.get("REPO_DIR") or str(adapter.source_repo)
+
+    def run_once(test_file):
+        cmd = ["python3", str(SCRIPT_DIR / "adapters.py"), "--repo", adapter.name, "test", "--test-patch", str(test_patch),
+               repo_dir, test_file]
+        try:
+            return subprocess.run(cmd, cwd=repo_dir, capture_output=True, timeout=RUN_TIMEOUT).returncode == 0
+        except subprocess.TimeoutExpired:
+            return False
+
+    jobs_list = [test_file for test_file in test_files for _ in range(runs)]
+    passes = {test_file: 0 for test_file in test_files}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for test_file, passed in zip(jobs_list, pool.map(run_once, jobs_list)):
+            passes[test_file] += int(passed)
+    return passes
+
+
+def detect(adapter, problem, problem_data, runs, jobs, build_profile):
+    """Build the base and gold states of a problem, run its tests repeatedly in each, write the record."""
+    test_files = adapter.modified_test_files(problem_data)
+    test_patch = problem / "test.patch"
+    if not test_files:
+        print(f"⚠️ {problem.name} has no test files, skipping")
+        return None
+
+    start = time.time()
+    script("clean_repo.sh", check=False)
+    script("checkout.sh", problem_data["base_commit"])
+    script("apply_test_patch.sh", str(test_patch))
+    passes = {}
+    for state, patch in (("base", None), ("gold", problem / "fix.patch")):
+        # The gold build is incremental on top of the base one
+        if patch and not script("apply_test_patch.sh", str(patch), check=False):
+            print(f"❌ fix.patch doesn't apply for {problem.name}")
+            return None
+        if not script("build.sh", build_profile, *test_files, check=False):
+            print(f"❌ {state} build failed for {problem.name}")
+            return None
+        print(f"🧪 Running {len(test_files)} test file(s) of {problem.name} {runs} times ({state})")
+        passes[state] = run_repeated(adapter, test_files, test_patch, runs, jobs)
+
+    tests = {test_file: {state: passes[state][test_file] for state in passes} for test_file in test_files}
+    rates = {test_file: max(flake_rate(n, runs) for n in counts.values()) for test_file, counts in tests.items()}
+    record = {
+        "base_commit": problem_data["base_commit"],
+        "test_patch": patch_hash(test_patch),
+        "runs": runs,
+        "tests": tests,
+        "flake_rate": max(rates.values()),
+        "flaky_tests": [test_file for test_file, rate in rates.items() if rate > 0],
+        "seconds": round(time.time() - start, 1),
+    }
+    (problem / RECORD_NAME).write_text(json.dumps(record, indent=2) + "\n")
+    for test_file, counts in tests.items():
+        status = "⚠️ flaky" if rates[test_file] > 0 else "✅ stable"
+        print(f"{status} {test_file}: base {counts['base']}/{runs} passed, gold {counts['gold']}/{runs} passed")
+    return record
+
+
+def report(benchmark_dir):
+    checked = flaky = 0
+    for problem in sorted(Path(benchmark_dir).iterdir(), key=lambda p: (len(p.name), p.name)):
+        data_path = problem / f"{problem.name}.json"
+        if not data_path.exists() or not (problem / RECORD_NAME).exists():
+            continue
+        record = load_record(problem, json.loads(data_path.read_text()))
+        if record is None:
+            print(f"{problem.name:>8}  stale record (base_commit or test.patch changed)")
+            continue
+        checked += 1
+        if record["flaky_tests"]:
+            flaky += 1
+            print(f"{problem.name:>8}  flake rate {record['flake_rate']:.2f}  {' '.join(record['flaky_tests'])}")
+    print(f"{flaky} of {checked} checked problems are flaky")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Find problems with flaky tests by running them repeatedly")
+    sub = parser.add_subparsers(dest="command", required=True)
+    detect_parser = sub.add_parser("detect", help="Run each problem's tests repeatedly on the base and gold states")
+    detect_parser.add_argument("--dir", type=str, help="Benchmark directory (default: the repo's benchmark)")
+    detect_parser.add_argument("--repo", type=str, choices=list(adapters.ADAPTERS), default=adapters.DEFAULT_REPO)
+    detect_parser.add_argument("--problems", nargs="*", help="Only these problem ids")
+    detect_parser.add_argument("--runs", type=int, default=10, help="Runs per test file and state")
+    detect_parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Test runs at once")
+    detect_parser.add_argument("--build-profile", type=str, choices=list(build_profiles.PROFILES))
+    report_parser = sub.add_parser("report", help="List the flaky problems of a benchmark")
+    report_parser.add_argument("--dir", type=str, help="Benchmark directory (default: the repo's benchmark)")
+    report_parser.add_argument("--repo", type=str, choices=list(adapters.ADAPTERS), default=adapters.DEFAULT_REPO)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.command == "report":
+        report(args.dir or adapters.get(args.repo).benchmark_dir)
+        return
+
+    sys.stdout.reconfigure(line_buffering=True)
+    adapter = adapters.use(args.repo)
+    benchmark_dir = Path(args.dir or adapter.benchmark_dir).resolve()
+    build_profile = args.build_profile or build_profiles.default_profile(adapter.name)
+    problems = [p for p in sorted(benchmark_dir.iterdir()) if (p / f"{p.name}.json").exists()]
+    if args.problems:
+        problems = [p for p in problems if p.name in args.problems]
+    for problem in problems:
+        with open(problem / f"{problem.name}.json") as f:
+            detect(adapter, problem, json.load(f), args.runs, args.jobs, build_profile)
+
+
+if __name__ == "__main__":
+    main()
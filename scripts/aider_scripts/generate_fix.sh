@@ -4,7 +4,7 @@
 
 set -e
 
-# Usage: ./generate_fix.sh <honours_dir> <problem_directory> <problem_id> <model_name> [--thinking-tokens <value>] [--reasoning-effort <value>]
+# Usage: ./generate_fix.sh <honours_dir> <problem_directory> <problem_id> <model_name> [--thinking-tokens <value>] [--reasoning-effort <value>] [--context-map <file>] [--files "<file> ..."]
 # Run from project root directory
 
 # Arguments
@@ -16,6 +16,8 @@ MODEL_NAME="$4"
 # Optional parameters
 THINKING_TOKENS=""
 REASONING_EFFORT=""
+CONTEXT_MAP=""
+FILES=""
 
 # Parse optional arguments
 shift 4
@@ -29,6 +31,14 @@ while [[ $# -gt 0 ]]; do
       REASONING_EFFORT="$2"
       shift 2
       ;;
+    --context-map)
+      CONTEXT_MAP="$2"
+      shift 2
+      ;;
+    --files)
+      FILES="$2"
+      shift 2
+      ;;
     *)
       echo "Unknown option: $1"
       exit 1
@@ -37,14 +47,18 @@ while [[ $# -gt 0 ]]; do
 done
 
 # Paths
-DUCKDB_DIR="$HONOURS_DIR/repos/duckdb"
+DUCKDB_DIR="${REPO_DIR:-$HONOURS_DIR/repos/${HONOURS_REPO:-duckdb}}"
 IGNORE_SRC="$HONOURS_DIR/scripts/aider_scripts/.aiderignore"
 PROMPT_PATH="$PROBLEM_DIR/$PROBLEM_ID.prompt"
 JSON_PATH="$PROBLEM_DIR/$PROBLEM_ID.json"
 
 
-# Extract modified files
-MODIFIED_FILES=$(jq -r '.modified_files[]' "$JSON_PATH")
+# Extract modified files, unless the files to edit were given (normalized by adapters.py, or retrieved, see bm25_index.py)
+if [ -n "$FILES" ]; then
+  MODIFIED_FILES="$FILES"
+else
+  MODIFIED_FILES=$(jq -r '.modified_files[]' "$JSON_PATH")
+fi
 
 # Load .env from honours directory
 if [ -f "$HONOURS_DIR/.env" ]; then
@@ -82,6 +96,11 @@ if [ -n "$REASONING_EFFORT" ]; then
   AIDER_CMD="$AIDER_CMD --reasoning-effort $REASONING_EFFORT"
 fi
 
+# Add the context map (see symbol_index.py) as a read-only file
+if [ -n "$CONTEXT_MAP" ]; then
+  AIDER_CMD="$AIDER_CMD --read \"$CONTEXT_MAP\""
+fi
+
 # Add the prompt file and modified files
 AIDER_CMD="$AIDER_CMD -f \"$PROMPT_PATH\" $MODIFIED_FILES"
 
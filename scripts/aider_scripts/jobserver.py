@@ -0,0 +1,275 @@
+"""
+Usage: python jobserver.py serve [--slots N] [--path <fifo>]
+
+A single machine-wide GNU make jobserver shared by every build the harness starts.
+
+The jobserver is a named FIFO holding one byte per free compile slot. make (all versions with
+--jobserver-auth) and Ninja >= 1.13 take a byte before starting a job and put it back afterwards,
+so however many builds run at once (parallel attempts, verification worktrees, several benchmark
+runs) at most `slots` compile jobs run on the machine.
+
+Whoever starts first owns it: aider_benchmark.py and verify_PRs.py start a JobServer, which takes
+an exclusive lock next to the FIFO and fills it. If `jobserver.py serve` (or another run) already
+holds the lock, they attach to that one instead, so several runs share one budget.
+
+Builds find the FIFO through the HONOURS_JOBSERVER environment variable (see builder.py). Each
+build first takes a token for its own implicit job slot, so the slot count is a hard bound.
+Ninja before 1.13 (what most distributions ship) ignores the jobserver; builds with it take as
+many tokens as are free right away (at least one, up to --jobs) and pass that as --parallel.
+
+Tokens are only returned by the process holding them, so a build that is killed (a stage timeout,
+the cgroup being killed, the OOM killer) takes its tokens with it. To get them back, every build
+that holds tokens keeps a locked file in <fifo>.builds/ for as long as it runs, and takes its first
+token under a shared lock on <fifo>.acct. Every few seconds the owner takes that lock exclusively
+and, if no build holds tokens, tops the FIFO back up to `slots`; a build that died without
+returning its tokens is cleaned up at the same time.
+"""
+
+import argparse
+import array
+import fcntl
+import functools
+import os
+import re
+import select
+import signal
+import stat
+import subprocess
+import termios
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_PATH = HONOURS_DIR / "cache" / "jobserver.fifo"
+ENV_VAR = "HONOURS_JOBSERVER"
+TOKEN = b"+"
+REFILL_SECONDS = 5
+
+
+def _ledger_dir(path):
+    return Path(f"{path}.builds")
+
+
+def _acct_path(path):
+    return Path(f"{path}.acct")
+
+
+class JobServer:
+    def __init__(self, slots=None, path=DEFAULT_PATH):
+        self.slots = slots or os.cpu_count()
+        self.path = Path(path)
+        self.owner = False
+        self._lock_fd = None
+        self._fifo_fd = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Someone else owns the jobserver; builds will share their slots
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            print(f"Attached to existing jobserver at {self.path}")
+            return self
+
+        self.owner = True
+        if self.path.exists():
+            self.path.unlink()
+        os.mkfifo(self.path, 0o600)
+        # Holding a read/write descriptor keeps the tokens alive while no build is running
+        self._fifo_fd = os.open(self.path, os.O_RDWR | os.O_NONBLOCK)
+        os.write(self._fifo_fd, TOKEN * self.slots)
+        _ledger_dir(self.path).mkdir(exist_ok=True)
+        self._stop.clear()
+        threading.Thread(target=self._refill_loop, daemon=True).start()
+        print(f"Started jobserver with {self.slots} slots at {self.path}")
+        return self
+
+    def _refill_loop(self):
+        while not self._stop.wait(timeout=REFILL_SECONDS):
+            self.refill()
+
+    def free(self):
+        """Tokens in the FIFO right now."""
+        count = array.array("i", [0])
+        fcntl.ioctl(self._fifo_fd, termios.FIONREAD, count)
+        return count[0]
+
+    def refill(self):
+        """Put back the tokens of killed builds, if no build holds any right now. Returns how many."""
+        with open(_acct_path(self.path), "a") as acct:
+            # Excludes builds between taking their first token and registering it
+            fcntl.flock(acct, fcntl.LOCK_EX)
+            if self._fifo_fd is None or _live_builds(self.path):
+                return 0
+            missing = self.slots - self.free()
+            if missing > 0:
+                os.write(self._fifo_fd, TOKEN * missing)
+                print(f"Jobserver: recovered {missing} token(s) lost by killed builds")
+            return max(missing, 0)
+
+    def stop(self):
+        self._stop.set()
+        if self._fifo_fd is not None:
+            os.close(self._fifo_fd)
+            self._fifo_fd = None
+        if self.owner:
+            self.path.unlink(missing_ok=True)
+            self.owner = False
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def env(self):
+        """Environment for child processes that should build through this jobserver."""
+        return {ENV_VAR: str(self.path)}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def available(path):
+    path = Path(path) if path else None
+    return path is not None and path.exists() and stat.S_ISFIFO(path.stat().st_mode)
+
+
+def _live_builds(path):
+    """Registered builds still running; files of builds that died are removed."""
+    live = 0
+    for entry in _ledger_dir(path).glob("*"):
+        try:
+            fd = os.open(entry, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            live += 1
+        else:
+            entry.unlink(missing_ok=True)
+        finally:
+            os.close(fd)
+    return live
+
+
+@contextmanager
+def _first_token(path):
+    """Open the FIFO, wait for one token and register as a build holding tokens. Yields (fd, token)."""
+    fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+    _ledger_dir(path).mkdir(exist_ok=True)
+    ledger = _ledger_dir(path) / f"{os.getpid()}-{time.time_ns()}"
+    ledger_fd = None
+    try:
+        with open(_acct_path(path), "a") as acct:
+            while ledger_fd is None:
+                select.select([fd], [], [])  # until a token might be free
+                fcntl.flock(acct, fcntl.LOCK_SH)
+                try:
+                    token = os.read(fd, 1)
+                except BlockingIOError:
+                    continue  # another build got it first
+                else:
+                    # Not inheritable: the lock goes away with this process, not with its children
+                    ledger_fd = os.open(ledger, os.O_WRONLY | os.O_CREAT, 0o644)
+                    fcntl.flock(ledger_fd, fcntl.LOCK_EX)
+                finally:
+                    fcntl.flock(acct, fcntl.LOCK_UN)
+        yield fd, token
+    finally:
+        os.close(fd)
+        if ledger_fd is not None:
+            ledger.unlink(missing_ok=True)
+            os.close(ledger_fd)
+
+
+@contextmanager
+def slot(path):
+    """Hold one token (the build's implicit job slot) and yield a client description.
+
+    Yields a dict with `fds` (read, write descriptors, inheritable) and `path` so the caller can
+    build MAKEFLAGS for make (fd based) or Ninja (fifo based).
+    """
+    with _first_token(path) as (fd, token):
+        os.set_blocking(fd, True)
+        os.set_inheritable(fd, True)
+        try:
+            yield {"fds": (fd, fd), "path": str(path)}
+        finally:
+            os.write(fd, token)
+
+
+@contextmanager
+def tokens(path, wanted):
+    """Hold one token (waiting for it) plus whatever others are free, up to `wanted`; yields how many.
+
+    For build tools that can't be jobserver clients: their fixed -j stays within the tokens held.
+    """
+    with _first_token(path) as (fd, token):
+        held = [token]
+        try:
+            while len(held) < wanted:
+                try:
+                    token = os.read(fd, 1)
+                except BlockingIOError:
+                    break
+                if not token:
+                    break
+                held.append(token)
+            yield len(held)
+        finally:
+            os.write(fd, b"".join(held))
+
+
+@functools.lru_cache(maxsize=None)
+def ninja_is_client():
+    """Whether the installed Ninja understands the jobserver (1.13 and later)."""
+    try:
+        version = subprocess.run(["ninja", "--version"], capture_output=True, text=True).stdout
+    except FileNotFoundError:
+        return False
+    match = re.match(r"(\d+)\.(\d+)", version.strip())
+    return bool(match) and (int(match.group(1)), int(match.group(2))) >= (1, 13)
+
+
+def makeflags(client, generator):
+    """MAKEFLAGS value that makes make/Ninja act as a client of the jobserver."""
+    if generator == "Ninja":
+        # Ninja >= 1.13 only understands the fifo form (make >= 4.4 does too)
+        return f"-j --jobserver-auth=fifo:{client['path']}"
+    r, w = client["fds"]
+    return f"-j --jobserver-auth={r},{w}"
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Run a machine-wide jobserver for harness builds")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Own the jobserver until interrupted")
+    serve.add_argument("--slots", type=int, default=os.cpu_count(), help="Total compile jobs machine-wide")
+    serve.add_argument("--path", default=str(DEFAULT_PATH), help="Path of the jobserver FIFO")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    with JobServer(args.slots, args.path) as js:
+        if not js.owner:
+            print("Another process already owns this jobserver")
+            return
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        try:
+            stop.wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
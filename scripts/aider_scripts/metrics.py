@@ -0,0 +1,256 @@
+"""
+Usage: python metrics.py <run_dir>
+
+Live metrics of a benchmark run in the Prometheus text format.
+
+aider_benchmark.py and the work_queue.py coordinator keep a RunMetrics for their run and
+write it to <run_dir>/metrics.prom every --metrics-interval seconds (atomically, so it can be
+picked up by node_exporter's textfile collector). With --metrics-port the same text is also
+served on http://127.0.0.1:<port>/metrics for Prometheus to scrape.
+
+Exported (all prefixed honours_, labelled with run="<run name>"):
+
+  attempts_total / _queued / _running / _completed_total   queue depths
+  workers, worker_utilisation                              busy share of the attempt workers
+  workers_active                                           work queue hosts seen recently (coordinator)
+  stage_running{stage}, stage_completed_total{stage}       per stage (setup, generate, build, test)
+  stage_seconds_total{stage}                               time spent in each stage
+  stage_success_total{stage}, stage_success_ratio{stage}   success rates so far
+  failures_total{category}                                 failure_category of failed attempts
+  config_cache_total{result}, config_cache_hit_ratio       CMake configure cache (builder.py)
+  cost_usd_total                                           model spend so far
+  eta_seconds                                              see planner.Eta
+  last_progress_timestamp_seconds                          last stage start or finish; a stall shows
+                                                           up as this falling behind time()
+
+Running this file prints the last metrics.prom of a run.
+"""
+
+import argparse
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PREFIX = "honours_"
+FILE_NAME = "metrics.prom"
+STAGES = ["setup", "generate", "build", "test"]
+# Attempt CSV column telling whether the stage succeeded
+SUCCESS_COLUMNS = {"generate": "generation_success", "build": "build_success", "test": "test_success"}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render(families):
+    """Prometheus text for [(name, type, help, [(labels, value), ...]), ...]."""
+    lines = []
+    for name, kind, help_text, samples in families:
+        lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+        for labels, value in samples:
+            value = round(value, 3) if isinstance(value, float) else value
+            lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class RunMetrics:
+    """
+    Counters and gauges of one run. Thread safe.
+
+    Fed by stage_started/stage_finished (registered as a SegmentLog listener) and attempt_started/
+    attempt_finished. `queue_state` overrides the queue gauges with a callable returning
+    {"queued", "running", "workers"}, for when attempts don't run in this process.
+    """
+
+    def __init__(self, run_name, total, workers=None, eta=None, queue_state=None):
+        self.run = run_name
+        self.total = total
+        self.workers = workers
+        self.eta = eta
+        self.queue_state = queue_state
+        self.started = 0
+        self.completed = 0
+        self.stage_running = Counter()
+        self.stage_completed = Counter()
+        self.stage_seconds = Counter()
+        self.stage_success = Counter()
+        self.failures = Counter()
+        self.config_cache = Counter()
+        self.cost = 0.0
+        self.last_progress = time.time()
+        self._lock = threading.Lock()
+
+    def stage_started(self, problem, attempt, stage):
+        with self._lock:
+            self.stage_running[stage] += 1
+            self.last_progress = time.time()
+
+    def stage_finished(self, entry, imported=False):
+        """A log index entry (see segment_log.py) was written. Imported entries ran elsewhere."""
+        with self._lock:
+            if not imported:
+                self.stage_running[entry["stage"]] -= 1
+            self.stage_completed[entry["stage"]] += 1
+            self.stage_seconds[entry["stage"]] += entry["duration"]
+            self.last_progress = time.time()
+
+    def attempt_started(self):
+        with self._lock:
+            self.started += 1
+
+    def attempt_finished(self, row):
+        with self._lock:
+            self.completed += 1
+            for stage, column in SUCCESS_COLUMNS.items():
+                if str(row.get(column)) == "1":
+                    self.stage_success[stage] += 1
+            if str(row.get("test_success")) != "1":
+                self.failures[row.get("failure_category") or "unknown"] += 1
+            if row.get("config_cache"):
+                self.config_cache[row["config_cache"]] += 1
+            if row.get("cost_usd") not in ("", None):
+                self.cost += float(row["cost_usd"])
+            self.last_progress = time.time()
+
+    def render(self):
+        run = {"run": self.run}
+        # Taken before our lock: the coordinator calls attempt_finished with its own lock held
+        state = self.queue_state() if self.queue_state else None
+        with self._lock:
+            if state is None:
+                state = {"queued": self.total - self.started, "running": self.started - self.completed,
+                         "workers": self.workers}
+            families = [
+                ("attempts_total", "gauge", "Attempts in this run", [(run, self.total)]),
+                ("attempts_queued", "gauge", "Attempts not started yet", [(run, state["queued"])]),
+                ("attempts_running", "gauge", "Attempts in progress", [(run, state["running"])]),
+                ("attempts_completed_total", "counter", "Attempts finished", [(run, self.completed)]),
+                ("stage_running", "gauge", "Stages in progress",
+                 [(dict(run, stage=s), self.stage_running[s]) for s in STAGES]),
+                ("stage_completed_total", "counter", "Stages finished",
+                 [(dict(run, stage=s), self.stage_completed[s]) for s in STAGES]),
+                ("stage_seconds_total", "counter", "Seconds spent in finished stages",
+                 [(dict(run, stage=s), self.stage_seconds[s]) for s in STAGES]),
+                ("stage_success_total", "counter", "Finished attempts that passed the stage",
+                 [(dict(run, stage=s), self.stage_success[s]) for s in SUCCESS_COLUMNS]),
+                ("failures_total", "counter", "Failed attempts by failure_category",
+                 [(dict(run, category=c), n) for c, n in sorted(self.failures.items())]),
+                ("config_cache_total", "counter", "Builds by CMake configure cache result",
+                 [(dict(run, result=r), n) for r, n in sorted(self.config_cache.items())]),
+                ("cost_usd_total", "counter", "Model spend so far in USD", [(run, self.cost)]),
+                ("last_progress_timestamp_seconds", "gauge", "Last time a stage started or finished",
+                 [(run, self.last_progress)]),
+            ]
+
+            # Ratios only once they mean something
+            if self.completed:
+                families.append(("stage_success_ratio", "gauge", "Share of finished attempts that passed the stage",
+                                 [(dict(run, stage=s), self.stage_success[s] / self.completed) for s in SUCCESS_COLUMNS]))
+            builds = sum(self.config_cache.values())
+            if builds:
+                hits = builds - self.config_cache["fresh"]
+                families.append(("config_cache_hit_ratio", "gauge", "Share of builds that skipped a fresh configure",
+                                 [(run, hits / builds)]))
+            if state.get("active_workers") is not None:
+                families.append(("workers_active", "gauge", "Work queue workers seen within the lease time",
+                                 [(run, state["active_workers"])]))
+            if state.get("workers"):
+                families.append(("workers", "gauge", "Attempt workers", [(run, state["workers"])]))
+                families.append(("worker_utilisation", "gauge", "Share of workers running an attempt",
+                                 [(run, min(state["running"] / state["workers"], 1))]))
+            eta = self.eta.seconds_left() if self.eta else None
+            if eta is not None:
+                families.append(("eta_seconds", "gauge", "Estimated seconds until the run finishes", [(run, eta)]))
+        return render(families)
+
+    def write(self, path):
+        path = Path(path)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(self.render())
+        os.replace(tmp, path)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Exporter:
+    """Writes a RunMetrics to <run_dir>/metrics.prom periodically and optionally serves it over HTTP."""
+
+    def __init__(self, metrics, run_dir, interval=30, port=None, bind="127.0.0.1"):
+        self.metrics = metrics
+        self.path = Path(run_dir) / FILE_NAME
+        self.interval = interval
+        self.port = port
+        self.bind = bind
+        self._server = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.port:
+            self._server = ThreadingHTTPServer((self.bind, self.port), _Handler)
+            self._server.daemon_threads = True
+            self._server.metrics = self.metrics
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            print(f"📈 Metrics on http://{self.bind}:{self.port}/metrics")
+        threading.Thread(target=self._write_loop, daemon=True).start()
+        return self
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def _write(self):
+        try:
+            self.metrics.write(self.path)
+        except OSError as e:
+            print(f"⚠️ Could not write {self.path}: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        self._write()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Print the last metrics written by a run")
+    parser.add_argument("run_dir", type=str, help="Run directory (outputs/<run>)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    path = Path(args.run_dir) / FILE_NAME
+    if not path.exists():
+        raise SystemExit(f"No {FILE_NAME} in {args.run_dir}")
+    age = time.time() - path.stat().st_mtime
+    print(path.read_text(), end="")
+    print(f"# written {age:.0f}s ago")
+
+
+if __name__ == "__main__":
+    main()
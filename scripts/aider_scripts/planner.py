@@ -0,0 +1,211 @@
+"""
+Usage: python planner.py --m <model> [<model> ...] --k <num_completions> [--dir <benchmark_dir>] [--repo <name>] [--workers N] [--workspaces]
+
+Estimates a run before launching it: wall-clock for the given worker count, model spend and disk.
+
+Everything comes from earlier runs in outputs/ and final_results/ (see run_history.py):
+
+  wall-clock  per attempt: median setup + the model's median generate time + the problem's
+              predicted build and test time (scheduler.py), laid out longest-first on the workers.
+              Build medians already include whatever CMake configure cache hits those runs had.
+  spend       the model's median tokens and cost per attempt (aider's "Tokens: ... Cost: ..." lines)
+  disk        median log bytes per attempt, plus one workspace lower layer per problem with
+              --workspaces (sizes from the cache manager)
+
+Models are matched on their last path component, so openrouter/openai/gpt-5 uses history from
+openai/gpt-5 runs too. `aider_benchmark.py ... --plan` prints the same estimate for its arguments.
+
+While a run is going, Eta turns the predicted work of the remaining attempts into an ETA using
+the throughput observed so far.
+"""
+
+import argparse
+import statistics
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import adapters
+import run_history
+import scheduler
+from cache_manager import CacheManager, format_size
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_BENCHMARK_DIR = HONOURS_DIR / "benchmarks" / "duckdb_benchmark"
+
+
+def model_key(model):
+    return model.split("/")[-1].lower()
+
+
+def format_duration(seconds):
+    hours, remainder = divmod(int(seconds), 3600)
+    return f"{hours}h {remainder // 60:02d}m"
+
+
+def _median(values, default=None):
+    return statistics.median(values) if values else default
+
+
+class History:
+    """Aggregates of every earlier run that planning needs."""
+
+    def __init__(self, history_dirs=None):
+        self.stages = scheduler.stage_history(history_dirs)
+        self.generate = defaultdict(list)  # model key -> seconds
+        self.usage = defaultdict(list)  # model key -> usage dicts
+        self.log_bytes = []  # per attempt
+        self.config_cache = []  # "existing" / "cached" / "fresh" per build
+
+        for run_dir in run_history.run_dirs(history_dirs or run_history.HISTORY_DIRS):
+            model = model_key(run_history.read_meta(run_dir).get("model", ""))
+            attempts = run_history.read_attempts(run_dir)
+            entries = run_history.stage_entries(run_dir)
+            if model:
+                self.generate[model] += [seconds for _, stage, seconds in entries if stage == "generate"]
+                self.usage[model] += run_history.attempt_usage(run_dir)
+            self.config_cache += [row["config_cache"] for row in attempts if row.get("config_cache")]
+
+            logs = [p for p in (run_dir / "logs").rglob("*") if p.is_file()] if (run_dir / "logs").is_dir() else []
+            legacy = run_history.legacy_log(run_dir)
+            if legacy:
+                logs.append(legacy)
+            if logs and attempts:
+                self.log_bytes.append(sum(p.stat().st_size for p in logs) / len(attempts))
+
+    def stage_median(self, stage):
+        return _median([s for stages in self.stages.values() for s in stages.get(stage, [])], 0)
+
+    def generate_seconds(self, model):
+        """Median generate time of the model, else of all models. Returns (seconds, from this model)."""
+        own = self.generate.get(model_key(model))
+        if own:
+            return _median(own), True
+        return _median([s for values in self.generate.values() for s in values], 0), False
+
+    def usage_per_attempt(self, model):
+        usage = self.usage.get(model_key(model), [])
+        costs = [float(u["cost_usd"]) for u in usage if u.get("cost_usd") not in ("", None)]
+        return {
+            "attempts": len(usage),
+            "tokens_sent": _median([int(u["tokens_sent"]) for u in usage]),
+            "tokens_received": _median([int(u["tokens_received"]) for u in usage]),
+            "cost_usd": _median(costs),
+        }
+
+    def cache_hit_rate(self):
+        if not self.config_cache:
+            return None
+        return sum(c != "fresh" for c in self.config_cache) / len(self.config_cache)
+
+
+def attempt_seconds(history, model, problems, repo=adapters.DEFAULT_REPO):
+    """Predicted seconds of one attempt of each problem (by name) of `repo` for `model`."""
+    build_test, _ = scheduler.predict(problems, history.stages, repo)
+    generate, _ = history.generate_seconds(model)
+    setup = history.stage_median("setup")
+    return {name: setup + generate + seconds for name, seconds in build_test.items()}
+
+
+def plan(models, k, benchmark_dir, workers=1, workspaces=False, history=None, repo=adapters.DEFAULT_REPO):
+    history = history or History()
+    problems = sorted((p for p in Path(benchmark_dir).iterdir() if p.is_dir() and (p / f"{p.name}.json").exists()),
+                      key=lambda p: int(p.name))
+    attempts = len(problems) * k
+    _, from_history = scheduler.predict(problems, history.stages, repo)
+    known = sum(from_history.values())
+    print(f"Plan: {len(problems)} problems x k={k} = {attempts} attempts per model, {workers} worker(s)")
+    print(f"Build/test timings from earlier runs for {known}/{len(problems)} problems, the rest estimated from diff size")
+    if not history.stage_median("build"):
+        print("⚠️ No stage timings in outputs/ yet; wall-clock estimates are not meaningful")
+
+    total_seconds = 0
+    total_cost = 0.0
+    cost_known = True
+    for model in models:
+        per_attempt = attempt_seconds(history, model, problems, repo)
+        durations = sorted((per_attempt[p.name] for p in problems for _ in range(k)), reverse=True)
+        wall = scheduler.makespan(durations, workers)
+        total_seconds += wall
+        _, own_generate = history.generate_seconds(model)
+        usage = history.usage_per_attempt(model)
+
+        print(f"\n{model}")
+        print(f"  wall-clock   {format_duration(wall)}"
+              f"{'' if own_generate else ' (no generate timings for this model; using all models)'}")
+        if usage["cost_usd"] is not None:
+            cost = usage["cost_usd"] * attempts
+            total_cost += cost
+            print(f"  spend        ${cost:,.2f} (median ${usage['cost_usd']:.3f}/attempt over {usage['attempts']} attempts)")
+        else:
+            cost_known = False
+            print("  spend        unknown (no cost history for this model)")
+        if usage["tokens_sent"] is not None:
+            print(f"  tokens       {usage['tokens_sent'] * attempts / 1e6:.1f}M sent, "
+                  f"{usage['tokens_received'] * attempts / 1e6:.1f}M received")
+
+    log_bytes = _median(history.log_bytes, 0) * attempts * len(models)
+    workspace_sizes = [size for _, kind, size, _ in CacheManager().artifacts() if kind == "workspace"]
+    workspace_bytes = _median(workspace_sizes, 0) * len(problems) if workspaces else 0
+    hit_rate = history.cache_hit_rate()
+
+    print(f"\nTotal wall-clock (models one after another): {format_duration(total_seconds)}")
+    if cost_known:
+        print(f"Total spend: ${total_cost:,.2f}")
+    else:
+        print(f"Total spend: at least ${total_cost:,.2f} (some models have no cost history)")
+    disk = f"{format_size(int(log_bytes))} logs"
+    if workspaces:
+        disk += f" + {format_size(int(workspace_bytes))} workspaces" if workspace_sizes else " + workspaces (size unknown yet)"
+    print(f"Disk: {disk}")
+    if hit_rate is not None:
+        print(f"CMake configure cache hit rate so far: {hit_rate:.0%}")
+    return total_seconds
+
+
+class Eta:
+    """Remaining wall-clock of a run: predicted work left, scaled by the observed work rate."""
+
+    def __init__(self, weights):
+        # Any unit works (seconds or diff sizes); only ratios matter
+        self.remaining = {key: max(weight, 1) for key, weight in weights.items()}
+        self.total = sum(self.remaining.values())
+        self.done_work = 0
+        self.start = time.time()
+
+    def done(self, key):
+        self.done_work += self.remaining.pop(key, 0)
+        return self.describe()
+
+    def seconds_left(self):
+        """Estimated seconds until the last attempt finishes, or None before any has."""
+        if not self.done_work:
+            return None
+        return (time.time() - self.start) * (self.total - self.done_work) / self.done_work
+
+    def describe(self):
+        eta = self.seconds_left()
+        if eta is None:
+            return ""
+        finish = time.strftime("%H:%M", time.localtime(time.time() + eta))
+        return f"⏱️ {len(self.remaining)} attempts left, ETA {format_duration(eta)} (around {finish})"
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Estimate wall-clock, spend and disk of a benchmark run")
+    parser.add_argument("--m", nargs="+", required=True, help="Model(s) to plan for")
+    parser.add_argument("--k", type=int, required=True, help="Number of completions per problem")
+    parser.add_argument("--dir", type=str, default=DEFAULT_BENCHMARK_DIR, help="Path to benchmark directory")
+    parser.add_argument("--repo", type=str, choices=list(adapters.ADAPTERS), default=adapters.DEFAULT_REPO)
+    parser.add_argument("--workers", type=int, default=1, help="Attempts run concurrently")
+    parser.add_argument("--workspaces", action="store_true", help="Include workspace lower layers in the disk estimate")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    plan(args.m, args.k, args.dir, args.workers, args.workspaces, repo=args.repo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Usage: python prepare_repo.py prepare [--repo <name>] [--dir <benchmark_dir>] [--url <remote>]
+       python prepare_repo.py verify [--repo <name>] [--dir <benchmark_dir>]
+
+Sets up repos/<repo> on a new host without a full clone, so that no checkout of a problem's
+base_commit has to go back to the network during a run.
+
+`prepare` makes a blobless partial clone (`git clone --filter=blob:none`: all commits and trees,
+no file contents) unless the repository already exists, then:
+
+  1. fetches every base_commit of the benchmark in one `git fetch --stdin` (commits that aren't on
+     a branch any more included) and keeps them under refs/honours/base/ so gc can't drop them
+  2. lists the blobs those commits' trees need that aren't local yet
+     (`git rev-list --objects --no-walk --missing=print`)
+  3. fetches exactly those blobs in one batched fetch, the way git's own lazy fetch does
+  4. runs `verify`
+
+`verify` checks that every base_commit is pinned and that nothing in its tree is missing, without
+touching the network, and exits with 1 otherwise. Running `prepare` again after adding problems
+only fetches what's new.
+
+The remote defaults to the adapter's GitHub URL (see adapters.py). It has to allow filters, which
+GitHub does; for a local mirror, serve it as file:// with
+
+    git -C <mirror> config uploadpack.allowFilter true
+    git -C <mirror> config uploadpack.allowAnySHA1InWant true
+
+Submodules are not part of this; see submodules.py.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import adapters
+
+BASE_REF_PREFIX = "refs/honours/base/"
+
+
+def git(repo, *args, input=None, check=True):
+    result = subprocess.run(["git", "-C", str(repo), *args], input=input, capture_output=True, text=True)
+    if check and result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args[:3])} failed: {result.stderr.strip()}")
+    return result
+
+
+def base_commits(benchmark_dir):
+    """Distinct base_commits of a benchmark, in problem order."""
+    commits = []
+    for problem in sorted(Path(benchmark_dir).iterdir()):
+        path = problem / f"{problem.name}.json"
+        if path.exists():
+            commit = json.loads(path.read_text()).get("base_commit")
+            if commit and commit not in commits:
+                commits.append(commit)
+    return commits
+
+
+def partial_clone(url, repo):
+    print(f"📥 Blobless clone of {url} into {repo}")
+    Path(repo).parent.mkdir(parents=True, exist_ok=True)
+    subprocess.run(["git", "clone", "--quiet", "--filter=blob:none", "--no-checkout", url, str(repo)], check=True)
+
+
+def fetch_commits(repo, commits):
+    """Fetch all `commits` in one go and pin them under BASE_REF_PREFIX."""
+    refspecs = "".join(f"{commit}:{BASE_REF_PREFIX}{commit}\n" for commit in commits)
+    # Commits that are already local don't go over the wire; the filter keeps blobs out of the pack
+    git(repo, "fetch", "--quiet", "--no-tags", "--no-write-fetch-head", "--filter=blob:none", "origin", "--stdin",
+        input=refspecs)
+
+
+def missing_objects(repo, commits):
+    """Objects the trees of `commits` need that aren't local. Never fetches anything itself."""
+    result = git(repo, "rev-list", "--objects", "--no-walk", "--missing=print", "--stdin", input="\n".join(commits) + "\n")
+    return [line[1:] for line in result.stdout.splitlines() if line.startswith("?")]
+
+
+def fetch_objects(repo, objects):
+    # Same invocation as git's promisor lazy fetch, with every object in one request
+    git(repo, "-c", "fetch.negotiationAlgorithm=noop", "fetch", "--quiet", "--no-tags", "--no-write-fetch-head",
+        "--recurse-submodules=no", "--filter=blob:none", "origin", "--stdin", input="\n".join(objects) + "\n")
+
+
+def unresolved_commits(repo, commits):
+    """Base commits that `prepare` hasn't pinned. Looking the objects up instead would fetch them lazily."""
+    result = git(repo, "for-each-ref", "--format=%(objectname)", BASE_REF_PREFIX)
+    pinned = set(result.stdout.split())
+    return [commit for commit in commits if commit not in pinned]
+
+
+def verify(repo, commits):
+    unresolved = unresolved_commits(repo, commits)
+    if unresolved:
+        print(f"❌ {len(unresolved)} base commit(s) haven't been fetched, e.g. {unresolved[0]}")
+        return False
+    missing = missing_objects(repo, commits)
+    if missing:
+        print(f"❌ {len(missing)} object(s) of the base commits are missing, e.g. {missing[0]}")
+        return False
+    print(f"✅ All {len(commits)} base commits and their trees are local")
+    return True
+
+
+def prepare(repo, url, commits):
+    start = time.time()
+    if not (Path(repo) / ".git").exists():
+        partial_clone(url, repo)
+
+    print(f"📥 Fetching {len(commits)} base commits")
+    fetch_commits(repo, commits)
+    missing = missing_objects(repo, commits)
+    if missing:
+        print(f"📥 Fetching {len(missing)} blobs needed by their trees")
+        fetch_objects(repo, missing)
+    print(f"⏱️ Prepared in {time.time() - start:.1f}s")
+    return verify(repo, commits)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Blobless clone of a repository with every base commit prefetched")
+    parser.add_argument("command", choices=["prepare", "verify"])
+    parser.add_argument("--repo", type=str, choices=list(adapters.ADAPTERS), default=adapters.DEFAULT_REPO,
+                        help="Repository to prepare (see adapters.py)")
+    parser.add_argument("--dir", type=str, help="Benchmark directory whose base commits to fetch (default: the repo's benchmark)")
+    parser.add_argument("--url", type=str, help="Remote to clone from (default: the repo's GitHub URL)")
+    parser.add_argument("--repo-dir", type=str, help="Where the clone lives (default: repos/<repo>)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    adapter = adapters.get(args.repo)
+    repo = Path(args.repo_dir or adapter.source_repo)
+    commits = base_commits(args.dir or adapter.benchmark_dir)
+    if not commits:
+        raise SystemExit(f"No base commits found in {args.dir or adapter.benchmark_dir}")
+    try:
+        ok = prepare(repo, args.url or adapter.url, commits) if args.command == "prepare" else verify(repo, commits)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
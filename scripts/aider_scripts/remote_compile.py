@@ -0,0 +1,235 @@
+"""
+Usage: python remote_compile.py check [--backend distcc|icecream]
+
+Distributed compilation for the build stage through distcc or icecream.
+
+With `--distributed` (builder.py, aider_benchmark.py) or HONOURS_DISTRIBUTED set to distcc,
+icecream or auto, compile commands get a compiler launcher (`compile_launcher.sh` + distcc/icecc)
+and are sent to helper machines:
+
+  distcc    helpers come from HONOURS_DISTCC_HOSTS, DISTCC_HOSTS, ~/.distcc/hosts or
+            /etc/distcc/hosts (distcc's host syntax, e.g. "10.0.0.5/16 10.0.0.6:3633/8 localhost/4").
+            Each helper is probed on its distccd port (3632 unless given) before the build and
+            only the ones that answer are passed on in DISTCC_HOSTS.
+  icecream  the scheduler (ICECC_SCHEDULER or HONOURS_ICECC_SCHEDULER, port 8765) is probed and
+            the scheduler hands out helpers itself.
+
+If no helper answers, the build runs locally under the shared jobserver as usual; the launcher
+stays in place so the CMake configuration doesn't change. Helpers that disappear during a build
+are handled by distcc/icecc themselves, which retry the job locally (DISTCC_FALLBACK).
+
+While distributing, the build runs with `--parallel` set to the helpers' capacity instead of
+taking jobserver slots: distcc's lock directory and the local iceccd already coordinate slots
+across every build on the machine.
+
+Every compile goes through compile_launcher.sh, which counts it; remote compiles are counted from
+the distcc/icecc log. builder.py prints the counts and reports them with its build stats.
+
+To try it on one machine, run a helper on localhost:
+
+    distccd --daemon --allow 127.0.0.1 --port 3633
+    HONOURS_DISTCC_HOSTS="127.0.0.1:3633/8" python remote_compile.py check
+"""
+
+import argparse
+import os
+import re
+import shutil
+import socket
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+LAUNCHER = SCRIPT_DIR / "compile_launcher.sh"
+
+MODE_ENV_VAR = "HONOURS_DISTRIBUTED"
+MODES = ["off", "auto", "distcc", "icecream"]
+
+DISTCC_PORT = 3632
+ICECC_SCHEDULER_PORT = 8765
+DISTCC_DEFAULT_LIMIT = 4  # distcc's own default jobs per remote host
+PROBE_TIMEOUT = 1.0
+
+STATS_COLUMNS = ["compile_jobs_remote", "compile_jobs_local"]
+
+# Lines in the tools' logs for a job that ran on another machine
+REMOTE_PATTERNS = {
+    "distcc": re.compile(r"compile \S+ on (?P<host>\S+) completed ok"),
+    "icecream": re.compile(r"Have to use host (?P<host>[^\s:]+)"),
+}
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+TOOLS = {"distcc": "distcc", "icecream": "icecc"}
+
+
+def parse_distcc_hosts(spec):
+    """Helpers from a distcc host list, as dicts with spec/host/port/limit. localhost is skipped."""
+    helpers = []
+    for token in spec.split():
+        if token.startswith("-") or token.startswith("+"):
+            # Options such as --randomize, and +zeroconf which we can't probe
+            continue
+        address, _, options = token.partition("/")
+        limit = options.split(",")[0]
+        ssh = address.startswith("@") or "@" in address
+        host = address.rsplit("@", 1)[-1]
+        if host in LOCAL_HOSTS:
+            continue
+        port = 22 if ssh else DISTCC_PORT
+        if not ssh and host.count(":") == 1:
+            host, port = host.split(":")
+        helpers.append({
+            "spec": token,
+            "host": host,
+            "port": int(port),
+            "limit": int(limit) if limit.isdigit() else DISTCC_DEFAULT_LIMIT,
+        })
+    return helpers
+
+
+def distcc_host_spec():
+    if os.environ.get("HONOURS_DISTCC_HOSTS"):
+        return os.environ["HONOURS_DISTCC_HOSTS"]
+    if os.environ.get("DISTCC_HOSTS"):
+        return os.environ["DISTCC_HOSTS"]
+    for path in (Path.home() / ".distcc" / "hosts", Path("/etc/distcc/hosts")):
+        if path.exists():
+            lines = [line.split("#")[0] for line in path.read_text().splitlines()]
+            return " ".join(lines)
+    return ""
+
+
+def probe(host, port, timeout=PROBE_TIMEOUT):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def healthy(helpers):
+    """The helpers that accept a TCP connection, probed concurrently."""
+    if not helpers:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(helpers), 32)) as pool:
+        alive = list(pool.map(lambda h: probe(h["host"], h["port"]), helpers))
+    return [h for h, ok in zip(helpers, alive) if ok]
+
+
+def icecc_scheduler():
+    value = os.environ.get("HONOURS_ICECC_SCHEDULER") or os.environ.get("ICECC_SCHEDULER")
+    if not value:
+        return None
+    host, _, port = value.partition(":")
+    return {"spec": value, "host": host, "port": int(port or ICECC_SCHEDULER_PORT), "limit": None}
+
+
+def resolve_mode(mode=None):
+    """Backend to use ("distcc", "icecream") or None, from `mode` or HONOURS_DISTRIBUTED."""
+    mode = mode or os.environ.get(MODE_ENV_VAR) or "off"
+    if mode == "off":
+        return None
+    if mode == "auto":
+        for backend in ("distcc", "icecream"):
+            if shutil.which(TOOLS[backend]):
+                return backend
+        return None
+    if not shutil.which(TOOLS[mode]):
+        print(f"⚠️ {TOOLS[mode]} is not installed; compiling locally")
+        return None
+    return mode
+
+
+class Pool:
+    """Helpers of one backend as seen right before a build."""
+
+    def __init__(self, backend, local_jobs):
+        self.backend = backend
+        self.local_jobs = local_jobs
+        if backend == "distcc":
+            self.helpers = healthy(parse_distcc_hosts(distcc_host_spec()))
+        else:
+            scheduler = icecc_scheduler()
+            self.helpers = healthy([scheduler]) if scheduler else []
+
+    def available(self):
+        return bool(self.helpers)
+
+    def parallelism(self):
+        if self.backend == "distcc":
+            return self.local_jobs + sum(h["limit"] for h in self.helpers)
+        # The scheduler knows the farm's size; keep enough jobs queued for it to hand out
+        return self.local_jobs * 4
+
+    def describe(self):
+        if not self.helpers:
+            return f"{self.backend}: no helpers reachable"
+        return f"{self.backend}: {len(self.helpers)} helper(s) up ({', '.join(h['spec'] for h in self.helpers)})"
+
+    def cmake_args(self):
+        """Compiler launcher arguments. Kept even without helpers so the configuration is stable."""
+        launcher = f"{LAUNCHER};{TOOLS[self.backend]}"
+        return [f"-DCMAKE_C_COMPILER_LAUNCHER={launcher}", f"-DCMAKE_CXX_COMPILER_LAUNCHER={launcher}"]
+
+    @contextmanager
+    def build_env(self, env):
+        """Environment for one build, plus a stats dict filled in once the block exits."""
+        stats = {"distributed": self.backend, "helpers": len(self.helpers)}
+        with tempfile.TemporaryDirectory(prefix="remote_compile.") as tmp:
+            count_file = Path(tmp) / "compiles"
+            log_file = Path(tmp) / f"{self.backend}.log"
+            env = dict(env, HONOURS_COMPILE_COUNT=str(count_file))
+            if self.backend == "distcc":
+                local = f"localhost/{self.local_jobs}"
+                env["DISTCC_HOSTS"] = " ".join([h["spec"] for h in self.helpers] + [local])
+                env.update(DISTCC_FALLBACK="1", DISTCC_LOG=str(log_file), DISTCC_VERBOSE="1")
+            else:
+                if self.helpers:
+                    env["ICECC_SCHEDULER"] = self.helpers[0]["spec"]
+                env.update(ICECC_DEBUG="info", ICECC_LOGFILE=str(log_file))
+            yield env, stats
+
+            total = count_file.stat().st_size if count_file.exists() else 0
+            remote = count_remote(self.backend, log_file)
+            stats["compile_jobs_remote"] = remote
+            stats["compile_jobs_local"] = max(total - remote, 0)
+
+
+def count_remote(backend, log_file):
+    if not Path(log_file).exists():
+        return 0
+    pattern = REMOTE_PATTERNS[backend]
+    remote = 0
+    with open(log_file, errors="replace") as f:
+        for line in f:
+            m = pattern.search(line)
+            if m and m.group("host") not in LOCAL_HOSTS:
+                remote += 1
+    return remote
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Check which distributed compilation helpers are reachable")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="Probe the configured helpers")
+    check.add_argument("--backend", choices=MODES[1:], default="auto")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    backend = resolve_mode(args.backend)
+    if backend is None:
+        print("Neither distcc nor icecc is installed")
+        raise SystemExit(1)
+    pool = Pool(backend, os.cpu_count())
+    print(pool.describe())
+    if pool.available():
+        print(f"Builds would run with --parallel {pool.parallelism()}")
+    raise SystemExit(0 if pool.available() else 1)
+
+
+if __name__ == "__main__":
+    main()
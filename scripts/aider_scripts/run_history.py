@@ -0,0 +1,180 @@
+"""
+What earlier benchmark runs tell us: per-stage timings, model tokens and spend, cache hits and disk use.
+
+Runs are read from outputs/ and final_results/. Current runs have a log_index.jsonl (see
+segment_log.py) and token/cache columns in their attempts CSV; older runs only have one plain
+text <run>.log, from which stage timings are recovered from the "[time] Running command: ..."
+headers and token counts from aider's "Tokens: ..." lines.
+
+Used by scheduler.py (stage timings) and planner.py (everything).
+"""
+
+import csv
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+
+from segment_log import read_index
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+HISTORY_DIRS = [HONOURS_DIR / "outputs", HONOURS_DIR / "final_results"]
+
+USAGE_COLUMNS = ["tokens_sent", "tokens_received", "cost_usd"]
+
+# aider prints one of these after every model response, e.g.
+# "Tokens: 24k sent, 3.1k cache write, 988 received. Cost: $0.06 message, $0.06 session."
+TOKENS_LINE = re.compile(
+    r"Tokens: (?P<sent>[\d.]+[kM]?) sent,.*?(?P<received>[\d.]+[kM]?) received\."
+    r"(?: Cost: (?:\$(?P<cost>[\d.]+) message)?)?"
+)
+# ...wrapped at the terminal width, the cost may end up on the next line
+COST_CONTINUATION = re.compile(r"^(?:STDOUT: )?\s*\$(?P<cost>[\d.]+) message")
+
+LEGACY_HEADER = re.compile(r"^\[(?P<time>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\] Running command: (?P<cmd>.*)")
+LEGACY_STAGES = {
+    "clean_repo.sh": "setup",
+    "checkout.sh": "setup",
+    "apply_test_patch.sh": "setup",
+    "generate_fix.sh": "generate",
+    "build.sh": "build",
+    "run_tests.sh": "test",
+}
+
+
+def parse_count(value):
+    scale = {"k": 1e3, "M": 1e6}.get(value[-1], 1)
+    return int(float(value.rstrip("kM")) * scale)
+
+
+class TokenUsage:
+    """Sums aider's token and cost lines from one generate stage's output."""
+
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.cost = None
+        self._cost_pending = False
+
+    def feed(self, line, stream="stdout"):
+        if self._cost_pending:
+            self._cost_pending = False
+            m = COST_CONTINUATION.match(line)
+            if m:
+                self._add_cost(m.group("cost"))
+                return
+        m = TOKENS_LINE.search(line)
+        if not m:
+            return
+        self.sent += parse_count(m.group("sent"))
+        self.received += parse_count(m.group("received"))
+        if m.group("cost"):
+            self._add_cost(m.group("cost"))
+        else:
+            self._cost_pending = True
+
+    def _add_cost(self, cost):
+        self.cost = (self.cost or 0) + float(cost)
+
+    def columns(self):
+        if not self.sent and not self.received:
+            return {column: "" for column in USAGE_COLUMNS}
+        return {
+            "tokens_sent": self.sent,
+            "tokens_received": self.received,
+            "cost_usd": round(self.cost, 4) if self.cost is not None else "",
+        }
+
+
+def run_dirs(history_dirs=HISTORY_DIRS):
+    for history_dir in history_dirs:
+        if Path(history_dir).is_dir():
+            yield from sorted(p for p in Path(history_dir).iterdir() if p.is_dir())
+
+
+def read_meta(run_dir):
+    metas = list(Path(run_dir).glob("*_meta.json"))
+    if not metas:
+        return {}
+    with open(metas[0]) as f:
+        return json.load(f)
+
+
+def read_attempts(run_dir):
+    rows = []
+    for path in Path(run_dir).glob("*_attempts.csv"):
+        with open(path, newline="") as f:
+            rows.extend(csv.DictReader(f))
+    return rows
+
+
+def legacy_log(run_dir):
+    logs = [p for p in Path(run_dir).glob("*.log") if p.stem == Path(run_dir).name]
+    return logs[0] if logs else None
+
+
+def legacy_attempts(log_path):
+    """
+    Stage timings and token usage from an old-style run log, as a list of
+    {"problem", "attempt", "stages": {stage: seconds}, "usage": TokenUsage}.
+    """
+    attempts = []
+    current = None
+    setup_started = None
+    counts = {}
+    last = None  # (stage, started) of the command running at this point of the log
+
+    def close(until):
+        if last and current is not None and last[0] != "setup":
+            current["stages"][last[0]] = current["stages"].get(last[0], 0) + (until - last[1]).total_seconds()
+
+    with open(log_path, errors="replace") as f:
+        for line in f:
+            m = LEGACY_HEADER.match(line)
+            if not m:
+                if current is not None and last and last[0] == "generate":
+                    current["usage"].feed(line)
+                continue
+
+            started = datetime.strptime(m.group("time"), "%Y-%m-%d %H:%M:%S")
+            close(started)
+            args = m.group("cmd").split()
+            script = Path(args[1]).name if len(args) > 1 else ""
+            stage = LEGACY_STAGES.get(script)
+            if stage == "setup" and (last is None or last[0] != "setup"):
+                setup_started = started
+            if stage == "generate" and len(args) > 4:
+                problem = args[4]
+                counts[problem] = counts.get(problem, 0) + 1
+                current = {"problem": problem, "attempt": counts[problem], "stages": {}, "usage": TokenUsage()}
+                if setup_started:
+                    current["stages"]["setup"] = (started - setup_started).total_seconds()
+                attempts.append(current)
+            last = (stage, started) if stage else None
+    return attempts
+
+
+def stage_entries(run_dir):
+    """(problem, stage, seconds) for every stage of every attempt of a run."""
+    index = read_index(run_dir)
+    if index:
+        return [(e["problem"], e["stage"], e["duration"]) for e in index]
+    log_path = legacy_log(run_dir)
+    if not log_path:
+        return []
+    return [
+        (attempt["problem"], stage, seconds)
+        for attempt in legacy_attempts(log_path)
+        for stage, seconds in attempt["stages"].items()
+    ]
+
+
+def attempt_usage(run_dir):
+    """Token usage dicts (USAGE_COLUMNS) for every attempt of a run that has them."""
+    rows = [row for row in read_attempts(run_dir) if row.get("tokens_sent")]
+    if rows:
+        return [{column: row[column] for column in USAGE_COLUMNS} for row in rows]
+    log_path = legacy_log(run_dir)
+    if not log_path:
+        return []
+    return [a["usage"].columns() for a in legacy_attempts(log_path) if a["usage"].sent]
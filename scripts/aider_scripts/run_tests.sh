@@ -1,33 +1,16 @@
 #!/bin/bash
-set -e
 
 # Usage: ./run_tests <honours_dir> <test_file_1> <test_file_2> ...
+# How the tests are run depends on the repository (HONOURS_REPO, default duckdb), see adapters.py.
+# HONOURS_TEST_PATCH, if set, is the problem's test.patch (used to select dragonfly's changed gtest cases)
 
 HONOURS_DIR="$1"
 shift
 TEST_FILES=("$@")
 
-DUCKDB_DIR="$HONOURS_DIR/repos/duckdb"
-UNITTEST_BINARY="$DUCKDB_DIR/build/release/test/unittest"
-
-ALL_PASSED=true
+REPO_NAME="${HONOURS_REPO:-duckdb}"
+DUCKDB_DIR="${REPO_DIR:-$HONOURS_DIR/repos/$REPO_NAME}"
 
 cd "$DUCKDB_DIR" || exit 1
 
-for test_file in "${TEST_FILES[@]}"; do
-  echo "Running test: $test_file"
-  "$UNITTEST_BINARY" "$test_file"
-
-  if [ $? -ne 0 ]; then
-    echo "Test failed: $test_file"
-    ALL_PASSED=false
-  else
-    echo "Test passed: $test_file"
-  fi
-done
-
-if [ "$ALL_PASSED" = true ]; then
-  exit 0
-else
-  exit 1
-fi
\ No newline at end of file
+python3 "$HONOURS_DIR/scripts/aider_scripts/adapters.py" --repo "$REPO_NAME" test "$DUCKDB_DIR" "${TEST_FILES[@]}"
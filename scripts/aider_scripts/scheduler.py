@@ -0,0 +1,130 @@
+"""
+Usage: python scheduler.py [--dir <benchmark_dir>] [--repo <name>] [--workers N]
+
+Longest-first ordering of a run's attempts, so a parallel run doesn't end with one worker busy on
+a Very Hard problem while the others sit idle.
+
+Each attempt's duration is predicted from earlier runs: the median build and test stage durations
+of that problem in earlier runs on the same repository (see run_history.py; runs whose _meta.json
+names no repo were duckdb runs), since problem ids repeat across repositories. Problems without history
+are estimated from the size of their fix.patch (changed lines, plus a weight per touched file),
+scaled so that a median-sized diff takes the median duration seen in history.
+
+Attempts are then dispatched longest first (LPT scheduling), which keeps the makespan within 4/3
+of the optimum. Running this file prints the predicted order and makespan for a benchmark.
+"""
+
+import argparse
+import heapq
+import statistics
+from collections import defaultdict
+from pathlib import Path
+
+import adapters
+import run_history
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+PREDICTED_STAGES = ["build", "test"]
+
+# Each file touched by the fix is roughly another translation unit (and its dependents) to rebuild
+FILE_WEIGHT = 20
+
+
+def stage_history(history_dirs=None):
+    """{(repo, problem): {stage: [durations]}} from earlier runs."""
+    history = defaultdict(lambda: defaultdict(list))
+    for run_dir in run_history.run_dirs(history_dirs or run_history.HISTORY_DIRS):
+        repo = run_history.read_meta(run_dir).get("repo", adapters.DEFAULT_REPO)
+        for problem, stage, seconds in run_history.stage_entries(run_dir):
+            history[(repo, problem)][stage].append(seconds)
+    return history
+
+
+def diff_size(problem_dir):
+    """Changed lines in fix.patch plus FILE_WEIGHT per file it touches."""
+    patch = Path(problem_dir) / "fix.patch"
+    if not patch.exists():
+        return 0
+    lines = files = 0
+    in_hunk = False
+    for line in patch.read_text(errors="replace").splitlines():
+        if line.startswith("diff --git"):
+            files += 1
+            in_hunk = False
+        elif line.startswith("@@"):
+            in_hunk = True
+        elif in_hunk and line.startswith(("+", "-")):
+            lines += 1
+    return lines + FILE_WEIGHT * files
+
+
+def predict(problem_dirs, history=None, repo=adapters.DEFAULT_REPO):
+    """Predicted seconds per attempt for each problem dir (by name) of `repo`, and whether it came from history."""
+    history = stage_history() if history is None else history
+    predicted, from_history, sizes = {}, {}, {}
+    for problem in problem_dirs:
+        name = Path(problem).name
+        sizes[name] = diff_size(problem)
+        stages = history.get((repo, name))
+        if stages:
+            predicted[name] = sum(statistics.median(stages[s]) for s in PREDICTED_STAGES if stages.get(s))
+            from_history[name] = True
+
+    # Anchor sizes to seconds at the medians (a single small problem with history would otherwise
+    # set the rate for all of them); without any history the sizes still give the right order
+    nonzero = [size for size in sizes.values() if size]
+    rate = 1.0
+    if predicted and nonzero:
+        rate = statistics.median(predicted.values()) / statistics.median(nonzero)
+    for name, size in sizes.items():
+        if name not in predicted:
+            predicted[name] = rate * size
+            from_history[name] = False
+    return predicted, from_history
+
+
+def longest_first(tasks, predicted):
+    """Sort (problem_dir, ...) tasks by predicted duration, longest first. Stable for ties."""
+    return sorted(tasks, key=lambda task: -predicted.get(Path(task[0]).name, 0))
+
+
+def makespan(durations, workers):
+    """Wall-clock of running `durations` in the given order on `workers` identical workers."""
+    finish = [0.0] * max(workers, 1)
+    for duration in durations:
+        heapq.heapreplace(finish, finish[0] + duration)
+    return max(finish)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Show the predicted longest-first order of a benchmark")
+    parser.add_argument("--dir", type=str, default=HONOURS_DIR / "benchmarks" / "duckdb_benchmark", help="Path to benchmark directory")
+    parser.add_argument("--repo", type=str, choices=list(adapters.ADAPTERS), default=adapters.DEFAULT_REPO)
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent attempts to predict the makespan for")
+    parser.add_argument("--k", type=int, default=1, help="Attempts per problem")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    problems = sorted((p for p in Path(args.dir).iterdir() if p.is_dir()), key=lambda p: int(p.name))
+    predicted, from_history = predict(problems, repo=args.repo)
+    tasks = longest_first([(p, i + 1) for p in problems for i in range(args.k)], predicted)
+
+    if not any(from_history.values()):
+        print("No stage history in outputs/ yet; ordering by diff size only")
+        for problem in sorted(problems, key=lambda p: -predicted[p.name]):
+            print(f"{problem.name:>8} {predicted[problem.name]:>9.0f}")
+        return
+
+    for problem in sorted(problems, key=lambda p: -predicted[p.name]):
+        name = problem.name
+        print(f"{name:>8} {predicted[name]:>9.0f}s  {'history' if from_history[name] else 'diff size'}")
+    durations = [predicted[p.name] for p, _ in tasks]
+    in_order = [predicted[p.name] for p in problems for _ in range(args.k)]
+    print(f"Predicted makespan on {args.workers} worker(s): {makespan(durations, args.workers) / 3600:.1f}h longest-first, "
+          f"{makespan(in_order, args.workers) / 3600:.1f}h in problem order")
+
+
+if __name__ == "__main__":
+    main()
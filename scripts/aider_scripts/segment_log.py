@@ -0,0 +1,276 @@
+"""
+Usage: python segment_log.py <run_dir> <problem> <attempt> <stage>
+       python segment_log.py <run_dir> --list [--problem <problem>]
+
+Compressed per-attempt log segments for benchmark runs.
+
+Every attempt writes its own segment file under <run_dir>/logs/<problem>/attempt_<n>.log.zst.
+Each stage of the attempt (setup, generate, build, test) is appended to that file as an
+independent compressed frame, and <run_dir>/log_index.jsonl maps each frame to its location:
+
+    {"problem": "10152", "attempt": 1, "stage": "build", "segment": "logs/10152/attempt_1.log.zst",
+     "offset": 5321, "length": 48112, "raw_bytes": 912345, "codec": "zstd",
+     "started": 1724830252.1, "duration": 512.4}
+
+so a single stage can be printed without decompressing (or grepping) anything else.
+
+Frames are zstd when the `zstandard` package is installed, gzip otherwise (the codec is
+recorded per entry so both can be read back).
+
+Examples:
+  python segment_log.py outputs/2025-08-28_09:10:52_openrouter_openai_gpt-5_k5 10152 1 build
+  python segment_log.py outputs/2025-08-28_09:10:52_openrouter_openai_gpt-5_k5 --list --problem 10152
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+INDEX_NAME = "log_index.jsonl"
+BUFFER_SIZE = 1 << 20  # compress in 1 MiB chunks
+SUFFIXES = {"zstd": ".log.zst", "gzip": ".log.gz"}
+
+
+def _compressor(codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    # wbits=31 produces a gzip member, so frames can also be read with zcat
+    return zlib.compressobj(6, zlib.DEFLATED, 31)
+
+
+def _decompress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return zlib.decompress(data, 31)
+
+
+def segment_path(problem, attempt, codec):
+    """Segment of one attempt, relative to the run dir."""
+    return Path("logs") / str(problem) / f"attempt_{int(attempt)}{SUFFIXES[codec]}"
+
+
+class StageLog:
+    """Buffered writer for one (problem, attempt, stage) frame. Thread safe."""
+
+    def __init__(self, owner, problem, attempt, stage):
+        self.owner = owner
+        self.problem = str(problem)
+        self.attempt = attempt
+        self.stage = stage
+        self.segment = segment_path(self.problem, attempt, owner.codec)
+        self.started = time.time()
+        self.raw_bytes = 0
+        self._pending = []
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+
+        # Frames of one segment follow each other; a second open stage would interleave with this one
+        owner._claim(self.segment, stage)
+        path = owner.run_dir / self.segment
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "ab")
+        self.offset = self._file.tell()
+        self._compressor = _compressor(owner.codec)
+        self.closed = False
+        for listener in owner.listeners:
+            listener.stage_started(self.problem, attempt, stage)
+
+    def write(self, text):
+        data = text.encode("utf-8", errors="replace")
+        with self._lock:
+            self._pending.append(data)
+            self._pending_bytes += len(data)
+            self.raw_bytes += len(data)
+            if self._pending_bytes >= BUFFER_SIZE:
+                self._drain()
+
+    def flush(self):
+        # Frames are only complete once closed; flushing mid-stage would just shrink chunks
+        pass
+
+    def _drain(self):
+        if self._pending:
+            self._file.write(self._compressor.compress(b"".join(self._pending)))
+            self._pending = []
+            self._pending_bytes = 0
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            self._drain()
+            self._file.write(self._compressor.flush())
+            length = self._file.tell() - self.offset
+            self._file.close()
+            self.closed = True
+        self.owner._release(self.segment)
+
+        entry = {
+            "problem": self.problem,
+            "attempt": self.attempt,
+            "stage": self.stage,
+            "segment": str(self.segment),
+            "offset": self.offset,
+            "length": length,
+            "raw_bytes": self.raw_bytes,
+            "codec": self.owner.codec,
+            "started": round(self.started, 3),
+            "duration": round(time.time() - self.started, 3),
+        }
+        self.owner._append_index(entry)
+        for listener in self.owner.listeners:
+            listener.stage_finished(entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SegmentLog:
+    """
+    Log sink for a whole run directory, handing out one StageLog per stage.
+
+    Objects in `listeners` get stage_started(problem, attempt, stage) and stage_finished(entry,
+    imported=False) calls (see metrics.RunMetrics).
+    """
+
+    def __init__(self, run_dir, codec=None):
+        self.run_dir = Path(run_dir)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.run_dir / INDEX_NAME
+        self.codec = codec or ("zstd" if zstandard else "gzip")
+        self._index_lock = threading.Lock()
+        self._open = {}
+        self.listeners = []
+
+    def stage(self, problem, attempt, stage):
+        return StageLog(self, problem, attempt, stage)
+
+    def _claim(self, segment, stage):
+        with self._index_lock:
+            if segment in self._open:
+                raise RuntimeError(f"Can't open stage {stage} of {segment} while stage {self._open[segment]} is still open")
+            self._open[segment] = stage
+
+    def _release(self, segment):
+        with self._index_lock:
+            self._open.pop(segment, None)
+
+    def import_segment(self, problem, attempt, data, entries):
+        """
+        Add a whole attempt segment written in another run dir (e.g. by a work queue worker).
+        The segment goes where this run would have written it; only the entries' offsets, lengths
+        and timings are taken from the sender.
+        """
+        codecs = {entry.get("codec", "zstd") for entry in entries}
+        if len(codecs) != 1 or not codecs <= SUFFIXES.keys():
+            raise ValueError(f"Segment of {problem} attempt {attempt} has codecs {sorted(codecs)}")
+        segment = segment_path(problem, attempt, codecs.pop())
+        path = (self.run_dir / segment).resolve()
+        if not path.is_relative_to(self.run_dir.resolve()):
+            raise ValueError(f"Segment {segment} is outside {self.run_dir}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        for entry in entries:
+            entry = dict(entry, problem=str(problem), attempt=int(attempt), segment=str(segment))
+            self._append_index(entry)
+            for listener in self.listeners:
+                listener.stage_finished(entry, imported=True)
+
+    def _append_index(self, entry):
+        line = json.dumps(entry) + "\n"
+        with self._index_lock:
+            # O_APPEND keeps single-line writes atomic across processes sharing a run dir
+            fd = os.open(self.index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+
+
+def read_index(run_dir):
+    index_path = Path(run_dir) / INDEX_NAME
+    if not index_path.exists():
+        return []
+    with open(index_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_entry(run_dir, problem, attempt, stage):
+    """Return the most recent index entry for (problem, attempt, stage), or None."""
+    matches = [
+        e for e in read_index(run_dir)
+        if e["problem"] == str(problem) and int(e["attempt"]) == int(attempt) and e["stage"] == stage
+    ]
+    return matches[-1] if matches else None
+
+
+def attempt_segment(run_dir, problem, attempt):
+    """Return (segment path, raw bytes, index entries) of one attempt, or None if it logged nothing."""
+    entries = [
+        e for e in read_index(run_dir)
+        if e["problem"] == str(problem) and int(e["attempt"]) == int(attempt)
+    ]
+    if not entries:
+        return None
+    segment = entries[-1]["segment"]
+    return segment, (Path(run_dir) / segment).read_bytes(), [e for e in entries if e["segment"] == segment]
+
+
+def read_segment(run_dir, entry):
+    with open(Path(run_dir) / entry["segment"], "rb") as f:
+        f.seek(entry["offset"])
+        data = f.read(entry["length"])
+    return _decompress(data, entry.get("codec", "zstd")).decode("utf-8", errors="replace")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Print one log segment of a benchmark run")
+    parser.add_argument("run_dir", help="Run output directory containing log_index.jsonl")
+    parser.add_argument("problem", nargs="?", help="Problem id")
+    parser.add_argument("attempt", nargs="?", type=int, help="Attempt index (1-based)")
+    parser.add_argument("stage", nargs="?", help="Stage name (setup, generate, build, test)")
+    parser.add_argument("--list", action="store_true", help="List indexed segments instead of printing one")
+    parser.add_argument("--problem", dest="list_problem", help="Only list segments for this problem")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+
+    if args.list:
+        for e in read_index(args.run_dir):
+            if args.list_problem and e["problem"] != args.list_problem:
+                continue
+            print(f"{e['problem']:>8} {e['attempt']:>3} {e['stage']:<10} {e['raw_bytes']:>12} B {e['duration']:>9.1f}s  {e['segment']}")
+        return
+
+    if args.problem is None or args.attempt is None or args.stage is None:
+        print("problem, attempt and stage are required unless --list is given", file=sys.stderr)
+        sys.exit(2)
+
+    entry = find_entry(args.run_dir, args.problem, args.attempt, args.stage)
+    if entry is None:
+        print(f"No segment for problem {args.problem} attempt {args.attempt} stage {args.stage}", file=sys.stderr)
+        sys.exit(1)
+    if entry.get("codec") == "zstd" and zstandard is None:
+        print("This segment is zstd compressed; install the `zstandard` package to read it", file=sys.stderr)
+        sys.exit(1)
+
+    sys.stdout.write(read_segment(args.run_dir, entry))
+
+
+if __name__ == "__main__":
+    main()
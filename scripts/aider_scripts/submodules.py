@@ -0,0 +1,240 @@
+"""
+Usage: python submodules.py update <repo_dir> [--link] [--jobs 8]
+       python submodules.py status <repo_dir>
+
+Submodule checkouts backed by one shared object store, for repositories with many submodules
+(ClickHouse has over a hundred under contrib/, Dragonfly has helio).
+
+Every submodule's objects go into one bare repository, cache/submodules.git, and each submodule
+repository borrows them through objects/info/alternates. A submodule commit is therefore fetched
+once per host, whichever checkout or problem needs it. `update` compares each gitlink of the
+checked-out commit with the submodule's current HEAD and only touches the ones that differ, so
+moving repos/<repo> from one base_commit to the next rewrites only the submodules that changed
+between them. Unchanged submodule worktrees are kept as they are.
+
+With --link (for workspace lower layers, which start from a fresh clone every time), each
+submodule is hard-linked from a checkout of the same commit in cache/submodule_trees/ instead.
+That checkout is made once per (submodule, commit) and shared by every lower layer that needs it;
+it is registered with the cache manager and pinned while being linked. Hard links are safe here
+because lower layers are never written to and git replaces files rather than editing them.
+
+Only top-level submodules are handled (not recursive), matching `git submodule update --init`.
+checkout.sh, workspace.py and verify_PRs.py run `update` after every checkout of a repository
+with a .gitmodules file.
+"""
+
+import argparse
+import fcntl
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from urllib.parse import urljoin
+
+from cache_manager import CacheManager
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+STORE_DIR = HONOURS_DIR / "cache" / "submodules.git"
+TREES_DIR = HONOURS_DIR / "cache" / "submodule_trees"
+GITLINK_MODE = "160000"
+
+
+def git(cwd, *args, check=True):
+    result = subprocess.run(["git", "-C", str(cwd), *args], capture_output=True, text=True)
+    if check and result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed in {cwd}: {result.stderr.strip()}")
+    return result.stdout if check else result
+
+
+def gitlinks(repo):
+    """{path: commit} of the submodules in the index (the checked-out commit after a checkout)."""
+    links = {}
+    for line in git(repo, "ls-files", "--stage").splitlines():
+        mode, sha, _, path = line.split(None, 3)
+        if mode == GITLINK_MODE:
+            links[path] = sha
+    return links
+
+
+def submodule_urls(repo):
+    """{path: (name, url)} from .gitmodules, with relative URLs resolved against origin."""
+    result = git(repo, "config", "-f", ".gitmodules", "--get-regexp", r"^submodule\..*\.(path|url)$", check=False)
+    entries = {}
+    for line in result.stdout.splitlines():
+        key, value = line.split(None, 1)
+        name, field = key[len("submodule."):].rsplit(".", 1)
+        entries.setdefault(name, {})[field] = value
+    origin = git(repo, "config", "--get", "remote.origin.url", check=False).stdout.strip()
+    urls = {}
+    for name, entry in entries.items():
+        if "path" not in entry or "url" not in entry:
+            continue
+        url = entry["url"]
+        if url.startswith(("./", "../")) and origin:
+            url = urljoin(origin.rstrip("/") + "/", url)
+        urls[entry["path"]] = (name, url)
+    return urls
+
+
+def head(worktree):
+    """Commit checked out in a submodule worktree, or None if it isn't a repository yet."""
+    if not (Path(worktree) / ".git").exists():
+        return None
+    result = git(worktree, "rev-parse", "-q", "--verify", "HEAD", check=False)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+class Store:
+    """The shared bare repository holding every submodule's objects."""
+
+    def __init__(self, path=STORE_DIR):
+        self.path = Path(path)
+        self.objects = self.path / "objects"
+
+    def create(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.parent / f"{self.path.name}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not self.objects.exists():
+                git(self.path.parent, "init", "--bare", "--quiet", self.path.name)
+
+    def has(self, sha):
+        return self.objects.exists() and git(self.path, "cat-file", "-e", f"{sha}^{{commit}}", check=False).returncode == 0
+
+    def fetch(self, url, shas):
+        """Make sure the store has `shas` of the repository at `url`. Returns how many were fetched."""
+        missing = [sha for sha in shas if not self.has(sha)]
+        if not missing:
+            return 0
+        self.create()
+        # Fetches of different submodules (and from other processes) go into the store side by side;
+        # git writes each as its own pack and only locks the refs it updates
+        fetch = ["fetch", "--quiet", "--no-tags", "--no-write-fetch-head", url]
+        # Most hosts serve any reachable commit by id; fall back to all branches and tags otherwise
+        if git(self.path, *fetch, *[f"{sha}:refs/pins/{sha}" for sha in missing], check=False).returncode != 0:
+            key = "".join(c if c.isalnum() else "_" for c in url)
+            git(self.path, *fetch, f"+refs/heads/*:refs/mirrors/{key}/heads/*", f"+refs/tags/*:refs/mirrors/{key}/tags/*")
+            for sha in missing:
+                if not self.has(sha):
+                    raise RuntimeError(f"{url} has no commit {sha}")
+                # Branches move on; the pin keeps the commit from being garbage collected
+                git(self.path, "update-ref", f"refs/pins/{sha}", sha)
+        return len(missing)
+
+    def checkout(self, worktree, url, sha):
+        """Check `sha` out in `worktree`, creating the submodule repository if needed."""
+        worktree = Path(worktree)
+        if head(worktree) is None:
+            worktree.mkdir(parents=True, exist_ok=True)
+            git(worktree, "init", "--quiet")
+            (worktree / ".git" / "objects" / "info" / "alternates").write_text(f"{self.objects.resolve()}\n")
+            git(worktree, "remote", "add", "origin", url)
+        git(worktree, "checkout", "--quiet", "--force", "--detach", sha)
+
+
+def tree_path(name, sha, root=TREES_DIR):
+    return Path(root) / name.replace("/", "_") / sha
+
+
+def link(store, cache, worktree, name, url, sha):
+    """Hard-link a shared checkout of `sha` (made on first use) into `worktree`."""
+    tree = tree_path(name, sha)
+    with ExitStack() as stack:
+        if cache:
+            stack.enter_context(cache.pin(tree))
+        if not (tree / ".git").exists():
+            staging = tree.with_name(f".{sha}.{os.getpid()}")
+            shutil.rmtree(staging, ignore_errors=True)
+            store.checkout(staging, url, sha)
+            try:
+                staging.rename(tree)
+            except OSError:
+                # Someone else finished the same checkout first
+                shutil.rmtree(staging, ignore_errors=True)
+            if cache:
+                cache.register(tree, "submodule")
+        if Path(worktree).exists():
+            shutil.rmtree(worktree)
+        subprocess.run(["cp", "-al", str(tree), str(worktree)], check=True)
+
+
+def plan(repo):
+    """[(path, name, url, wanted, current)] for every submodule of the checked-out commit."""
+    urls = submodule_urls(repo)
+    rows = []
+    for path, sha in sorted(gitlinks(repo).items()):
+        if path not in urls:
+            print(f"⚠️ Submodule {path} has no entry in .gitmodules, skipping")
+            continue
+        name, url = urls[path]
+        rows.append((path, name, url, sha, head(Path(repo) / path)))
+    return rows
+
+
+def update(repo, link_trees=False, jobs=8, store=None, cache=None):
+    """Bring the submodules of `repo` to its gitlinks, touching only the ones that changed."""
+    repo = Path(repo).resolve()
+    store = store or Store()
+    changed = [row for row in plan(repo) if row[3] != row[4]]
+    total = len(gitlinks(repo))
+    if not changed:
+        print(f"✅ Submodules: all {total} up to date")
+        return
+
+    by_url = {}
+    for _, _, url, sha, _ in changed:
+        by_url.setdefault(url, []).append(sha)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        fetched = sum(pool.map(lambda item: store.fetch(*item), by_url.items()))
+
+    def apply(row):
+        path, name, url, sha, _ = row
+        if link_trees:
+            link(store, cache, repo / path, name, url, sha)
+        else:
+            store.checkout(repo / path, url, sha)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        list(pool.map(apply, changed))
+    print(f"✅ Submodules: {len(changed)} of {total} updated, {fetched} commit(s) fetched into {store.path}")
+
+
+def status(repo):
+    rows = plan(Path(repo).resolve())
+    for path, _, _, sha, current in rows:
+        state = "up to date" if sha == current else ("missing" if current is None else f"at {current[:10]}")
+        print(f"{sha[:10]}  {path}  ({state})")
+    stale = sum(1 for row in rows if row[3] != row[4])
+    print(f"{len(rows) - stale} of {len(rows)} submodules up to date")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Submodule checkouts from a shared object store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    update_parser = sub.add_parser("update", help="Check out the submodules whose gitlink changed")
+    update_parser.add_argument("repo_dir", type=str)
+    update_parser.add_argument("--link", action="store_true",
+                               help="Hard-link shared per-commit checkouts from cache/submodule_trees (workspace lower layers)")
+    update_parser.add_argument("--jobs", type=int, default=8, help="Parallel fetches and checkouts")
+    status_parser = sub.add_parser("status", help="Compare submodule worktrees with the gitlinks")
+    status_parser.add_argument("repo_dir", type=str)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.command == "status":
+        status(args.repo_dir)
+        return
+    try:
+        update(args.repo_dir, link_trees=args.link, jobs=args.jobs, cache=CacheManager() if args.link else None)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
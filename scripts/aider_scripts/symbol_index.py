@@ -0,0 +1,384 @@
+"""
+Usage: python symbol_index.py build [--dir <benchmark_dir>]
+       python symbol_index.py map <problem_dir> [--tokens 2048]
+       python symbol_index.py find <symbol> --commit <commit>
+
+Per-commit symbol index of the benchmark repo, for focused context maps handed to aider.
+
+Every indexed source file (C/C++ under src/ and extension/ by default) is parsed once per blob
+into its definitions (classes, structs, enums, functions, macros with line and signature) and the
+identifiers it references. Results are stored in cache/symbol_index/<repo>.sqlite (one database
+per repository) keyed by blob id, so a file unchanged between two commits is never parsed twice.
+A commit's tree is recorded as path -> blob; the first commit is read with `git ls-tree`, later
+ones start from the indexed commit closest in commit time and apply `git diff-tree` to it, so only
+changed files are looked at. Indexed commits the repo doesn't have (any more) are skipped.
+
+Objects are read straight from the repo's object store (`git cat-file --batch`), so nothing is
+checked out and the working tree can be in any state.
+
+A context map for a problem lists the outline of its seed files (modified_files, or the files
+retrieved for it) and then the definitions elsewhere in the tree that the seed files and the
+issue text refer to, best first: names defined in few files and mentioned in the issue rank
+higher. It's cut at a token budget and cached under cache/context_maps/, so repeated attempts
+reuse it. aider_benchmark.py --context-map-tokens passes it to aider as a read-only file.
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import subprocess
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+import adapters
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_REPO = HONOURS_DIR / "repos" / "duckdb"
+DB_DIR = HONOURS_DIR / "cache" / "symbol_index"
+MAPS_DIR = HONOURS_DIR / "cache" / "context_maps"
+DEFAULT_BENCHMARK_DIR = HONOURS_DIR / "benchmarks" / "duckdb_benchmark"
+
+# Bump when parsing changes so blobs are parsed again
+PARSER_VERSION = 1
+
+SOURCE_SUFFIXES = (".c", ".cc", ".cpp", ".cxx", ".h", ".hh", ".hpp", ".ipp")
+INCLUDE_PREFIXES = ("src/", "extension/")
+CHARS_PER_TOKEN = 4
+
+KEYWORDS = set("""
+    alignas alignof auto bool break case catch char class const constexpr const_cast continue decltype
+    default delete double do dynamic_cast else enum explicit extern false float for friend goto if inline
+    int long mutable namespace new noexcept nullptr operator override private protected public return
+    short signed sizeof static static_assert static_cast struct switch template this throw true try
+    typedef typeid typename union unsigned using virtual void volatile while final define include ifdef
+    ifndef endif pragma once idx_t size_t string vector unique_ptr shared_ptr make_uniq std duckdb
+""".split())
+
+TYPE_DEF = re.compile(r"^\s*(?:template\s*<[^>]*>\s*)?(class|struct|enum class|enum|union)\s+(?:DUCKDB_API\s+)?(\w+)\s*(?:final\s*)?[:{]")
+# Declarations and definitions at namespace or class level (DuckDB doesn't indent namespaces):
+# a return type, then the name, then parameters (possibly continued on the next line)
+_PARAMS_AND_QUALIFIERS = (
+    r"\s*\((?:[^;{}]*\)\s*(?:const\s*)?(?:override\s*)?(?:final\s*)?(?:noexcept\s*)?(?:=\s*\w+\s*)?[{;:]?"
+    r"|[^;{})]*,)\s*$"
+)
+FUNCTION_DEF = re.compile(
+    r"^(?:\t| {4})?(?![:,])(?!(?:if|for|while|switch|return|else|case|do|delete|throw|using|typedef|template)\b)"
+    r"(?:[\w:<>,]+[\s*&]+)+((?:\w+::)*~?\w+)" + _PARAMS_AND_QUALIFIERS
+)
+CONSTRUCTOR_DEF = re.compile(r"^((?:\w+::)+~?\w+)" + _PARAMS_AND_QUALIFIERS)
+MAX_LINE = 240
+MACRO_DEF = re.compile(r"^\s*#\s*define\s+(\w+)")
+IDENTIFIER = re.compile(r"\b[A-Za-z_]\w{2,}\b")
+COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+STRING = re.compile(r'"(?:\\.|[^"\\\n])*"')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (blob TEXT PRIMARY KEY, version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS symbols (blob TEXT NOT NULL, name TEXT NOT NULL, kind TEXT NOT NULL,
+                                    line INTEGER NOT NULL, signature TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS symbols_blob ON symbols (blob);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+CREATE TABLE IF NOT EXISTS refs (blob TEXT NOT NULL, name TEXT NOT NULL, PRIMARY KEY (blob, name)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS commits (commit_id TEXT PRIMARY KEY, filter TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS trees (commit_id TEXT NOT NULL, path TEXT NOT NULL, blob TEXT NOT NULL,
+                                  PRIMARY KEY (commit_id, path)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trees_blob ON trees (blob);
+"""
+
+
+# Git helpers, shared with the retrieval index (bm25_index.py)
+
+def git(repo, *args):
+    return subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True, text=True).stdout
+
+
+def resolve(repo, commit):
+    return git(repo, "rev-parse", f"{commit}^{{commit}}").strip()
+
+
+def wanted(path, suffixes=SOURCE_SUFFIXES, prefixes=INCLUDE_PREFIXES):
+    return path.endswith(suffixes) and (not prefixes or path.startswith(prefixes))
+
+
+def list_tree(repo, commit, keep=wanted):
+    """{path: blob} of the files in `commit` that `keep` accepts."""
+    tree = {}
+    for line in git(repo, "ls-tree", "-r", "-z", "--full-tree", commit).split("\0"):
+        if not line:
+            continue
+        meta, path = line.split("\t", 1)
+        _, kind, blob = meta.split()
+        if kind == "blob" and keep(path):
+            tree[path] = blob
+    return tree
+
+
+def diff_tree(repo, old, new, keep=wanted):
+    """Changes from `old` to `new` as {path: blob, or None if deleted}."""
+    changes = {}
+    output = git(repo, "diff-tree", "-r", "-z", "--no-renames", "--no-commit-id", old, new)
+    fields = iter(output.split("\0"))
+    for meta in fields:
+        if not meta:
+            continue
+        path = next(fields)
+        # :old_mode new_mode old_blob new_blob status
+        _, _, _, blob, status = meta.split()
+        if keep(path):
+            changes[path] = None if status == "D" else blob
+    return changes
+
+
+def closest(repo, commit, candidates):
+    """The candidate commit closest to `commit` in commit time, or None. Candidates `repo` lacks are skipped."""
+    times = commit_times(repo, [commit, *candidates])
+    if commit not in times:
+        return None
+    present = [candidate for candidate in candidates if candidate in times and candidate != commit]
+    return min(present, key=lambda candidate: abs(times[candidate] - times[commit]), default=None)
+
+
+def commit_times(repo, commits):
+    """{commit: committer timestamp} of the commits that exist in `repo`, through one `git cat-file --batch`."""
+    times = {}
+    for commit, text in read_objects(repo, commits, "commit"):
+        for line in text.splitlines():
+            if not line:
+                break
+            if line.startswith("committer "):
+                times[commit] = int(line.split()[-2])
+    return times
+
+
+def read_blobs(repo, blobs):
+    """Yield (blob, text) for each blob id, through one `git cat-file --batch`."""
+    yield from read_objects(repo, blobs, "blob")
+
+
+def read_objects(repo, ids, kind):
+    """Yield (id, text) for each id naming an object of `kind`; missing objects are skipped."""
+    ids = list(ids)
+    if not ids:
+        return
+    proc = subprocess.Popen(["git", "-C", str(repo), "cat-file", "--batch"],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    # Feed from a thread so a large request can't deadlock on full pipes
+    def feed():
+        proc.stdin.write("".join(f"{i}\n" for i in ids).encode())
+        proc.stdin.close()
+    threading.Thread(target=feed, daemon=True).start()
+    for object_id in ids:
+        header = proc.stdout.readline().split()
+        if len(header) < 3:
+            continue  # "<id> missing"
+        data = proc.stdout.read(int(header[2]))
+        proc.stdout.read(1)  # trailing newline
+        if header[1] == kind.encode():
+            yield object_id, data.decode("utf-8", errors="replace")
+    proc.wait()
+
+
+def db_for(db_dir, repo):
+    """Database of one repository's index; commits and trees of different repos never mix."""
+    return Path(db_dir) / f"{Path(repo).resolve().name}.sqlite"
+
+
+# Parsing
+
+def parse_source(text):
+    """(definitions as (name, kind, line, signature), referenced identifiers) of a C/C++ file."""
+    definitions = []
+    for number, line in enumerate(text.splitlines(), 1):
+        m = MACRO_DEF.match(line)
+        if m:
+            definitions.append((m.group(1), "macro", number, line.strip()[:160]))
+            continue
+        m = TYPE_DEF.match(line)
+        if m:
+            definitions.append((m.group(2), m.group(1), number, line.strip().rstrip("{").strip()[:160]))
+            continue
+        m = len(line) <= MAX_LINE and (FUNCTION_DEF.match(line) or CONSTRUCTOR_DEF.match(line))
+        if m:
+            name = m.group(1).split("::")[-1]
+            if name not in KEYWORDS and not name.isupper():
+                definitions.append((name, "function", number, line.strip().rstrip("{").strip()[:160]))
+    code = STRING.sub('""', COMMENT.sub(" ", text))
+    references = {word for word in IDENTIFIER.findall(code) if word not in KEYWORDS}
+    return definitions, references
+
+
+class SymbolIndex:
+    def __init__(self, repo=DEFAULT_REPO, db_path=None):
+        self.repo = Path(repo)
+        db_path = db_path or db_for(DB_DIR, repo)
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+
+    def indexed_commits(self):
+        return [row[0] for row in self.db.execute("SELECT commit_id FROM commits")]
+
+    def tree(self, commit):
+        return dict(self.db.execute("SELECT path, blob FROM trees WHERE commit_id = ?", (commit,)))
+
+    def index_commit(self, commit):
+        """Index `commit` if it isn't yet. Returns its full commit id."""
+        commit = resolve(self.repo, commit)
+        with self._lock:
+            if self.db.execute("SELECT 1 FROM commits WHERE commit_id = ?", (commit,)).fetchone():
+                return commit
+            base = closest(self.repo, commit, self.indexed_commits())
+            if base:
+                tree = self.tree(base)
+                for path, blob in diff_tree(self.repo, base, commit).items():
+                    if blob is None:
+                        tree.pop(path, None)
+                    else:
+                        tree[path] = blob
+            else:
+                tree = list_tree(self.repo, commit)
+
+            parsed = {row[0] for row in self.db.execute("SELECT blob FROM blobs WHERE version = ?", (PARSER_VERSION,))}
+            missing = set(tree.values()) - parsed
+            print(f"Indexing {commit[:10]}: {len(tree)} files, {len(missing)} to parse"
+                  f"{f' (from {base[:10]})' if base else ''}")
+            with self.db:
+                for blob, text in read_blobs(self.repo, missing):
+                    definitions, references = parse_source(text)
+                    self.db.execute("DELETE FROM symbols WHERE blob = ?", (blob,))
+                    self.db.execute("DELETE FROM refs WHERE blob = ?", (blob,))
+                    self.db.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?)",
+                                        [(blob, *d) for d in definitions])
+                    self.db.executemany("INSERT INTO refs VALUES (?, ?)", [(blob, r) for r in references])
+                    self.db.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?)", (blob, PARSER_VERSION))
+                self.db.executemany("INSERT INTO trees VALUES (?, ?, ?)", [(commit, p, b) for p, b in tree.items()])
+                self.db.execute("INSERT INTO commits VALUES (?, ?)", (commit, json.dumps([SOURCE_SUFFIXES, INCLUDE_PREFIXES])))
+        return commit
+
+    def outline(self, commit, path):
+        return self.db.execute(
+            "SELECT s.name, s.kind, s.line, s.signature FROM trees t JOIN symbols s ON s.blob = t.blob "
+            "WHERE t.commit_id = ? AND t.path = ? ORDER BY s.line", (commit, path)).fetchall()
+
+    def references(self, commit, paths):
+        names = set()
+        for path in paths:
+            names.update(row[0] for row in self.db.execute(
+                "SELECT r.name FROM trees t JOIN refs r ON r.blob = t.blob WHERE t.commit_id = ? AND t.path = ?",
+                (commit, path)))
+        return names
+
+    def definitions(self, commit, names):
+        """[(path, name, kind, line, signature)] of the given names in `commit`."""
+        rows = []
+        names = list(names)
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            rows += self.db.execute(
+                f"SELECT t.path, s.name, s.kind, s.line, s.signature FROM symbols s "
+                f"JOIN trees t ON t.blob = s.blob AND t.commit_id = ? "
+                f"WHERE s.name IN ({','.join('?' * len(chunk))})", (commit, *chunk)).fetchall()
+        return rows
+
+    def context_map(self, commit, seed_files, text="", tokens=2048):
+        """Path of a context map for seed files and issue text within `tokens`, built once and cached."""
+        with self._lock:
+            return self._context_map(self.index_commit(commit), seed_files, text, tokens)
+
+    def _context_map(self, commit, seed_files, text, tokens):
+        key = hashlib.sha1(json.dumps([PARSER_VERSION, commit, sorted(seed_files), text, tokens]).encode()).hexdigest()
+        path = MAPS_DIR / f"{key[:16]}.md"
+        if path.exists():
+            return path
+
+        budget = tokens * CHARS_PER_TOKEN
+        mentioned = {w for w in IDENTIFIER.findall(text) if w not in KEYWORDS}
+        names = self.references(commit, seed_files) | mentioned
+        by_file = defaultdict(list)
+        defined_in = defaultdict(set)
+        for row in self.definitions(commit, names):
+            if row[0] not in seed_files:
+                by_file[row[0]].append(row[1:])
+                defined_in[row[1]].add(row[0])
+
+        def score(name):
+            # Names defined in many files (Copy, Equals, ...) say little about where to look
+            return (3 if name in mentioned else 1) / len(defined_in[name])
+
+        ranked = sorted(by_file, key=lambda f: -sum(score(name) for name in {d[0] for d in by_file[f]}))
+        sections = [("Files to edit", [(f, self.outline(commit, f)) for f in seed_files])]
+        sections.append(("Related definitions", [(f, sorted(by_file[f], key=lambda d: d[2])) for f in ranked]))
+
+        lines, used = [], 0
+        for title, files in sections:
+            lines.append(f"# {title}\n")
+            for file, symbols in files:
+                block = [f"{file}:"] + [f"  {line:>5}: {signature}" for _, _, line, signature in symbols] + [""]
+                size = sum(len(b) + 1 for b in block)
+                if used + size > budget:
+                    if title != "Files to edit":
+                        break
+                    block = block[:1] + ["  (outline cut at the token budget)", ""]
+                    size = sum(len(b) + 1 for b in block)
+                lines += block
+                used += size
+
+        MAPS_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text("\n".join(lines))
+        tmp.replace(path)
+        return path
+
+
+def problem_context_map(index, problem_dir, problem_data, tokens, seed_files=None):
+    """Context map for one benchmark problem, seeded with its modified_files unless given."""
+    seeds = seed_files if seed_files is not None else adapters.file_list(problem_data.get("modified_files", []))
+    return index.context_map(problem_data["base_commit"], seeds, problem_data.get("problem_statement", ""), tokens)
+
+
+def load_problem(problem_dir):
+    problem_dir = Path(problem_dir)
+    with open(problem_dir / f"{problem_dir.name}.json") as f:
+        return json.load(f)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Per-commit symbol index and context maps")
+    parser.add_argument("--repo", type=str, default=DEFAULT_REPO, help="Git repository to index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index the base commit of every problem")
+    build.add_argument("--dir", type=str, default=DEFAULT_BENCHMARK_DIR, help="Path to benchmark directory")
+    context = sub.add_parser("map", help="Print the context map of a problem")
+    context.add_argument("problem_dir", type=str)
+    context.add_argument("--tokens", type=int, default=2048, help="Token budget of the map")
+    find = sub.add_parser("find", help="Where a symbol is defined at a commit")
+    find.add_argument("symbol", type=str)
+    find.add_argument("--commit", type=str, required=True)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    index = SymbolIndex(args.repo)
+    if args.command == "build":
+        problems = sorted(p for p in Path(args.dir).iterdir() if (p / f"{p.name}.json").exists())
+        # Oldest first, so each commit starts from a close, already indexed one
+        commits = sorted({load_problem(p)["base_commit"] for p in problems},
+                         key=lambda c: int(git(args.repo, "show", "-s", "--format=%ct", c)))
+        for commit in commits:
+            index.index_commit(commit)
+    elif args.command == "map":
+        path = problem_context_map(index, args.problem_dir, load_problem(args.problem_dir), args.tokens)
+        print(path.read_text())
+    else:
+        commit = index.index_commit(args.commit)
+        for path, name, kind, line, signature in index.definitions(commit, [args.symbol]):
+            print(f"{path}:{line}: {kind} {signature}")
+
+
+if __name__ == "__main__":
+    main()
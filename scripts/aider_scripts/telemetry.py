@@ -0,0 +1,234 @@
+"""
+Usage: python telemetry.py record <csv> [--interval 5]
+       python telemetry.py summary <run_dir | csv>
+
+Host resource telemetry for benchmark runs, to tell whether a host is CPU, memory or disk bound.
+
+A Sampler reads /proc (and the harness cgroup, see cgroups.py) every --telemetry-interval seconds
+and appends one row to <run_dir>/telemetry.csv:
+
+  time              unix time of the sample
+  cpu_pct           busy share of all CPUs since the previous sample
+  iowait_pct        share of CPU time spent waiting on I/O
+  load1             1 minute load average
+  mem_used          MemTotal - MemAvailable (bytes)
+  page_cache        Cached (bytes)
+  disk_read_bps     bytes read / written per second, summed over whole disks
+  disk_write_bps
+  cgroup_cpu        CPUs used by all stages' cgroups (empty without cgroups)
+  cgroup_mem        memory.current of the cgroup root
+  stages            stages running at the time, as problem/attempt/stage separated by spaces
+
+As a SegmentLog listener it also takes a sample whenever a stage starts or finishes, so rows line up
+with stage boundaries in log_index.jsonl. `summary` averages the samples per stage type.
+
+`record` runs the sampler on its own, e.g. on work queue workers, until interrupted.
+"""
+
+import argparse
+import csv
+import statistics
+import threading
+import time
+from pathlib import Path
+
+from cgroups import CGROUP_ROOT
+
+FILE_NAME = "telemetry.csv"
+COLUMNS = ["time", "cpu_pct", "iowait_pct", "load1", "mem_used", "page_cache",
+           "disk_read_bps", "disk_write_bps", "cgroup_cpu", "cgroup_mem", "stages"]
+SECTOR_BYTES = 512  # /proc/diskstats always counts 512 byte sectors
+MIN_DELTA = 0.05  # seconds between samples below which rates are too noisy
+
+
+def read_cpu():
+    """(busy, iowait, total) jiffies summed over all CPUs."""
+    with open("/proc/stat") as f:
+        fields = [int(v) for v in f.readline().split()[1:]]
+    # user nice system idle iowait irq softirq steal (guest time is already in user)
+    idle, iowait = fields[3], fields[4]
+    total = sum(fields[:8])
+    return total - idle - iowait, iowait, total
+
+
+def read_meminfo():
+    values = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            key, value = line.split(":", 1)
+            values[key] = int(value.split()[0]) * 1024
+    return values
+
+
+def whole_disks():
+    # Partitions, loop and ram devices would count the same I/O twice or not at all, and so would
+    # devices stacked on other disks (dm-* for LVM/LUKS, md* for RAID): only the disks below count
+    return {p.name for p in Path("/sys/block").iterdir()
+            if not p.name.startswith(("loop", "ram", "zram")) and not any((p / "slaves").glob("*"))}
+
+
+def read_disks(disks):
+    """(bytes read, bytes written) since boot over `disks`."""
+    read = written = 0
+    with open("/proc/diskstats") as f:
+        for line in f:
+            fields = line.split()
+            if fields[2] in disks:
+                read += int(fields[5]) * SECTOR_BYTES
+                written += int(fields[9]) * SECTOR_BYTES
+    return read, written
+
+
+def read_cgroup(root=CGROUP_ROOT):
+    """(cpu usage in us, memory.current) of the cgroup root, or None without cgroups."""
+    try:
+        usage = next(int(line.split()[1]) for line in (root / "cpu.stat").read_text().splitlines()
+                     if line.startswith("usage_usec"))
+        return usage, int((root / "memory.current").read_text())
+    except (OSError, StopIteration, ValueError):
+        return None
+
+
+class Sampler:
+    """Background sampler writing COLUMNS rows to a CSV. Also a SegmentLog listener."""
+
+    def __init__(self, path, interval=5):
+        self.path = Path(path)
+        self.interval = interval
+        self.disks = whole_disks()
+        self.active = set()
+        self._previous = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._file = None
+        self._writer = None
+
+    def start(self):
+        new = not self.path.exists()
+        self._file = open(self.path, "a", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=COLUMNS)
+        if new:
+            self._writer.writeheader()
+        self._previous = self._read()
+        threading.Thread(target=self._loop, daemon=True).start()
+        return self
+
+    def _read(self):
+        return time.time(), read_cpu(), read_disks(self.disks), read_cgroup()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        with self._lock:
+            if self._writer is None:
+                return
+            now, cpu, disks, cgroup = current = self._read()
+            then, cpu_before, disks_before, cgroup_before = self._previous
+            elapsed = now - then
+            if elapsed < MIN_DELTA:
+                return
+            jiffies = (cpu[2] - cpu_before[2]) or 1
+            memory = read_meminfo()
+            with open("/proc/loadavg") as f:
+                load1 = float(f.read().split()[0])
+            row = {
+                "time": round(now, 2),
+                "cpu_pct": round(100 * (cpu[0] - cpu_before[0]) / jiffies, 1),
+                "iowait_pct": round(100 * (cpu[1] - cpu_before[1]) / jiffies, 1),
+                "load1": load1,
+                "mem_used": memory["MemTotal"] - memory.get("MemAvailable", memory["MemFree"]),
+                "page_cache": memory.get("Cached", 0),
+                "disk_read_bps": int((disks[0] - disks_before[0]) / elapsed),
+                "disk_write_bps": int((disks[1] - disks_before[1]) / elapsed),
+                "cgroup_cpu": "",
+                "cgroup_mem": "",
+                "stages": " ".join(sorted(self.active)),
+            }
+            if cgroup and cgroup_before:
+                row["cgroup_cpu"] = round((cgroup[0] - cgroup_before[0]) / 1e6 / elapsed, 2)
+                row["cgroup_mem"] = cgroup[1]
+            self._writer.writerow(row)
+            self._file.flush()
+            self._previous = current
+
+    # SegmentLog listener: sample at every boundary so the series lines up with the log index.
+    # The closing sample still lists the stage, the opening one already does.
+    def stage_started(self, problem, attempt, stage):
+        with self._lock:
+            self.active.add(f"{problem}/{attempt}/{stage}")
+        self.sample()
+
+    def stage_finished(self, entry, imported=False):
+        if imported:
+            return
+        self.sample()
+        with self._lock:
+            self.active.discard(f"{entry['problem']}/{entry['attempt']}/{entry['stage']}")
+
+    def stop(self):
+        self._stop.set()
+        self.sample()
+        with self._lock:
+            self._file.close()
+            self._writer = None
+
+
+def summarize(path):
+    """Print the mean of each column per stage type (setup, generate, build, test) and overall."""
+    groups = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            kinds = {s.rsplit("/", 1)[-1] for s in row["stages"].split()} or {"idle"}
+            for kind in kinds | {"all"}:
+                groups.setdefault(kind, []).append(row)
+    if not groups:
+        print(f"No samples in {path}")
+        return
+
+    print(f"{'':>9} {'samples':>8} {'cpu%':>6} {'iowait%':>8} {'load1':>6} {'mem GiB':>8} {'cache GiB':>9} "
+          f"{'read MB/s':>9} {'write MB/s':>10}")
+    for kind in ["setup", "generate", "build", "test", "idle", "all"]:
+        rows = groups.get(kind)
+        if not rows:
+            continue
+
+        def mean(column, scale=1):
+            return statistics.mean(float(r[column]) for r in rows) / scale
+
+        print(f"{kind:>9} {len(rows):>8} {mean('cpu_pct'):>6.1f} {mean('iowait_pct'):>8.1f} {mean('load1'):>6.1f} "
+              f"{mean('mem_used', 2**30):>8.1f} {mean('page_cache', 2**30):>9.1f} "
+              f"{mean('disk_read_bps', 1e6):>9.1f} {mean('disk_write_bps', 1e6):>10.1f}")
+    peak = max(float(r["mem_used"]) for r in groups["all"]) / 2**30
+    print(f"Peak memory used: {peak:.1f} GiB")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Sample host CPU, memory and disk usage")
+    sub = parser.add_subparsers(dest="command", required=True)
+    record = sub.add_parser("record", help="Sample until interrupted")
+    record.add_argument("csv", type=str, help="CSV file to append samples to")
+    record.add_argument("--interval", type=float, default=5, help="Seconds between samples")
+    summary = sub.add_parser("summary", help="Average the samples per stage")
+    summary.add_argument("path", type=str, help="Run directory or telemetry CSV")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.command == "summary":
+        path = Path(args.path)
+        summarize(path / FILE_NAME if path.is_dir() else path)
+        return
+    sampler = Sampler(args.csv, args.interval).start()
+    print(f"Sampling every {args.interval}s into {args.csv}, Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sampler.stop()
+
+
+if __name__ == "__main__":
+    main()
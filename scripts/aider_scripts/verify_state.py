@@ -0,0 +1,171 @@
+"""
+Usage: python verify_state.py status [--repo <name>]
+       python verify_state.py show <pr> [--repo <name>]
+       python verify_state.py forget <pr> ... [--repo <name>]
+
+Persistent state of verify_PRs.py, in cache/verify_state.sqlite, so that a crash or reboot loses
+at most the PRs that were running and a rerun only re-verifies what changed.
+
+For every (repo, PR) it keeps the latest outcome: whether it was processed and verified, whether
+it is valid or why not, how long it took, the toolchain it was built with (compiler, cmake, build
+profile) and the hashes of the PR's JSON, fix.patch and test.patch. Each verification phase
+(build, test, patch application, in order) is kept with its outcome and duration, and whether it
+was skipped (a build after a data-only patch, a test run replaced by a cached baseline).
+
+verify_PRs.py skips a PR whose three hashes match its stored result, if that result is a verdict
+on the PR itself: valid, or failed in one of VERDICT_PHASES (no test files in test.patch, a patch
+that doesn't apply, tests that don't fail with test.patch or don't pass with fix.patch). Failures
+the environment can cause (checkout, submodules, builds, the tests before test.patch) are tried
+again, and so is every verified result built with a different toolchain. Without verification, a
+successfully processed PR is skipped. The hashes are taken after processing, which rewrites the
+JSON and the patches; processing the same scraped JSON again gives the same files. `forget` makes
+the next run verify a PR again regardless.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+DB_PATH = HONOURS_DIR / "cache" / "verify_state.sqlite"
+# verify_PRs.py phases whose failure says something about the PR, not the machine
+VERDICT_PHASES = {"test_paths", "apply_test_patch", "test_test_patch", "apply_fix_patch", "test_fix_patch"}
+
+
+def file_hash(path):
+    path = Path(path)
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:12] if path.exists() else ""
+
+
+def pr_hashes(pr_path):
+    """{json_hash, fix_hash, test_hash} of a PR folder."""
+    pr_path = Path(pr_path)
+    return {
+        "json_hash": file_hash(pr_path / f"{pr_path.name}.json"),
+        "fix_hash": file_hash(pr_path / "fix.patch"),
+        "test_hash": file_hash(pr_path / "test.patch"),
+    }
+
+
+def toolchain(profile):
+    """Compiler, cmake and build profile the verification builds use, as one line."""
+    parts = []
+    for cmd in (os.environ.get("CXX", "c++"), "cmake"):
+        try:
+            result = subprocess.run([cmd, "--version"], capture_output=True, text=True)
+            parts.append(result.stdout.splitlines()[0] if result.stdout else f"{cmd} ?")
+        except FileNotFoundError:
+            parts.append(f"{cmd} missing")
+    return "; ".join(parts + [f"profile {profile}"])
+
+
+class VerifyState:
+    def __init__(self, repo, db_path=DB_PATH):
+        self.repo = repo
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._db() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS prs (
+                repo TEXT, pr TEXT, processed INTEGER, verified INTEGER, valid INTEGER, reason TEXT, seconds REAL,
+                toolchain TEXT, json_hash TEXT, fix_hash TEXT, test_hash TEXT, finished REAL, PRIMARY KEY (repo, pr))""")
+            db.execute("""CREATE TABLE IF NOT EXISTS phases (
+                repo TEXT, pr TEXT, idx INTEGER, phase TEXT, ok INTEGER, skipped INTEGER, seconds REAL,
+                PRIMARY KEY (repo, pr, idx))""")
+
+    @contextmanager
+    def _db(self):
+        # One short-lived connection per call keeps this safe across the verification workers
+        db = sqlite3.connect(self.db_path, timeout=60)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, pr):
+        with self._db() as db:
+            row = db.execute("SELECT * FROM prs WHERE repo = ? AND pr = ?", (self.repo, pr)).fetchone()
+            if row is None:
+                return None
+            result = dict(row)
+            result["phases"] = [dict(phase) for phase in db.execute(
+                "SELECT phase, ok, skipped, seconds FROM phases WHERE repo = ? AND pr = ? ORDER BY idx", (self.repo, pr))]
+        return result
+
+    def unchanged(self, pr, hashes, verify, toolchain):
+        """The stored result of `pr` if it is a verdict that still holds for these hashes and this toolchain."""
+        stored = self.get(pr)
+        if stored is None or any(stored[key] != value for key, value in hashes.items()):
+            return None
+        if not verify:
+            return stored if stored["processed"] else None
+        if not stored["verified"] or stored["toolchain"] != toolchain:
+            return None
+        if stored["valid"]:
+            return stored
+        failed = [phase for phase in stored["phases"] if not phase["ok"]]
+        return stored if failed and failed[-1]["phase"] in VERDICT_PHASES else None
+
+    def record(self, result):
+        """Store one PR's result (as built by verify_PRs.check_pr), replacing the previous one."""
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO prs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+                self.repo, result["pr"], int(result["processed"]), int(result["verified"]), int(result["valid"]),
+                result["reason"], result["seconds"], result.get("toolchain", ""), result.get("json_hash", ""),
+                result.get("fix_hash", ""), result.get("test_hash", ""), time.time()))
+            db.execute("DELETE FROM phases WHERE repo = ? AND pr = ?", (self.repo, result["pr"]))
+            db.executemany("INSERT INTO phases VALUES (?, ?, ?, ?, ?, ?, ?)", [
+                (self.repo, result["pr"], idx, phase["phase"], int(phase["ok"]), int(phase.get("skipped", False)),
+                 phase["seconds"]) for idx, phase in enumerate(result.get("phases", []))])
+
+    def forget(self, pr):
+        with self._db() as db:
+            db.execute("DELETE FROM prs WHERE repo = ? AND pr = ?", (self.repo, pr))
+            db.execute("DELETE FROM phases WHERE repo = ? AND pr = ?", (self.repo, pr))
+
+    def results(self):
+        with self._db() as db:
+            return [dict(row) for row in db.execute("SELECT * FROM prs WHERE repo = ? ORDER BY CAST(pr AS INTEGER)",
+                                                    (self.repo,))]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Inspect the stored results of verify_PRs.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+    status = sub.add_parser("status", help="Count stored results and list the valid PRs")
+    show = sub.add_parser("show", help="Print one PR's stored result with its phases")
+    show.add_argument("pr")
+    forget = sub.add_parser("forget", help="Drop stored results so the next run verifies these PRs again")
+    forget.add_argument("prs", nargs="+")
+    for sub_parser in (status, show, forget):
+        sub_parser.add_argument("--repo", type=str, default=os.environ.get("HONOURS_REPO", "duckdb"))
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    state = VerifyState(args.repo)
+    if args.command == "show":
+        result = state.get(args.pr)
+        print(json.dumps(result, indent=2) if result else f"No stored result for PR {args.pr}")
+    elif args.command == "forget":
+        for pr in args.prs:
+            state.forget(pr)
+        print(f"Forgot {len(args.prs)} PR(s)")
+    else:
+        results = state.results()
+        valid = [row["pr"] for row in results if row["valid"]]
+        verified = sum(1 for row in results if row["verified"])
+        print(f"{len(results)} PRs stored for {args.repo}: {verified} verified, {len(valid)} valid")
+        print(" ".join(valid))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+Usage: python work_queue.py coordinator --m <model_name> --k <num_completions> [--bind 127.0.0.1] [--port 7070] [--lease 600]
+       python work_queue.py worker --coordinator <host>[:port] [--workers N --workspaces] [runner options]
+
+Splits one benchmark run across several machines.
+
+The coordinator owns the run directory (outputs/<run>/, named like aider_benchmark.py runs) and
+hands out one lease per (model, problem, attempt) to workers over TCP. Each worker runs leased
+attempts exactly like aider_benchmark.py does, on its own checkout, and sends back the attempt's
+CSV row and log segment; the coordinator merges both into the single run directory and the
+summary CSV.
+
+Workers renew their leases every quarter of the lease time. A lease that is not renewed (worker
+died, host lost its network) expires and the attempt is handed out again, up to --max-leases
+times; after that it is recorded as failed with failure_category "worker_lost". An attempt that
+raises is given back and counts against the same limit, ending as "worker_error". Lease events are
+appended to outputs/<run>/work_queue.jsonl.
+
+The coordinator listens on 127.0.0.1 unless given --bind. Listening on any other address requires a
+shared --token (or $HONOURS_WORK_QUEUE_TOKEN), which workers send with every request. A returned log
+segment is always stored at logs/<problem>/attempt_<n> of the leased task, whatever the worker sends.
+
+The protocol is one JSON line request and one JSON line reply per connection:
+
+    {"op": "lease", "worker": "host-123"}        -> {"task": {...}, "config": {...}, "lease": 600}
+                                                     {"wait": 5} or {"done": true}
+    {"op": "renew", "id": "10152/2", ...}         -> {"ok": true}
+    {"op": "complete", "id": ..., "row": {...}, "data": <base64>, "entries": [...]}
+    {"op": "release", "id": ..., "error": ...}    (worker gives a lease back after an error)
+
+Several workers can run on one machine (e.g. to try it out) as long as they use --workspaces,
+since attempts without workspaces all share repos/<repo>.
+
+Examples:
+  python work_queue.py coordinator --m openrouter/openai/gpt-5 --k 5 --reasoning-effort low
+  python work_queue.py worker --coordinator 10.0.0.12 --workers 4 --workspaces --memory-max 32G
+"""
+
+import argparse
+import base64
+import csv
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+import aider_benchmark
+import build_profiles
+import cache_manager
+import flaky
+import planner
+from metrics import Exporter, RunMetrics
+import scheduler
+from aider_benchmark import ATTEMPTS_HEADERS, HONOURS_DIR, REPO_NAME
+from jobserver import JobServer
+from segment_log import SegmentLog, attempt_segment
+
+DEFAULT_PORT = 7070
+WORKER_SCRATCH_DIR = HONOURS_DIR / "cache" / "work_queue"
+TOKEN_ENV_VAR = "HONOURS_WORK_QUEUE_TOKEN"
+WAIT_SECONDS = 5
+CONNECT_RETRIES = 10
+
+
+class Coordinator:
+    """Lease bookkeeping for one run. All methods are called from server threads."""
+
+    def __init__(self, run_dir, config, tasks, lease_seconds, max_leases, on_result, token=""):
+        self.run_dir = Path(run_dir)
+        self.token = token
+        self.config = config
+        self.lease_seconds = lease_seconds
+        self.max_leases = max_leases
+        self.on_result = on_result
+        self.tasks = {task["id"]: task for task in tasks}
+        self.pending = deque(task["id"] for task in tasks)
+        self.leases = {}  # id -> {"worker", "deadline"}
+        self.lease_counts = {task_id: 0 for task_id in self.tasks}
+        self.done = set()
+        self.workers = set()
+        self.last_seen = {}  # worker -> time of its last lease or renewal
+        self.logs = SegmentLog(self.run_dir)
+        self._lock = threading.Lock()
+        self.finished = threading.Event()
+        if not self.tasks:
+            self.finished.set()
+
+    def _event(self, event, task_id, worker=""):
+        line = json.dumps({"time": round(time.time(), 3), "event": event, "id": task_id, "worker": worker})
+        with open(self.run_dir / "work_queue.jsonl", "a") as f:
+            f.write(line + "\n")
+
+    def _finish(self, task_id, row, segment=None):
+        self.done.add(task_id)
+        self.leases.pop(task_id, None)
+        if task_id in self.pending:
+            self.pending.remove(task_id)
+        if segment:
+            self.logs.import_segment(*segment)
+        self.on_result({column: row.get(column, "") for column in ATTEMPTS_HEADERS})
+        if len(self.done) == len(self.tasks):
+            self.finished.set()
+
+    def expire(self):
+        """Hand expired leases out again, or give up on them."""
+        now = time.time()
+        with self._lock:
+            for task_id, lease in list(self.leases.items()):
+                if lease["deadline"] > now:
+                    continue
+                del self.leases[task_id]
+                self._event("expired", task_id, lease["worker"])
+                if self.lease_counts[task_id] < self.max_leases:
+                    print(f"⚠️ Lease on {task_id} held by {lease['worker']} expired, handing it out again")
+                    self.pending.appendleft(task_id)
+                else:
+                    print(f"❌ {task_id} lost {self.lease_counts[task_id]} workers, giving up")
+                    self._finish(task_id, lost_row(self.tasks[task_id], self.lease_counts[task_id]))
+
+    def lease(self, worker):
+        self.expire()
+        with self._lock:
+            self.workers.add(worker)
+            self.last_seen[worker] = time.time()
+            if self.finished.is_set():
+                return {"done": True}
+            if not self.pending:
+                # Everything is leased; stay around in case a lease expires
+                return {"wait": WAIT_SECONDS}
+            task_id = self.pending.popleft()
+            self.lease_counts[task_id] += 1
+            self.leases[task_id] = {"worker": worker, "deadline": time.time() + self.lease_seconds}
+            self._event("leased", task_id, worker)
+        return {"task": self.tasks[task_id], "config": self.config, "lease": self.lease_seconds}
+
+    def renew(self, task_id, worker):
+        with self._lock:
+            lease = self.leases.get(task_id)
+            if not lease or lease["worker"] != worker:
+                return {"ok": False}
+            lease["deadline"] = time.time() + self.lease_seconds
+            self.last_seen[worker] = time.time()
+        return {"ok": True}
+
+    def release(self, task_id, worker, error=""):
+        with self._lock:
+            lease = self.leases.get(task_id)
+            if lease and lease["worker"] == worker:
+                del self.leases[task_id]
+                self._event("released", task_id, worker)
+                # Releases count against --max-leases like expiries: an attempt that fails the same way
+                # everywhere (e.g. test.patch doesn't apply) mustn't be handed out forever
+                if self.lease_counts[task_id] < self.max_leases:
+                    self.pending.appendleft(task_id)
+                else:
+                    print(f"❌ {task_id} failed on {self.lease_counts[task_id]} leases, giving up")
+                    self._finish(task_id, lost_row(self.tasks[task_id], self.lease_counts[task_id], error))
+        return {"ok": True}
+
+    def complete(self, task_id, worker, row, data=None, entries=None):
+        with self._lock:
+            if task_id in self.done or task_id not in self.tasks:
+                # A worker whose lease expired finished after all; the first result wins
+                return {"ok": False}
+            self._event("completed", task_id, worker)
+            task = self.tasks[task_id]
+            imported = (task["problem"], task["attempt"], base64.b64decode(data), entries) if entries else None
+            self._finish(task_id, row, imported)
+        return {"ok": True}
+
+    def queue_state(self):
+        """Queue gauges for metrics.RunMetrics. Attempt slots per worker aren't known here."""
+        with self._lock:
+            cutoff = time.time() - self.lease_seconds
+            return {
+                "queued": len(self.pending),
+                "running": len(self.leases),
+                "workers": None,
+                "active_workers": sum(seen > cutoff for seen in self.last_seen.values()),
+            }
+
+    def handle(self, request):
+        if self.token and not hmac.compare_digest(str(request.get("token", "")), self.token):
+            return {"error": "bad token"}
+        op = request.get("op")
+        if op == "lease":
+            return self.lease(request["worker"])
+        if op == "renew":
+            return self.renew(request["id"], request["worker"])
+        if op == "release":
+            return self.release(request["id"], request["worker"], request.get("error", ""))
+        if op == "complete":
+            return self.complete(request["id"], request["worker"], request["row"], request.get("data"),
+                                 request.get("entries"))
+        return {"error": f"unknown op {op!r}"}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            reply = self.server.coordinator.handle(json.loads(self.rfile.readline()))
+        except Exception as e:
+            reply = {"error": str(e)}
+        self.wfile.write((json.dumps(reply) + "\n").encode())
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def lost_row(task, leases, error=""):
+    """Failed row of an attempt given up on: its leases expired, or (with `error`) it raised every time."""
+    row = {column: "" for column in ATTEMPTS_HEADERS}
+    row.update({
+        "problem": task["problem"],
+        "attempt_index": task["attempt"],
+        "generation_success": 0,
+        "build_success": 0,
+        "test_success": 0,
+        "failure_category": "worker_error" if error else "worker_lost",
+        "failure_message": f"raised on {leases} leases, last: {error}" if error else f"lease expired {leases} times",
+    })
+    return row
+
+
+def call(address, op, token="", **fields):
+    """Send one request to the coordinator, retrying while it is unreachable."""
+    for attempt in range(CONNECT_RETRIES):
+        try:
+            with socket.create_connection(address, timeout=60) as conn:
+                conn.sendall((json.dumps(dict(fields, op=op, token=token)) + "\n").encode())
+                reply = json.loads(conn.makefile().readline())
+            if "error" in reply:
+                raise RuntimeError(f"coordinator: {reply['error']}")
+            return reply
+        except (OSError, json.JSONDecodeError):
+            if attempt == CONNECT_RETRIES - 1:
+                raise
+            time.sleep(min(2 ** attempt, 30))
+
+
+def is_loopback(host):
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+def coordinator_main(args):
+    if not is_loopback(args.bind) and not args.token:
+        raise SystemExit(f"Listening on {args.bind} needs a shared --token (or ${TOKEN_ENV_VAR}) for the workers")
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
+    run_name = aider_benchmark.make_run_name(args, timestamp)
+    build_profile = args.build_profile or build_profiles.default_profile(args.repo)
+    output_dir = Path("outputs") / run_name
+    output_dir.mkdir(parents=True, exist_ok=True)
+    meta_path = output_dir / f"{run_name}_meta.json"
+    summary_csv_path = output_dir / f"{run_name}_summary.csv"
+    attempts_csv_path = output_dir / f"{run_name}_attempts.csv"
+
+    results = {}
+    tasks = []
+    quarantined = flaky.quarantined(aider_benchmark.load_problems(args.dir), args.flaky_policy)
+    for problem, problem_data in aider_benchmark.load_problems(args.dir):
+        if problem.name in quarantined:
+            continue
+        results[problem.name] = aider_benchmark.new_summary(problem.name)
+        if problem_data is None:
+            continue
+        for i in range(args.k):
+            tasks.append((problem, i + 1))
+    # The worker count isn't known up front, so no makespan estimate here
+    prediction = scheduler.predict({problem for problem, _ in tasks}, repo=args.repo)
+    tasks = [
+        {"id": f"{problem.name}/{attempt}", "model": args.m, "problem": problem.name, "attempt": attempt}
+        for problem, attempt in aider_benchmark.order_tasks(tasks, args.schedule, prediction=prediction)
+    ]
+    eta = planner.Eta({(task["problem"], task["attempt"]): prediction[0][task["problem"]] for task in tasks})
+
+    # Workers on other hosts resolve problems in their own benchmark dir
+    config = {
+        "run_name": run_name,
+        "model": args.m,
+        "thinking_tokens": args.thinking_tokens,
+        "reasoning_effort": args.reasoning_effort,
+        "context_map_tokens": args.context_map_tokens,
+        "retrieve_files": args.retrieve_files,
+        "build_profile": build_profile,
+        "repo": args.repo,
+        "flaky_policy": args.flaky_policy,
+        "flaky_retries": args.flaky_retries,
+        "baseline": args.baseline,
+    }
+    aider_benchmark.write_meta(meta_path, args, run_name, timestamp, build_profile,
+                               work_queue={"port": args.port, "lease": args.lease}, quarantined=quarantined)
+
+    with open(attempts_csv_path, 'w', newline='') as attempts_csv:
+        attempts_writer = csv.DictWriter(attempts_csv, fieldnames=ATTEMPTS_HEADERS)
+        attempts_writer.writeheader()
+
+        def on_result(row):
+            # Called with the coordinator lock held
+            aider_benchmark.record_attempt(results[row["problem"]], row)
+            attempts_writer.writerow(row)
+            attempts_csv.flush()
+            print(f"📥 {row['problem']} attempt {row['attempt_index']}: "
+                  f"{'passed' if row['test_success'] else row['failure_category'] or 'failed'}")
+            print(eta.done((row["problem"], int(row["attempt_index"]))))
+            metrics.attempt_finished(row)
+
+        coordinator = Coordinator(output_dir, config, tasks, args.lease, args.max_leases, on_result, args.token)
+        metrics = RunMetrics(run_name, len(tasks), eta=eta, queue_state=coordinator.queue_state)
+        coordinator.logs.listeners.append(metrics)
+        exporter = Exporter(metrics, output_dir, args.metrics_interval, args.metrics_port).start()
+        server = _Server((args.bind, args.port), _Handler)
+        server.coordinator = coordinator
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Coordinating {len(tasks)} attempts of {run_name} on {args.bind}:{args.port}")
+
+        try:
+            while not coordinator.finished.wait(timeout=WAIT_SECONDS):
+                coordinator.expire()
+            # Let the remaining workers hear that the run is done
+            time.sleep(WAIT_SECONDS * 2)
+        except KeyboardInterrupt:
+            print("Emergency stop requested. Writing results to CSV and exiting")
+            summary_csv_path = summary_csv_path.with_name(f"{summary_csv_path.stem}_partial.csv")
+        finally:
+            server.shutdown()
+            server.server_close()
+            exporter.stop()
+
+    aider_benchmark.write_summary(summary_csv_path, results)
+    aider_benchmark.write_meta(meta_path, args, run_name, timestamp, build_profile,
+                               work_queue={"port": args.port, "lease": args.lease, "workers": sorted(coordinator.workers)})
+    print(f"Results and logs saved to {output_dir}")
+
+
+def worker_main(args):
+    aider_benchmark.setup_host(args)
+    host, _, port = args.coordinator.partition(":")
+    address = (host, int(port or DEFAULT_PORT))
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+
+    cache = cache_manager.CacheManager(args.cache_budget)
+    cache.sweep_trash()
+    job_server = JobServer(args.build_jobs).start()
+    os.environ.update(job_server.env())
+
+    active = {}  # lease id -> lease seconds
+    active_lock = threading.Lock()
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(timeout=5):
+            now = time.time()
+            with active_lock:
+                due = [(task_id, lease) for task_id, lease in active.items() if now - lease["renewed"] >= lease["every"]]
+            for task_id, lease in due:
+                try:
+                    call(address, "renew", args.token, id=task_id, worker=worker_id)
+                    lease["renewed"] = now
+                except (OSError, RuntimeError) as e:
+                    print(f"⚠️ Could not renew lease on {task_id}: {e}")
+
+    def work():
+        while True:
+            reply = call(address, "lease", args.token, worker=worker_id)
+            if reply.get("done"):
+                return
+            if "wait" in reply:
+                time.sleep(reply["wait"])
+                continue
+
+            task, config = reply["task"], reply["config"]
+            run_name = config["run_name"]
+            # Fresh scratch logs per lease, so a re-leased attempt never picks up stale index entries
+            logs = SegmentLog(WORKER_SCRATCH_DIR / f"{worker_id}.{task['problem']}.{task['attempt']}.{time.time_ns()}")
+            run_args = argparse.Namespace(**vars(args))
+            run_args.m = config["model"]
+            run_args.thinking_tokens = config["thinking_tokens"]
+            run_args.reasoning_effort = config["reasoning_effort"]
+            run_args.context_map_tokens = config.get("context_map_tokens", 0)
+            run_args.retrieve_files = config.get("retrieve_files", 0)
+            run_args.repo = config.get("repo", REPO_NAME)
+            run_args.flaky_policy = config.get("flaky_policy", "off")
+            run_args.flaky_retries = config.get("flaky_retries", 0)
+            run_args.baseline = config.get("baseline", False)
+
+            problem = Path(args.dir) / task["problem"]
+            with open(problem / f"{problem.name}.json") as f:
+                problem_data = json.load(f)
+
+            with active_lock:
+                active[task["id"]] = {"renewed": time.time(), "every": reply["lease"] / 4}
+            try:
+                row = aider_benchmark.run_attempt(run_args, run_name, logs, cache, config["build_profile"],
+                                                  problem, problem_data, task["attempt"])
+            except Exception as e:
+                print(f"❌ {task['id']} raised {e!r}, giving the lease back")
+                call(address, "release", args.token, id=task["id"], worker=worker_id, error=repr(e)[:500])
+                continue
+            finally:
+                with active_lock:
+                    del active[task["id"]]
+
+            fields = {}
+            segment = attempt_segment(logs.run_dir, task["problem"], task["attempt"])
+            if segment:
+                _, data, entries = segment
+                fields = {"data": base64.b64encode(data).decode(), "entries": entries}
+            call(address, "complete", args.token, id=task["id"], worker=worker_id, row=row, **fields)
+            cache_manager.discard(logs.run_dir)
+            cache.enforce()
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    threads = [threading.Thread(target=work) for _ in range(args.workers)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        print(f"Coordinator has no more work for {worker_id}")
+    finally:
+        stop.set()
+        job_server.stop()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Split a benchmark run across machines")
+    sub = parser.add_subparsers(dest="role", required=True)
+
+    coordinator = sub.add_parser("coordinator", help="Hand out attempts and collect their results")
+    aider_benchmark.add_run_arguments(coordinator)
+    coordinator.add_argument("--bind", default="127.0.0.1", help="Address to listen on (anything but loopback needs --token)")
+    coordinator.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port to listen on")
+    coordinator.add_argument("--lease", type=int, default=600, help="Seconds a lease lasts without a renewal")
+    coordinator.add_argument("--max-leases", type=int, default=3, help="Times an attempt is handed out before giving up on it")
+
+    worker = sub.add_parser("worker", help="Run attempts leased from a coordinator")
+    worker.add_argument("--coordinator", required=True, help="Coordinator host[:port]")
+    for role in (coordinator, worker):
+        role.add_argument("--token", default=os.environ.get(TOKEN_ENV_VAR, ""),
+                          help=f"Shared secret of the coordinator and its workers (default: ${TOKEN_ENV_VAR})")
+    worker.add_argument("--dir", type=str, default=aider_benchmark.DEFAULT_BENCHMARK_DIR, help="Path to this host's benchmark directory")
+    aider_benchmark.add_host_arguments(worker)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.role == "coordinator":
+        coordinator_main(args)
+    else:
+        worker_main(args)
+
+
+if __name__ == "__main__":
+    main()
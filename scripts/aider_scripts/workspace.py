@@ -0,0 +1,185 @@
+"""
+Copy-on-write attempt workspaces on overlayfs.
+
+Resetting repos/duckdb between attempts (reset, clean, `make clean`, checkout) rewrites many files
+and throws the build away. With workspaces, every problem instead gets a read-only lower layer,
+prepared once per build profile and shared by all of its attempts:
+
+    cache/workspaces/<problem>-<commit>-<test.patch hash>-<build profile>/
+        base/          shared clone checked out at base_commit with test.patch applied (submodules
+                       hard-linked from per-commit checkouts, see submodules.py)
+        warm/upper/    the build of that tree (an overlay upper layer, used as a lower afterwards)
+
+Each attempt mounts an overlay (upper layer optionally on tmpfs) over warm/upper:base and works on
+that. Discarding the attempt drops its mount namespace and renames the upper layer away, which
+takes constant time however much the attempt wrote. The lower layers are never written to.
+
+Overlays are mounted inside a private mount namespace per attempt (held open by a sleeping
+process and entered with nsenter), always at the same path, cache/workspaces/mnt. Concurrent
+attempts therefore see the same absolute paths the warm build was configured with, so CMake and
+the incremental build work unchanged. `base` is a `git clone --shared`, so its .git lives inside
+the lower layer too and every attempt gets a private copy-on-write index and HEAD.
+
+Requires root (or CAP_SYS_ADMIN), util-linux `unshare`/`nsenter` and overlayfs.
+"""
+
+import fcntl
+import hashlib
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+import cache_manager
+
+HONOURS_DIR = Path(__file__).resolve().parents[2]
+WORKSPACE_ROOT = HONOURS_DIR / "cache" / "workspaces"
+MOUNT_POINT = WORKSPACE_ROOT / "mnt"
+SOURCE_REPO = HONOURS_DIR / "repos" / "duckdb"
+SUBMODULES_SCRIPT = Path(__file__).resolve().parent / "submodules.py"
+
+
+def supported():
+    if os.geteuid() != 0 or not shutil.which("unshare") or not shutil.which("nsenter"):
+        return False
+    with open("/proc/filesystems") as f:
+        return any(line.split()[-1] == "overlay" for line in f if line.strip())
+
+
+class Namespace:
+    """A private mount namespace kept alive by a sleeping holder process."""
+
+    def __init__(self):
+        self.holder = None
+
+    def start(self):
+        own_ns = os.readlink("/proc/self/ns/mnt")
+        self.holder = subprocess.Popen(["unshare", "--mount", "--propagation", "private", "sleep", "infinity"])
+        # unshare execs sleep once the namespace exists
+        for _ in range(100):
+            if os.readlink(f"/proc/{self.holder.pid}/ns/mnt") != own_ns:
+                return self
+            time.sleep(0.01)
+        self.stop()
+        raise RuntimeError("Could not create a private mount namespace")
+
+    def wrap(self, cmd):
+        prefix = ["nsenter", "-t", str(self.holder.pid), "-m", "--"]
+        if isinstance(cmd, str):
+            return prefix + ["sh", "-c", cmd]
+        return prefix + list(cmd)
+
+    def exec(self, cmd):
+        subprocess.run(self.wrap(cmd), check=True, capture_output=True)
+
+    def mount_overlay(self, lowers, upper, work, target=MOUNT_POINT):
+        lowerdir = ":".join(str(p) for p in lowers)
+        self.exec(["mount", "-t", "overlay", "overlay", "-o",
+                   f"lowerdir={lowerdir},upperdir={upper},workdir={work}", str(target)])
+
+    def stop(self):
+        # Mounts only exist in this namespace; they go away with its last process
+        if self.holder:
+            self.holder.kill()
+            self.holder.wait()
+            self.holder = None
+
+
+class LowerLayer:
+    """Base checkout + test.patch + warm build for one problem, shared read-only by its attempts."""
+
+    def __init__(self, problem_dir, base_commit, build_profile, source_repo=SOURCE_REPO, root=WORKSPACE_ROOT):
+        self.problem_dir = Path(problem_dir)
+        self.base_commit = base_commit
+        self.build_profile = build_profile
+        self.source_repo = Path(source_repo)
+        self.test_patch = self.problem_dir / "test.patch"
+        patch_hash = hashlib.sha256(self.test_patch.read_bytes()).hexdigest()[:8] if self.test_patch.exists() else "none"
+        # The warm build belongs to one profile; runs with another one get their own layer
+        self.dir = Path(root) / f"{self.problem_dir.name}-{base_commit[:12]}-{patch_hash}-{build_profile}"
+        self.base = self.dir / "base"
+        self.warm = self.dir / "warm"
+
+    def layers(self):
+        """Lower directories for overlayfs, topmost first."""
+        return [self.warm / "upper", self.base]
+
+    def ready(self):
+        return (self.dir / ".ready").exists()
+
+    def prepare(self, build_cmd, run_fn, log=None, cache=None):
+        """
+        Create the lower layer if needed. `run_fn` is aider_benchmark.run, used for the warm build;
+        `cache` is a cache_manager.CacheManager to register the layer with.
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        MOUNT_POINT.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / ".lock", "w") as lock:
+            # Several attempts of the same problem may start together; only one prepares
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self.ready():
+                return
+
+            for path in (self.base, self.warm):
+                if path.exists():
+                    shutil.rmtree(path)
+            run_fn(["git", "clone", "--shared", "--no-checkout", "--quiet", str(self.source_repo), str(self.base)], log=log)
+            run_fn(["git", "checkout", "--quiet", "--detach", self.base_commit], cwd=self.base, log=log)
+            if (self.base / ".gitmodules").exists():
+                run_fn(["python3", str(SUBMODULES_SCRIPT), "update", "--link", str(self.base)], log=log)
+            if self.test_patch.exists():
+                run_fn(["git", "apply", str(self.test_patch)], cwd=self.base, log=log)
+
+            (self.warm / "upper").mkdir(parents=True)
+            (self.warm / "work").mkdir()
+            ns = Namespace().start()
+            try:
+                ns.mount_overlay([self.base], self.warm / "upper", self.warm / "work")
+                # A failing base build still leaves useful objects behind for the attempts
+                run_fn(ns.wrap(build_cmd), env=dict(os.environ, REPO_DIR=str(MOUNT_POINT)), log=log, check=False)
+            finally:
+                ns.stop()
+            shutil.rmtree(self.warm / "work", ignore_errors=True)
+            (self.dir / ".ready").touch()
+            if cache:
+                cache.register(self.dir, "workspace")
+
+
+class Workspace:
+    """A disposable overlay of one attempt over a LowerLayer."""
+
+    def __init__(self, lower, name, tmpfs_size=None, root=WORKSPACE_ROOT):
+        self.lower = lower
+        self.dir = Path(root) / "attempts" / name
+        self.tmpfs_size = tmpfs_size
+        self.ns = None
+
+    def start(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.ns = Namespace().start()
+        if self.tmpfs_size:
+            # The tmpfs only exists inside this attempt's namespace
+            self.ns.exec(["mount", "-t", "tmpfs", "-o", f"size={self.tmpfs_size}", "tmpfs", str(self.dir)])
+        self.ns.exec(["mkdir", "-p", str(self.dir / "upper"), str(self.dir / "work")])
+        self.ns.mount_overlay(self.lower.layers(), self.dir / "upper", self.dir / "work")
+        return self
+
+    def wrap(self, cmd):
+        """Wrap a command so it runs inside this workspace's mount namespace."""
+        return self.ns.wrap(cmd)
+
+    def env(self):
+        return dict(os.environ, REPO_DIR=str(MOUNT_POINT))
+
+    def discard(self):
+        if self.ns:
+            self.ns.stop()
+            self.ns = None
+        cache_manager.discard(self.dir)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.discard()
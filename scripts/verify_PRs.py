@@ -1,14 +1,47 @@
 import os
+import queue
 import subprocess
 import json
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "aider_scripts"))
+import adapters
+import build_profiles
+import baseline
+import verify_state
+from jobserver import JobServer
+
 # Configurations
 PR_FOLDER_PATH = "../dragonflydb_unverified"
 # PR_FOLDER_PATH = "../prs"
 DUCKDB_REPO_PATH = "../repos/dragonfly"
 PROCESS_SCRIPT_PATH = "process_single_pr.py"
+BUILDER_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aider_scripts", "builder.py")
+ADAPTERS_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aider_scripts", "adapters.py")
+SUBMODULES_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aider_scripts", "submodules.py")
+# Adapter from aider_scripts/adapters.py that knows how to build and test this repository
+REPO_NAME = os.environ.get("HONOURS_REPO") or os.path.basename(DUCKDB_REPO_PATH)
+# Profile from aider_scripts/build_profiles.py, by default the one configured for this repository
+BUILD_PROFILE = build_profiles.default_profile(REPO_NAME)
+# Compile jobs allowed machine-wide; shared with any benchmark run through the harness jobserver
+BUILD_JOBS = os.cpu_count()
+# Send compile jobs to distcc/icecream helpers when reachable: off, auto, distcc or icecream (see aider_scripts/remote_compile.py)
+DISTRIBUTED = os.environ.get("HONOURS_DISTRIBUTED", "off")
+# False to only process PRs, True to also check that test.patch fails and fix.patch makes it pass
+VERIFY = False
+# PRs processed/verified at once, each in its own worktree of DUCKDB_REPO_PATH (the first one is the repo itself)
+VERIFY_WORKERS = int(os.environ.get("HONOURS_VERIFY_WORKERS", "1"))
+WORKTREES_PATH = DUCKDB_REPO_PATH.rstrip("/") + "_worktrees"
+# Whether command output is echoed to the terminal (off with several workers)
+ECHO = True
+# Verify PRs again even if their stored result (aider_scripts/verify_state.py) still holds
+FORCE = os.environ.get("HONOURS_VERIFY_FORCE") == "1"
+# Compiler, cmake and profile, recorded with every result (set in main)
+TOOLCHAIN = ""
 
 # def run(cmd, cwd=None, check=True):
 #     result = subprocess.run(cmd, cwd=cwd, shell=True, capture_output=True, text=True)
@@ -33,12 +66,14 @@ def run(cmd, cwd=None, check=True, log_file=None):
     stdout, stderr = [], []
 
     for line in process.stdout:
-        print(line, end='')
+        if ECHO:
+            print(line, end='')
         stdout.append(line)
         if log_file:
             log_file.write(line)
     for line in process.stderr:
-        print(line, end='', file=sys.stderr)
+        if ECHO:
+            print(line, end='', file=sys.stderr)
         stderr.append(line)
         if log_file:
             log_file.write(line)
@@ -46,7 +81,8 @@ def run(cmd, cwd=None, check=True, log_file=None):
     process.wait()
 
     if check and process.returncode != 0:
-        print(f"[Error] Command failed: {cmd}")
+        if ECHO:
+            print(f"[Error] Command failed: {cmd}")
         if log_file:
             log_file.write(f"[Error] Command failed: {cmd}\n")
         return None
@@ -64,16 +100,22 @@ def run(cmd, cwd=None, check=True, log_file=None):
 def apply_patch(patch_path, repo_path, log_file):
     return run(f"git apply {patch_path}", cwd=repo_path, log_file=log_file)
 
-def build_duckdb(repo_path, log_file):
-    return run("make -j$(nproc)", cwd=repo_path, log_file=log_file)
+def build_duckdb(repo_path, log_file, test_paths=()):
+    tests = " ".join(test_paths)
+    return run(f"python3 {BUILDER_SCRIPT_PATH} {repo_path} --repo {REPO_NAME} --profile {BUILD_PROFILE} --jobs $(nproc) "
+               f"--distributed {DISTRIBUTED} --test-files {tests}",
+               log_file=log_file)
+
+def run_test_output(test_paths, repo_path, log_file, test_patch_path=None):
+    tests = " ".join(test_paths)
+    # The test.patch lets the adapter run only the changed cases (dragonfly gtests)
+    patch_arg = f"--test-patch {os.path.abspath(test_patch_path)} " if test_patch_path else ""
+    return run(f"python3 {ADAPTERS_SCRIPT_PATH} --repo {REPO_NAME} test {patch_arg}{os.path.abspath(repo_path)} {tests}",
+               cwd=repo_path, check=False, log_file=log_file)
 
-def run_test(test_paths, repo_path, log_file):
-    unittest_path = "build/release/test/unittest"
-    for test_path in test_paths:
-        result = run(f"{unittest_path} {test_path}", cwd=repo_path, check=False, log_file=log_file)
-        if result is None or "All tests passed" not in result.stdout:
-            return False
-    return True
+def run_test(test_paths, repo_path, log_file, test_patch_path=None):
+    result = run_test_output(test_paths, repo_path, log_file, test_patch_path)
+    return result is not None and result.returncode == 0
 
 
 def get_test_paths_from_patch(patch_path):
@@ -88,156 +130,274 @@ def get_test_paths_from_patch(patch_path):
     return test_paths
 
 
-def log_invalid_pr(pr, valid_prs, log_file):
-    log_file.write(f"\n❌ PR {pr} is not valid\n")
-    log_file.write("✅ Valid PRs so far:\n")
-    for verified_pr in valid_prs:
-        print(verified_pr)
-        log_file.write(verified_pr + "\n")
-    log_file.flush()
+def get_paths_from_patch(patch_path):
+    """Every file a patch touches, on either side (added, deleted or renamed)."""
+    paths = []
+    with open(patch_path) as f:
+        for line in f:
+            if line.startswith(("--- a/", "+++ b/")):
+                file_path = line[len("+++ b/"):].strip()
+                if file_path not in paths:
+                    paths.append(file_path)
+    return paths
+
+
+def build_inputs(repo_path, test_paths):
+    """What a build of repo_path depends on besides its sources: the adapter's cmake arguments and targets."""
+    adapter = adapters.get(REPO_NAME)
+    return adapter.cmake_args(BUILD_PROFILE, repo_path, test_paths), adapter.build_targets(repo_path, test_paths)
+
+
+def needs_build(patch_path, repo_path, test_paths, before, log_file):
+    """Whether an applied patch changed anything the last build (configured as `before`) read."""
+    compiled = adapters.get(REPO_NAME).compiled_inputs(get_paths_from_patch(patch_path))
+    if compiled:
+        return True
+    if build_inputs(repo_path, test_paths) != before:
+        say(log_file, f"🔧 {os.path.basename(patch_path)} changes the build configuration")
+        return True
+    say(log_file, f"⏩ {os.path.basename(patch_path)} only changes data files, skipping the build")
+    return False
+
+
+def record_result(results_file, lock, result):
+    """Append one PR's result to the JSONL results file as soon as it is known."""
+    with lock:
+        results_file.write(json.dumps(result) + "\n")
+        results_file.flush()
+
+
+def say(log_file, message):
+    """Progress message: into the log, and to the terminal unless several workers share it."""
+    log_file.write(message + "\n")
+    if ECHO:
+        print(message)
+
+
+def failed(log_file, reason):
+    say(log_file, f"❌ {reason}")
+    return False, reason
+
+
+def phase(phases, name, start, ok, skipped=False):
+    """Record one verification phase's outcome and duration; returns `ok`."""
+    phases.append({"phase": name, "ok": bool(ok), "skipped": skipped, "seconds": round(time.time() - start, 1)})
+    return ok
+
+
+def verify_pr(pr_path, commit_hash, log_file, repo_path=DUCKDB_REPO_PATH, phases=None):
+    """
+    Check a processed PR checked out at its base commit: tests pass, fail with test.patch, pass with fix.patch.
+    Each phase is appended to `phases`. Returns (valid, reason it isn't).
+    """
+    phases = [] if phases is None else phases
+    # Get test path
+    test_patch_path = os.path.join(pr_path, "test.patch")
+    test_rel_path = get_test_paths_from_patch(test_patch_path)
+    if not phase(phases, "test_paths", time.time(), test_rel_path):
+        return failed(log_file, f"Could not determine test path for PR {os.path.basename(pr_path)}")
+
+    # Compile baseline code; later builds are incremental, and skipped after a patch of data files only
+    say(log_file, "🔧 Compiling code...")
+    start = time.time()
+    if not phase(phases, "build_base", start, build_duckdb(repo_path, log_file=log_file, test_paths=test_rel_path)):
+        return failed(log_file, "Compilation failed")
+    say(log_file, "✅ Compilation succeeded (Expected behaviour)")
+    configured = build_inputs(repo_path, test_rel_path)
+
+    # Run baseline test (should pass)
+    say(log_file, "✅ Running baseline test... (should pass)")
+    start = time.time()
+    if not phase(phases, "test_base", start, run_test(test_rel_path, repo_path, log_file=log_file, test_patch_path=test_patch_path)):
+        return failed(log_file, "Baseline test failed")
+    say(log_file, "✅ Baseline test passed (Expected behaviour)")
+
+    # Apply test.patch and rerun test (should fail)
+    say(log_file, "📄 Applying test.patch...")
+    start = time.time()
+    if not phase(phases, "apply_test_patch", start, apply_patch(test_patch_path, repo_path, log_file=log_file)):
+        return failed(log_file, "Failed to apply test.patch")
+    say(log_file, "✅ test.patch applied (Expected behaviour)")
+    stale = needs_build(test_patch_path, repo_path, test_rel_path, configured, log_file)
+    # The failing run is the problem's baseline (see aider_scripts/baseline.py); a cached one saves this build and test
+    cached = baseline.load(commit_hash, test_patch_path)
+    if cached and not cached["passed"]:
+        say(log_file, f"✅ Modified test failed in the cached baseline ({cached['source']}), skipping (Expected behaviour)")
+        phase(phases, "test_test_patch", time.time(), True, skipped=True)
+    else:
+        start = time.time()
+        if stale:
+            say(log_file, "🔧 Compiling code...")
+            if not phase(phases, "build_test_patch", start, build_duckdb(repo_path, log_file=log_file, test_paths=test_rel_path)):
+                return failed(log_file, "Compilation failed after applying test.patch")
+            say(log_file, "✅ Compilation succeeded (Expected behaviour)")
+            configured, stale = build_inputs(repo_path, test_rel_path), False
+        else:
+            phase(phases, "build_test_patch", start, True, skipped=True)
+        say(log_file, "🧪 Running modified test (should fail)...")
+        start = time.time()
+        result = run_test_output(test_rel_path, repo_path, log_file=log_file, test_patch_path=test_patch_path)
+        # The phase succeeds when the test fails
+        if not phase(phases, "test_test_patch", start, result is not None and result.returncode != 0):
+            if result is None:
+                return failed(log_file, "Modified test could not be run")
+            baseline.record(commit_hash, test_patch_path, result.stdout, True, "verify")
+            return failed(log_file, "Test did not fail after applying test.patch")
+        baseline.record(commit_hash, test_patch_path, result.stdout, False, "verify")
+        say(log_file, "✅ Modified test failed (Expected behaviour)")
+
+    # Apply fix.patch and rerun test (should pass)
+    fix_patch_path = os.path.join(pr_path, "fix.patch")
+    say(log_file, "📄 Applying fix.patch...")
+    start = time.time()
+    if not phase(phases, "apply_fix_patch", start, apply_patch(fix_patch_path, repo_path, log_file=log_file)):
+        return failed(log_file, "Failed to apply fix.patch")
+    say(log_file, "✅ fix.patch applied (Expected behaviour)")
+    start = time.time()
+    # A build skipped with the cached baseline still has to pick up test.patch
+    if stale or needs_build(fix_patch_path, repo_path, test_rel_path, configured, log_file):
+        say(log_file, "🔧 Compiling code...")
+        if not phase(phases, "build_fix_patch", start, build_duckdb(repo_path, log_file=log_file, test_paths=test_rel_path)):
+            return failed(log_file, "Compilation failed after applying fix.patch")
+        say(log_file, "✅ Compilation succeeded (Expected behaviour)")
+    else:
+        phase(phases, "build_fix_patch", start, True, skipped=True)
+    say(log_file, "🧪 Running fixed test (should pass)...")
+    start = time.time()
+    if not phase(phases, "test_fix_patch", start, run_test(test_rel_path, repo_path, log_file=log_file, test_patch_path=test_patch_path)):
+        return failed(log_file, "Final test failed")
+    return True, ""
+
+
+def check_pr(pr, repo_path, log_file):
+    """Process one PR in `repo_path` and, with VERIFY, verify it. Returns its result record."""
+    start = time.time()
+    pr_path = os.path.join(PR_FOLDER_PATH, pr)
+    result = {"pr": pr, "repo_path": repo_path, "processed": False, "verified": VERIFY, "valid": False, "reason": "",
+              "toolchain": TOOLCHAIN, "phases": []}
+    say(log_file, f"\n--- Testing PR {pr} ---")
+
+    # Reset the repo
+    run("git reset --hard", cwd=repo_path, log_file=log_file)
+    run("git clean -fd", cwd=repo_path, log_file=log_file)
+    try:
+        # Process PR
+        if not phase(result["phases"], "process", start, run(
+                f"python3 {os.path.abspath(PROCESS_SCRIPT_PATH)} {os.path.abspath(pr_path)} {os.path.abspath(repo_path)}",
+                log_file=log_file)):
+            result["reason"] = "Processing failed"
+            return result
+        # Hashes of the processed files, which the next run compares to skip unchanged PRs
+        result.update(verify_state.pr_hashes(pr_path))
+        # Checkout to PR commit
+        with open(os.path.join(pr_path, f"{pr}.json")) as f:
+            commit_hash = json.load(f)["base_commit"]
+        checkout_start = time.time()
+        if not run(f"git checkout {commit_hash}", cwd=repo_path, log_file=log_file):
+            phase(result["phases"], "checkout", checkout_start, False)
+            result["reason"] = f"Checkout of {commit_hash} failed"
+            return result
+        # Only submodules whose gitlink changed since the last PR are checked out (shared object store)
+        if os.path.exists(os.path.join(repo_path, ".gitmodules")):
+            if not run(f"python3 {SUBMODULES_SCRIPT_PATH} update {repo_path}", log_file=log_file):
+                phase(result["phases"], "checkout", checkout_start, False)
+                result["reason"] = "Submodule update failed"
+                return result
+        phase(result["phases"], "checkout", checkout_start, True)
+        result["processed"] = True
+
+        if VERIFY:
+            result["valid"], result["reason"] = verify_pr(pr_path, commit_hash, log_file, repo_path, result["phases"])
+            say(log_file, f"✅ PR {pr} is valid" if result["valid"] else f"❌ PR {pr} is not valid")
+        return result
+    finally:
+        result["seconds"] = round(time.time() - start, 1)
+        # Reset the repo
+        run("git reset --hard", cwd=repo_path, log_file=log_file)
+        run("git clean -fd", cwd=repo_path, log_file=log_file)
+
+
+def worktrees(count):
+    """The repository itself plus count - 1 detached worktrees of it under WORKTREES_PATH, created on first use."""
+    paths = [DUCKDB_REPO_PATH]
+    for i in range(1, count):
+        path = os.path.join(WORKTREES_PATH, str(i))
+        if not os.path.exists(path):
+            os.makedirs(WORKTREES_PATH, exist_ok=True)
+            if not run(f"git worktree add --detach {os.path.abspath(path)}", cwd=DUCKDB_REPO_PATH):
+                raise SystemExit(f"Could not create worktree {path}")
+        paths.append(path)
+    return paths
 
 
 def main():
+    global ECHO, TOOLCHAIN
     timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     log_path = f"run_log_{timestamp}.txt"
-
-    with open(log_path, "w") as log_file:
+    results_path = f"verify_results_{timestamp}.jsonl"
+    # With several workers their output would interleave, so it only goes to the per-PR logs
+    ECHO = VERIFY_WORKERS == 1
+    log_dir = f"run_logs_{timestamp}"
+    if not ECHO:
+        os.makedirs(log_dir, exist_ok=True)
+    TOOLCHAIN = verify_state.toolchain(BUILD_PROFILE)
+    state = verify_state.VerifyState(REPO_NAME)
+
+    with open(log_path, "w") as log_file, open(results_path, "w") as results_file, JobServer(BUILD_JOBS) as job_server:
+        # Every worktree's builds share the jobserver's BUILD_JOBS compile slots
+        os.environ.update(job_server.env())
         valid_prs = []
         max_prs_to_test = 1000
-        tested_pr_count = 0
-
-        for pr in sorted(os.listdir(PR_FOLDER_PATH), key=lambda x: int(x) if x.isdigit() else float('inf')):
-            if tested_pr_count >= max_prs_to_test:
-                break
-            pr_path = os.path.join(PR_FOLDER_PATH, pr)
-            if not os.path.isdir(pr_path):
-                continue
-
-            print(f"\n--- Testing PR {pr} ---")
-
-            # Reset DuckDB repo
-            run("git reset --hard", cwd=DUCKDB_REPO_PATH, log_file=log_file)
-            run("git clean -fd", cwd=DUCKDB_REPO_PATH, log_file=log_file)
-
-            # Process PR
-            process = run(f"python3 {PROCESS_SCRIPT_PATH} {pr_path} {DUCKDB_REPO_PATH}", log_file=log_file)
-            if process is None:
-                # Print and log out valid PRs so far
-                log_invalid_pr(pr, valid_prs, log_file)
-                continue
-            # Checkout to PR commit
-            with open(os.path.join(pr_path, f"{pr}.json")) as f:
-                commit_hash = json.load(f)["base_commit"]
-            if not run(f"git checkout {commit_hash}", cwd=DUCKDB_REPO_PATH, log_file=log_file):
-                # Print and log out valid PRs so far
-                log_invalid_pr(pr, valid_prs, log_file)
-
-                continue
-
-            # COMMENT START HERE IF YOU WANT TO ONLY PROCESS, NOT VERIFY
-            """
-
-            # Compile baseline code
-            print("🔧 Compiling code...")
-            if not build_duckdb(DUCKDB_REPO_PATH, log_file=log_file):
-                print("❌ Compilation failed")
-                # Print and log out valid PRs so far
-                log_invalid_pr(pr, valid_prs, log_file)
-
-                continue
-            print("✅ Compilation succeeded (Expected behaviour)")
-            # Get test path
-            test_patch_path = os.path.join(pr_path, "test.patch")
-            test_rel_path = get_test_paths_from_patch(test_patch_path)
-            if not test_rel_path:
-                print(f"Could not determine test path for PR {pr}")
-                # Print and log out valid PRs so far
-                log_invalid_pr(pr, valid_prs, log_file)
-
-                continue
-
-            # Run baseline test (should pass)
-            print("✅ Running baseline test... (should pass)")
-            if not run_test(test_rel_path, DUCKDB_REPO_PATH, log_file=log_file):
-                print("❌ Baseline test failed")
-                # Print and log out valid PRs so far
-                log_invalid_pr(pr, valid_prs, log_file)
-
-                continue
-            print("✅ Baseline test passed (Expected behaviour)")
-
-            # Apply test.patch and rerun test (should fail)
-            print("📄 Applying test.patch...")
-            if not apply_patch(test_patch_path, DUCKDB_REPO_PATH, log_file=log_file):
-                print("❌ Failed to apply test.patch")
-                # Print and log out valid PRs so far
-                log_invalid_pr(pr, valid_prs, log_file)
-
-                continue
-            print("✅ test.patch applied (Expected behaviour)")
-            print("🔧 Compiling code...")
-            if build_duckdb(DUCKDB_REPO_PATH, log_file=log_file) is None:
-                print("❌ Compilation failed")
-                # Print and log out valid PRs so far
-                log_invalid_pr(pr, valid_prs, log_file)
-
-                continue
-            print("✅ Compilation succeeded (Expected behaviour)")
-            print("🧪 Running modified test (should fail)...")
-            if run_test(test_rel_path, DUCKDB_REPO_PATH, log_file=log_file):
-                print("❌ Test did not fail after applying test.patch")
-                # Print and log out valid PRs so far
-                log_invalid_pr(pr, valid_prs, log_file)
-
-                continue
-            print("✅ Modified test failed (Expected behaviour)")
-
-            # Apply fix.patch and rerun test (should pass)
-            print("📄 Applying fix.patch...")
-            if not apply_patch(os.path.join(pr_path, "fix.patch"), DUCKDB_REPO_PATH, log_file=log_file):
-                print("❌ Failed to apply fix.patch")
-                # Print and log out valid PRs so far
-                log_invalid_pr(pr, valid_prs, log_file)
-
-                continue
-            print("✅ fix.patch applied (Expected behaviour)")
-            print("🔧 Compiling code...")
-            if build_duckdb(DUCKDB_REPO_PATH, log_file=log_file) is None:
-                print("❌ Compilation failed")
-                # Print and log out valid PRs so far
-                log_invalid_pr(pr, valid_prs, log_file)
-
-                continue
-            print("✅ Compilation succeeded (Expected behaviour)")
-            print("🧪 Running fixed test (should pass)...")
-            if not run_test(test_rel_path, DUCKDB_REPO_PATH, log_file=log_file):
-                print("❌ Final test failed")
-                # Print and log out valid PRs so far
-                log_invalid_pr(pr, valid_prs, log_file)
-
-                continue
-
-            print(f"✅ PR {pr} is valid")
-            valid_prs.append(pr)
-            tested_pr_count += 1
-
-            # print out valid prs
-            # Print and log out valid PRs so far
-            log_file.write("\n✅ Valid PRs so far:\n")
-            for verified_pr in valid_prs:
-                print(verified_pr)
-                log_file.write(verified_pr + "\n")
-            log_file.flush()  # optional: flush to disk immediatelyA
-
-            # COMMENT END HERE IF YOU WANT TO PROCESS ONLY
-            """
-            # Reset DuckDB repo
-            run("git reset --hard", cwd=DUCKDB_REPO_PATH, log_file=log_file)
-            run("git clean -fd", cwd=DUCKDB_REPO_PATH, log_file=log_file)
-
+        lock = threading.Lock()
+        free = queue.Queue()
+        for path in worktrees(VERIFY_WORKERS):
+            free.put(path)
+
+        def task(pr):
+            with lock:
+                if len(valid_prs) >= max_prs_to_test:
+                    return
+            repo_path = free.get()
+            try:
+                if ECHO:
+                    result = check_pr(pr, repo_path, log_file)
+                else:
+                    with open(os.path.join(log_dir, f"{pr}.txt"), "w") as pr_log:
+                        result = check_pr(pr, repo_path, pr_log)
+            finally:
+                free.put(repo_path)
+            record_result(results_file, lock, result)
+            state.record(result)
+            if result["valid"]:
+                with lock:
+                    valid_prs.append(pr)
+            if not ECHO:
+                status = "✅ valid" if result["valid"] else (f"❌ {result['reason']}" if result["reason"] else "✅ processed")
+                print(f"PR {pr}: {status} ({result['seconds']}s)")
+
+        prs = [pr for pr in sorted(os.listdir(PR_FOLDER_PATH), key=lambda x: int(x) if x.isdigit() else float('inf'))
+               if os.path.isdir(os.path.join(PR_FOLDER_PATH, pr))]
+        # Verdicts of earlier runs still hold for PRs whose JSON, patches and toolchain haven't changed since
+        if not FORCE:
+            unchanged = {}
+            for pr in prs:
+                stored = state.unchanged(pr, verify_state.pr_hashes(os.path.join(PR_FOLDER_PATH, pr)), VERIFY, TOOLCHAIN)
+                if stored:
+                    unchanged[pr] = stored
+            valid_prs += [pr for pr, stored in unchanged.items() if stored["valid"]]
+            prs = [pr for pr in prs if pr not in unchanged]
+            if unchanged:
+                print(f"⏩ Skipping {len(unchanged)} PR(s) unchanged since their last verification "
+                      f"({len(valid_prs)} valid), {len(prs)} to go")
+        with ThreadPoolExecutor(max_workers=VERIFY_WORKERS) as pool:
+            for future in [pool.submit(task, pr) for pr in prs]:
+                future.result()
+
+        print(f"\nResults written to {results_path}")
         print("\n=== Valid PRs ===")
-        for pr in valid_prs:
+        for pr in sorted(valid_prs, key=lambda x: int(x) if x.isdigit() else float('inf')):
             print(pr)
+            log_file.write(pr + "\n")
 
 if __name__ == "__main__":
     main()